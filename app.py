@@ -1,102 +1,575 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List
-import pickle
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Union
+import asyncio
+import os
 import numpy as np
-import pandas as pd
+from model_holder import ModelHolder
+from drift_monitor import DriftMonitor, elasticsearch_sink, profile_path_for
+from explanations import DEFAULT_TOP_K, contributions, top_k as top_features
+from inference_executor import BoundedExecutor, ExecutorFull
+from micro_batcher import MicroBatcher
+from incremental_training import DEFAULT_HISTORY_PATH, DEFAULT_ROUNDS, RETRAIN_MODES, RetrainJobs
+from prediction_cache import PredictionCache, vector_key
+from score_store import ScoreStore
+from sampling_profiler import PROFILER_ENABLED, ProfilerBusy, profile
+from serving_metrics import CONTENT_TYPE, MetricsMiddleware, ServingMetrics, gauge_lines
 #
 # Charger le modèle sauvegardé
 MODEL_PATH = "model.pkl"
 
+# Modèle servi, rechargé à chaud quand l'artefact (ou le registre MLflow) change
+holder = ModelHolder(
+    MODEL_PATH,
+    registry_name=os.environ.get("MODEL_REGISTRY_NAME"),
+    poll_interval=float(os.environ.get("MODEL_WATCH_INTERVAL", "5")),
+)
+
 try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
+    holder.load()
     print("✅ Modèle chargé avec succès !")
 except FileNotFoundError:
     print("⚠️ Erreur : Modèle non trouvé. Exécutez d'abord `python main.py --train`")
 
+# Suivi de dérive des entrées servies, comparées au profil des données
+# d'entraînement ; rapport publié en un seul envoi par intervalle
+drift = DriftMonitor(
+    os.environ.get("DRIFT_PROFILE_PATH", profile_path_for(MODEL_PATH)),
+    publish_interval=float(os.environ.get("DRIFT_PUBLISH_INTERVAL", "60")),
+    min_rows=int(os.environ.get("DRIFT_MIN_ROWS", "100")),
+    sinks=[elasticsearch_sink(os.environ["ELASTICSEARCH_HOST"])] if os.environ.get("ELASTICSEARCH_HOST") else [],
+)
+
+# Réentraînements incrémentaux lancés par /retrain (un à la fois, hors du processus du service)
+retrain_jobs = RetrainJobs()
+
+# Durées par étape, compteurs de requêtes et version du modèle (/metrics)
+metrics = ServingMetrics("fastapi", holder)
+
+
+def predict_churn_proba(matrix, snapshot):
+    """
+    Probabilité de churn pour chaque ligne d'une matrice encodée.
+    """
+    metrics.batch_size.observe(len(matrix))
+    with metrics.stage("predict"):
+        return (snapshot.predictor or snapshot.model).predict_proba(matrix)[:, 1]
+
+
+# Pool dédié à l'inférence, à file bornée : au-delà, les requêtes sont
+# rejetées en 503 au lieu de s'accumuler
+inference = BoundedExecutor(
+    max_workers=int(os.environ.get("INFERENCE_WORKERS", "1")),
+    max_queue=int(os.environ.get("INFERENCE_MAX_QUEUE", "64")),
+)
+
+# Regroupement des requêtes concurrentes de /predict (micro-batching)
+batcher = MicroBatcher(
+    predict_churn_proba,
+    max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", "64")),
+    max_wait_us=int(os.environ.get("BATCH_MAX_WAIT_US", "1000")),
+    executor=inference,
+    max_pending=int(os.environ.get("BATCH_MAX_PENDING", "1024")),
+)
+
+# Erreurs de surcharge (file d'inférence ou de micro-batching pleine)
+OVERLOADED = (ExecutorFull, asyncio.QueueFull)
+
+
+def overloaded():
+    return HTTPException(
+        status_code=503, detail="Service surchargé, réessayer plus tard", headers={"Retry-After": "1"}
+    )
+
+
+# Cache des prédictions, indexé par (version du modèle, vecteur encodé)
+cache = PredictionCache(
+    max_bytes=int(float(os.environ.get("PREDICTION_CACHE_MB", "64")) * 1024 * 1024),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", "300")),
+)
+
+# Contributions par feature (pred_contribs), indexées par la même clé que les
+# prédictions : réexpliquer un vecteur déjà vu ne coûte qu'une recherche
+explanation_cache = PredictionCache(
+    max_bytes=int(float(os.environ.get("EXPLANATION_CACHE_MB", "32")) * 1024 * 1024),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", "300")),
+)
+
+
+# Scores précalculés par abonné (job nocturne `score_store.py`)
+scores = ScoreStore(poll_interval=float(os.environ.get("SCORE_STORE_POLL_INTERVAL", "5")))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    holder.start_watching()
+    drift.start()
+    yield
+    drift.stop()
+    holder.stop_watching()
+    await batcher.stop()
+
+
 # Initialiser FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 
 # Définir le format des données d'entrée pour les prédictions
 class PredictionInput(BaseModel):
-    features: List[float]
+    features: Union[List[float], Dict[str, Union[float, str]]]
+
+
+# Format des données pour la prédiction par lot : lignes (row-major),
+# colonnes, ou enregistrements bruts ({"State": "CA", ...})
+class BatchPredictionInput(BaseModel):
+    rows: Optional[List[List[float]]] = None
+    columns: Optional[Dict[str, List[float]]] = None
+    records: Optional[List[Dict[str, Union[float, str]]]] = None
 
 
 # Fonction pour prétraiter les données avant la prédiction
 
 
-def preprocess_input(features):
+def preprocess_input(features, encoder):
     """
     Applique le même encodage que celui utilisé pour entraîner le modèle.
     """
-    categorical_cols = ["State", "International plan", "Voice mail plan"]
+    return encoder.encode_record(features)
 
-    # Créer un DataFrame avec les nouvelles données
-    df_input = pd.DataFrame(
-        [features], columns=[f"feature_{i}" for i in range(len(features))]
-    )
 
-    # Ajouter les colonnes catégoriques avec une valeur par défaut si elles ne sont pas présentes
-    for col in categorical_cols:
-        if col not in df_input.columns:
-            df_input[col] = "unknown"  # ou une valeur par défaut
+def encode_batch(data, encoder):
+    """
+    Encode un lot de lignes dans une seule matrice NumPy pré-allouée,
+    dans l'ordre des features du modèle.
+    Les colonnes absentes sont remplies avec des 0.
+    """
+    payloads = [p for p in (data.rows, data.columns, data.records) if p is not None]
+    if len(payloads) != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Fournir exactement un des champs 'rows', 'columns' ou 'records'",
+        )
 
-    # Appliquer One-Hot Encoding
-    df_encoded = pd.get_dummies(df_input, columns=categorical_cols, drop_first=True)
+    n_features = encoder.n_features
 
-    # Vérifier si toutes les colonnes attendues sont présentes
-    expected_columns = model.feature_names_in_
-    for col in expected_columns:
-        if col not in df_encoded:
-            df_encoded[col] = 0  # Ajouter les colonnes manquantes avec des 0
+    if data.records is not None:
+        return encoder.encode_records(data.records)
 
-    df_encoded = df_encoded[expected_columns]  # Réordonner les colonnes
+    if data.rows is not None:
+        for i, row in enumerate(data.rows):
+            if len(row) != n_features:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Feature shape mismatch at row {i}, expected: {n_features}, got {len(row)}",
+                )
+        matrix = np.zeros((len(data.rows), n_features), dtype=np.float32)
+        if data.rows:
+            matrix[:] = data.rows
+        return matrix
+
+    column_index = encoder.column_index
+    unknown = [name for name in data.columns if name not in column_index]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Colonnes inconnues : {unknown}")
+
+    lengths = {len(values) for values in data.columns.values()}
+    if len(lengths) > 1:
+        raise HTTPException(
+            status_code=400, detail="Toutes les colonnes doivent avoir la même longueur"
+        )
+    n_rows = lengths.pop() if lengths else 0
 
-    return df_encoded.values.flatten()
+    matrix = np.zeros((n_rows, n_features), dtype=np.float32)
+    for name, values in data.columns.items():
+        matrix[:, column_index[name]] = values
+    return matrix
 
 
 @app.post("/predict")
-def predict(data: PredictionInput):
+async def predict(data: PredictionInput):
     try:
-        processed_features = preprocess_input(data.features)
+        metrics.request_started()
+
+        # Version du modèle utilisée de bout en bout par cette requête
+        snapshot = holder.current
 
         # Vérifier que le nombre de features correspond bien au modèle
-        if len(processed_features) != len(model.feature_names_in_):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Feature shape mismatch, expected: {len(model.feature_names_in_)}, got {len(processed_features)}",
-            )
+        try:
+            with metrics.stage("preprocess"):
+                processed_features = preprocess_input(data.features, snapshot.encoder)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        drift.observe(processed_features)
 
-        # Faire la prédiction
-        prediction = model.predict([processed_features])
+        # Réutiliser une prédiction récente du même vecteur avec le même modèle
+        with metrics.stage("cache"):
+            key = (snapshot.version, vector_key(processed_features))
+            proba = cache.get(key)
+        if proba is None:
+            # Faire la prédiction (regroupée avec les requêtes de même version) ;
+            # "batch_wait" inclut l'attente du lot et l'appel au modèle
+            with metrics.stage("batch_wait"):
+                proba = float(await batcher.submit(processed_features, key=snapshot))
+            cache.put(key, proba)
 
-        return {"prediction": int(prediction[0])}
+        metrics.handler_done()
+        return {"prediction": int(proba >= 0.5)}
 
+    except HTTPException:
+        raise
+    except OVERLOADED:
+        raise overloaded()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Point de terminaison pour réentraîner le modèle
-@app.post("/retrain")
-def retrain():
+def score_batch(data, snapshot):
     """
-    Endpoint pour réentraîner le modèle avec de nouveaux hyperparamètres.
-    Cette méthode peut être étendue pour accepter des paramètres via POST.
+    Encodage, cache et prédiction d'un lot (exécuté dans le pool d'inférence).
+    """
+    with metrics.stage("preprocess"):
+        matrix = encode_batch(data, snapshot.encoder)
+    drift.observe_batch(matrix)
+    if matrix.shape[0] == 0:
+        return {"predictions": [], "probabilities": []}
+
+    # Chercher chaque ligne dans le cache, puis un seul appel au modèle
+    # pour toutes les lignes manquantes
+    with metrics.stage("cache"):
+        keys = [(snapshot.version, vector_key(row)) for row in matrix]
+        probas = np.array([cache.get(key, np.nan) for key in keys], dtype=np.float64)
+    missing = np.flatnonzero(np.isnan(probas))
+    if missing.size:
+        probas[missing] = predict_churn_proba(matrix[missing], snapshot)
+        for i in missing:
+            cache.put(keys[i], float(probas[i]))
+    predictions = (probas >= 0.5).astype(int)
+
+    return {
+        "predictions": predictions.tolist(),
+        "probabilities": probas.tolist(),
+    }
+
+
+@app.post("/predict/batch")
+async def predict_batch(data: BatchPredictionInput):
+    """
+    Prédit un lot de N lignes avec un seul appel à `predict_proba`.
     """
     try:
-        # Charger de nouveaux hyperparamètres et réentraîner ici
-        print("Réentrainement du modèle avec de nouveaux paramètres...")
-        # Exemple : réentraîner le modèle avec un nouveau fichier de données
-        # Enregistrer le modèle après réentrainement
-        # model.fit(X_train, y_train)  # Cette ligne est à adapter selon ton code
+        metrics.request_started()
+        result = await inference.run(score_batch, data, holder.current)
+        metrics.handler_done()
+        return result
+
+    except HTTPException:
+        raise
+    except OVERLOADED:
+        raise overloaded()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def explain_batch(data, snapshot, k):
+    """
+    Top-k des contributions de chaque ligne d'un lot, avec un seul appel à
+    `pred_contribs` pour les lignes absentes du cache (pool d'inférence).
+    """
+    with metrics.stage("preprocess"):
+        matrix = encode_batch(data, snapshot.encoder)
+    n_features = snapshot.encoder.n_features
+    if not 1 <= k <= n_features:
+        raise HTTPException(status_code=400, detail=f"top_k doit être compris entre 1 et {n_features}")
+
+    with metrics.stage("cache"):
+        keys = [(snapshot.version, vector_key(row)) for row in matrix]
+        contribs = np.empty((len(matrix), n_features + 1), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = explanation_cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                contribs[i] = cached
+    if missing:
+        with metrics.stage("explain"):
+            contribs[missing] = contributions(snapshot.model, matrix[missing])
+        for i in missing:
+            explanation_cache.put(keys[i], contribs[i].copy())
+
+    # Tableaux compacts : noms des features une seule fois, puis indices et
+    # contributions (log-odds) triés par importance ; biais = marge de base
+    indices, values = top_features(contribs, k)
+    return {
+        "features": snapshot.encoder.columns,
+        "indices": indices.tolist(),
+        "contributions": values.tolist(),
+        "bias": contribs[:, -1].tolist(),
+    }
 
-        with open(MODEL_PATH, "wb") as f:
-            pickle.dump(model, f)
 
-        return {"message": "Modèle réentraîné avec succès"}
+@app.post("/explain/batch")
+async def explain(data: BatchPredictionInput, top_k: int = DEFAULT_TOP_K):
+    """
+    Raisons de chaque prédiction d'un lot : les `top_k` features de plus forte
+    contribution (TreeSHAP), positives si elles augmentent le risque de churn.
+    """
+    try:
+        metrics.request_started()
+        result = await inference.run(explain_batch, data, holder.current, top_k)
+        metrics.handler_done()
+        return result
+
+    except HTTPException:
+        raise
+    except OVERLOADED:
+        raise overloaded()
     except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Erreur lors du réentraînement : {str(e)}"
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def live_score(vector, snapshot):
+    """
+    Probabilité calculée à la volée (cache, puis micro-batching).
+    """
+    key = (snapshot.version, vector_key(vector))
+    proba = cache.get(key)
+    if proba is None:
+        proba = float(await batcher.submit(vector, key=snapshot))
+        cache.put(key, proba)
+    return proba
+
+
+def score_response(subscriber_id, proba, snapshot, source, scored_at=None):
+    return {
+        "subscriber_id": subscriber_id,
+        "probability": proba,
+        "prediction": int(proba >= 0.5),
+        "model_version": snapshot.version,
+        "scored_at": scored_at,
+        "source": source,
+    }
+
+
+@app.get("/score/{subscriber_id}")
+async def score(subscriber_id: str):
+    """
+    Score précalculé d'un abonné, lu dans le store (recherche dichotomique
+    en mémoire mappée). Si l'entrée est périmée (autre version du modèle ou
+    trop ancienne), l'abonné est rescoré à la volée à partir de ses features
+    stockées. Abonné inconnu : 404 (utiliser POST avec ses features).
+    """
+    snapshot = holder.current
+    entry, fresh = scores.lookup(subscriber_id, snapshot.version)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Abonné absent du store : {subscriber_id}")
+    if fresh:
+        return score_response(subscriber_id, entry.probability, snapshot, "store", entry.scored_at)
+    return await score_live(subscriber_id, np.array(entry.features), snapshot)
+
+
+@app.post("/score/{subscriber_id}")
+async def score_or_predict(subscriber_id: str, data: PredictionInput):
+    """
+    Comme GET, avec les features de l'abonné pour le calcul à la volée en
+    cas d'absence ou de péremption dans le store.
+    """
+    snapshot = holder.current
+    entry, fresh = scores.lookup(subscriber_id, snapshot.version)
+    if fresh:
+        return score_response(subscriber_id, entry.probability, snapshot, "store", entry.scored_at)
+    try:
+        vector = preprocess_input(data.features, snapshot.encoder)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    drift.observe(vector)
+    return await score_live(subscriber_id, vector, snapshot)
+
+
+async def score_live(subscriber_id, vector, snapshot):
+    try:
+        proba = await live_score(vector, snapshot)
+    except OVERLOADED:
+        raise overloaded()
+    return score_response(subscriber_id, proba, snapshot, "live")
+
+
+@app.get("/stats/scores")
+def score_store_stats():
+    """
+    Génération servie et compteurs hits / absents / périmés du store de scores.
+    """
+    return scores.stats()
+
+
+@app.get("/stats/batching")
+def batching_stats():
+    """
+    Profondeur de file et histogramme des tailles de lot du micro-batching.
+    """
+    return batcher.stats()
+
+
+@app.get("/stats/inference")
+def inference_stats():
+    """
+    Tâches en cours / en attente et rejets du pool d'inférence.
+    """
+    return inference.stats()
+
+
+@app.get("/stats/drift")
+def drift_stats(current: bool = False):
+    """
+    Dernier rapport de dérive publié (PSI/KS par feature et par catégorie),
+    ou, avec `current=true`, le rapport cumulé calculé à la demande.
+    """
+    if not drift.enabled:
+        raise HTTPException(status_code=404, detail="Profil de référence absent : suivi de dérive désactivé")
+    return {"stats": drift.stats(), "report": drift.snapshot() if current else drift.latest}
+
+
+@app.get("/stats/cache")
+def cache_stats():
+    """
+    Compteurs hits / misses / évictions du cache de prédictions.
+    """
+    return cache.stats()
+
+
+@app.get("/stats/explanations")
+def explanation_cache_stats():
+    """
+    Compteurs du cache des explications.
+    """
+    return explanation_cache.stats()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Métriques au format Prometheus : durées par étape, requêtes, lots,
+    cache et version du modèle.
+    """
+    batching = batcher.stats()
+    extra = gauge_lines("churn_batcher_queue_depth", "Requêtes en attente de lot", batching["queue_depth"])
+    extra += gauge_lines("churn_inference_executor", "Pool d'inférence borné", inference.stats())
+    extra += gauge_lines(
+        "churn_prediction_cache", "Compteurs du cache de prédictions",
+        {key: value for key, value in cache.stats().items() if key != "hit_rate"},
+    )
+    extra += gauge_lines(
+        "churn_explanation_cache", "Compteurs du cache des explications",
+        {key: value for key, value in explanation_cache.stats().items() if key != "hit_rate"},
+    )
+    if drift.latest is not None:
+        features = drift.latest["features"]
+        extra += gauge_lines(
+            "churn_feature_psi", "PSI de chaque feature (dernière fenêtre)", {f["feature"]: f["psi"] for f in features}
         )
+        extra += gauge_lines(
+            "churn_feature_ks", "KS de chaque feature (dernière fenêtre)", {f["feature"]: f["ks"] for f in features}
+        )
+    return Response(metrics.render(extra), media_type=CONTENT_TYPE)
+
+
+@app.post("/debug/profile")
+async def debug_profile(seconds: float = 10.0):
+    """
+    Profilage par échantillonnage pendant `seconds` secondes (PROFILER_ENABLED=1).
+    Retourne les piles repliées, à passer à flamegraph.pl ou speedscope.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profilage désactivé (PROFILER_ENABLED=1)")
+    try:
+        collapsed = await run_in_threadpool(profile, seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(collapsed, media_type="text/plain")
+
+
+@app.get("/model")
+def model_info():
+    """
+    Version du modèle actuellement servie.
+    """
+    snapshot = holder.current
+    return {
+        "version": snapshot.version,
+        "loaded_at": snapshot.loaded_at,
+        # Lots servis par le prédicteur compilé (0 : XGBoost pour tous les lots)
+        "compiled_max_rows": getattr(snapshot.predictor, "max_rows", 0),
+        "reloads": holder.reloads,
+        "failed_reloads": holder.failed_reloads,
+    }
+
+
+@app.post("/model/reload")
+def reload_model():
+    """
+    Force la vérification de la source et le rechargement du modèle.
+    """
+    reloaded = holder.reload_if_changed()
+    return {"reloaded": reloaded, "version": holder.current.version}
+
+
+# Paramètres du réentraînement incrémental (tous optionnels)
+class RetrainInput(BaseModel):
+    mode: str = "continue"
+    rounds: int = DEFAULT_ROUNDS
+    data_path: Optional[str] = None
+
+
+# Seul répertoire dont /retrain accepte de lire un historique (`data_path`,
+# relatif à ce répertoire) ; sans configuration, seul l'historique par défaut est lu
+RETRAIN_DATA_DIR = os.environ.get("RETRAIN_DATA_DIR")
+
+
+def retrain_history_path(data_path):
+    """
+    Historique à lire pour un réentraînement : `data_path` doit rester dans
+    RETRAIN_DATA_DIR (liens symboliques et ".." résolus), sinon 400.
+    """
+    if data_path is None:
+        return DEFAULT_HISTORY_PATH
+    if not RETRAIN_DATA_DIR:
+        raise HTTPException(status_code=400, detail="data_path désactivé (RETRAIN_DATA_DIR non configuré)")
+    root = os.path.realpath(RETRAIN_DATA_DIR)
+    path = os.path.realpath(os.path.join(root, data_path))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=400, detail="data_path doit désigner un fichier de RETRAIN_DATA_DIR")
+    return path
+
+
+# Point de terminaison pour réentraîner le modèle
+@app.post("/retrain", status_code=202)
+async def retrain(params: Optional[RetrainInput] = None):
+    """
+    Lance en arrière-plan, dans un processus séparé, un réentraînement
+    incrémental sur les lignes ajoutées à l'historique depuis le dernier
+    passage. Retourne tout de suite un identifiant de job (statut via GET /retrain/{job_id}) ; le
+    nouveau modèle est rechargé à chaud une fois sauvegardé.
+    """
+    params = params or RetrainInput()
+    if params.mode not in RETRAIN_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode inconnu : {params.mode} ({', '.join(RETRAIN_MODES)})")
+    job_id = retrain_jobs.submit(
+        model_path=MODEL_PATH,
+        history_path=retrain_history_path(params.data_path),
+        mode=params.mode,
+        rounds=params.rounds,
+        nthread=int(os.environ.get("RETRAIN_NTHREAD", "1")),
+        register_name=os.environ.get("MODEL_REGISTRY_NAME", "XGBoost_Model"),
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/retrain/{job_id}")
+def retrain_status(job_id: str):
+    job = retrain_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job inconnu : {job_id}")
+    return job
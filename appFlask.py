@@ -1,106 +1,143 @@
-from flask import Flask, render_template, request
-import pickle
-import numpy as np
-import pandas as pd
+from flask import Flask, Response, abort, render_template, request
+import os
+import time
+from explanations import contributions, top_k
+from model_holder import ModelHolder
+from sampling_profiler import PROFILER_ENABLED, ProfilerBusy, profile
+from serving_metrics import CONTENT_TYPE, ServingMetrics
 
 app = Flask(__name__)
 
+# Nombre de raisons affichées sous la prédiction
+REASONS_SHOWN = int(os.environ.get("FLASK_REASONS_SHOWN", "3"))
+
 # Charger le modèle
 MODEL_PATH = "model.pkl"
+holder = ModelHolder(
+    MODEL_PATH,
+    registry_name=os.environ.get("MODEL_REGISTRY_NAME"),
+    poll_interval=float(os.environ.get("MODEL_WATCH_INTERVAL", "5")),
+)
 try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
+    holder.load()
+    holder.start_watching()
     print("✅ Modèle chargé avec succès !")
 except FileNotFoundError:
     print("⚠️ Erreur : Modèle non trouvé. Exécutez d'abord le processus de formation.")
-    model = None
-
-# Liste des features du modèle
-categorical_cols = ["State", "International plan", "Voice mail plan"]
-feature_names = [
-    "State",
-    "Account length",
-    "Area code",
-    "International plan",
-    "Voice mail plan",
-    "Number vmail messages",
-    "Total day calls",
-    "Total day charge",
-    "Total eve calls",
-    "Total eve charge",
-    "Total night calls",
-    "Total night charge",
-    "Total intl calls",
-    "Total intl charge",
-]
 
+# Durées par étape, compteurs de requêtes et version du modèle (/metrics)
+metrics = ServingMetrics("flask", holder)
+
+
+@app.before_request
+def start_request_timer():
+    request.environ["metrics.start"] = time.perf_counter()
+    metrics.in_flight.inc()
 
-# Fonction pour prétraiter les données avant la prédiction
-def preprocess_input(features):
-    """
-    Applique le même encodage que celui utilisé pour entraîner le modèle.
-    """
-    # Créer un DataFrame avec les nouvelles données
-    df_input = pd.DataFrame(
-        [features], columns=[f"feature_{i}" for i in range(len(features))]
-    )
 
-    # Ajouter les colonnes catégoriques avec une valeur par défaut si elles ne sont pas présentes
-    for col in categorical_cols:
-        if col not in df_input.columns:
-            df_input[col] = "unknown"  # ou une valeur par défaut
+@app.teardown_request
+def record_request(exc=None):
+    start = request.environ.pop("metrics.start", None)
+    if start is None:
+        return
+    metrics.in_flight.dec()
+    path = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.request_seconds.observe(time.perf_counter() - start, path)
 
-    # Appliquer One-Hot Encoding
-    df_encoded = pd.get_dummies(df_input, columns=categorical_cols, drop_first=True)
 
-    # Vérifier si toutes les colonnes attendues sont présentes
-    expected_columns = model.feature_names_in_
-    for col in expected_columns:
-        if col not in df_encoded:
-            df_encoded[col] = 0  # Ajouter les colonnes manquantes avec des 0
+@app.after_request
+def count_request(response):
+    path = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.requests.inc(path, request.method, str(response.status_code))
+    return response
 
-    df_encoded = df_encoded[expected_columns]  # Réordonner les colonnes
 
-    return df_encoded.values.flatten()
+def current_feature_names(snapshot):
+    """
+    Liste des features brutes attendues par le formulaire.
+    """
+    return snapshot.encoder.input_columns if snapshot is not None else []
+
+
+# Fonction pour prétraiter les données avant la prédiction
+def preprocess_input(features, encoder):
+    """
+    Applique le même encodage que celui utilisé pour entraîner le modèle.
+    """
+    return encoder.encode_record(features)
 
 
 @app.route("/", methods=["GET"])
 def index():
-    return render_template("index.html", feature_names=feature_names)
+    return render_template("index.html", feature_names=current_feature_names(holder.current))
 
 
 @app.route("/predict", methods=["POST"])
 def predict():
+    snapshot = holder.current
+    feature_names = current_feature_names(snapshot)
     try:
-        # Récupérer les données du formulaire et les convertir en float
-        features = [float(x) for x in request.form.getlist("features")]
-        processed_features = preprocess_input(features)
+        # Récupérer les données du formulaire (colonnes brutes, catégories en texte)
+        with metrics.stage("parse"):
+            values = request.form.getlist("features")
 
-        # Vérifier que le nombre de features correspond bien au modèle
-        if len(processed_features) != len(model.feature_names_in_):
+        # Vérifier que le nombre de features correspond bien au formulaire
+        if len(values) != len(feature_names):
             return render_template(
                 "index.html",
                 feature_names=feature_names,
                 error="Erreur de dimensions des features",
             )
-
-        # Faire la prédiction
-        prediction = model.predict([processed_features])[0]
-        probas = model.predict_proba([processed_features])[0]
+        with metrics.stage("preprocess"):
+            processed_features = preprocess_input(dict(zip(feature_names, values)), snapshot.encoder)
+
+        # Faire la prédiction (un seul appel au modèle)
+        metrics.batch_size.observe(1)
+        with metrics.stage("predict"):
+            probas = (snapshot.predictor or snapshot.model).predict_proba(processed_features.reshape(1, -1))[0]
+        prediction = int(probas[1] >= 0.5)
+
+        # Principales raisons de la prédiction (contributions TreeSHAP, en log-odds)
+        with metrics.stage("explain"):
+            indices, values = top_k(contributions(snapshot.model, processed_features.reshape(1, -1)), REASONS_SHOWN)
+        reasons = [
+            (snapshot.encoder.columns[i], round(float(value), 3)) for i, value in zip(indices[0], values[0])
+        ]
 
         # Transformer 1 -> "Churn" et 0 -> "No Churn"
         prediction_label = "Churn" if prediction == 1 else "No Churn"
 
-        return render_template(
-            "index.html",
-            feature_names=feature_names,
-            prediction=prediction_label,
-            probability_churn=round(probas[1], 2),
-            probability_no_churn=round(probas[0], 2),
-        )
+        with metrics.stage("serialize"):
+            return render_template(
+                "index.html",
+                feature_names=feature_names,
+                prediction=prediction_label,
+                probability_churn=round(probas[1], 2),
+                probability_no_churn=round(probas[0], 2),
+                reasons=reasons,
+            )
     except Exception as e:
         return render_template("index.html", feature_names=feature_names, error=str(e))
 
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+@app.route("/debug/profile", methods=["POST"])
+def debug_profile():
+    """
+    Profilage par échantillonnage pendant `seconds` secondes (PROFILER_ENABLED=1).
+    """
+    if not PROFILER_ENABLED:
+        abort(404)
+    try:
+        collapsed = profile(float(request.args.get("seconds", "10")))
+    except ProfilerBusy:
+        abort(409)
+    return Response(collapsed, content_type="text/plain")
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001, debug=True)
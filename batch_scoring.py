@@ -0,0 +1,314 @@
+import io
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_encoder import load_encoder
+from model_pipeline import load_model
+from model_serving import set_nthread
+
+# Taille par défaut d'un bloc lu depuis le fichier d'entrée
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def read_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Lit un CSV ou un Parquet par blocs de `chunksize` lignes.
+    """
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def prefetch(iterable, maxsize=2):
+    """
+    Consomme `iterable` dans un thread de fond, avec au plus `maxsize`
+    éléments d'avance (pipeline producteur / consommateur borné).
+    """
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        """
+        Dépose `item` dès qu'il y a de la place ; False si le consommateur
+        s'est arrêté (aucun `put` ne bloque indéfiniment).
+        """
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+        finally:
+            # Libère le lecteur (et son fichier) dès l'arrêt, sans attendre le GC
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=producer, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def encode_chunks(chunks, encoder, id_column=None):
+    """
+    Encode chaque bloc avec le plan d'encodage du modèle.
+    Retourne (identifiants ou None, matrice float32).
+    """
+    for chunk in chunks:
+        ids = chunk[id_column].to_numpy() if id_column else None
+        yield ids, encoder.transform(chunk)
+
+
+class PredictionWriter:
+    """
+    Écrit les prédictions au fil de l'eau dans un CSV ou un Parquet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet_writer = None
+        self._csv_file = None
+
+    def write(self, frame):
+        if is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            if self._csv_file is None:
+                self._csv_file = open(self.path, "w", newline="")
+                frame.to_csv(self._csv_file, index=False)
+            else:
+                frame.to_csv(self._csv_file, index=False, header=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._csv_file is not None:
+            self._csv_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def predictions_frame(ids, probas, id_column=None, threshold=0.5, reasons=None):
+    """
+    Met en forme les prédictions d'un bloc, suivies des explications
+    (`reasons`, colonnes de `explanations.reasons_frame`) si demandées.
+    """
+    frame = pd.DataFrame(
+        {
+            "churn_probability": probas.astype(np.float32),
+            "prediction": (probas >= threshold).astype(np.int8),
+        }
+    )
+    if id_column:
+        frame.insert(0, id_column, ids)
+    if reasons is not None:
+        frame = pd.concat([frame, reasons], axis=1)
+    return frame
+
+
+def explain_chunk(model, encoder, matrix, explain_k):
+    """
+    Top-k des contributions d'un bloc (None si les explications ne sont pas demandées).
+    """
+    if not explain_k:
+        return None
+    from explanations import contributions, reasons_frame
+
+    return reasons_frame(contributions(model, matrix), encoder.columns, explain_k)
+
+
+def score_file(
+    model,
+    encoder,
+    input_path,
+    output_path,
+    chunksize=DEFAULT_CHUNKSIZE,
+    id_column=None,
+    pipeline=False,
+    explain_k=None,
+):
+    """
+    Score un fichier CSV/Parquet par blocs et écrit les prédictions au fur et
+    à mesure : la mémoire reste bornée par la taille d'un bloc, quelle que
+    soit la taille du fichier. Avec `pipeline=True`, la lecture et l'encodage
+    du bloc suivant se font pendant la prédiction du bloc courant. Avec
+    `explain_k`, les `explain_k` features les plus contributives de chaque
+    ligne sont ajoutées (`pred_contribs`, un appel par bloc).
+    """
+    encoded = encode_chunks(read_chunks(input_path, chunksize), encoder, id_column)
+    if pipeline:
+        encoded = prefetch(encoded)
+
+    with PredictionWriter(output_path) as writer:
+        for ids, matrix in encoded:
+            probas = model.predict_proba(matrix)[:, 1]
+            reasons = explain_chunk(model, encoder, matrix, explain_k)
+            writer.write(predictions_frame(ids, probas, id_column, reasons=reasons))
+
+    print(f"✅ {writer.rows} lignes scorées, prédictions écrites dans {output_path}")
+    return writer.rows
+
+
+def csv_shards(path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Découpe un CSV en plages d'octets d'environ `chunksize` lignes, alignées
+    sur les fins de ligne. Chaque worker lit et parse lui-même sa plage.
+    (Les champs entre guillemets contenant des retours à la ligne ne sont pas
+    supportés.)
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = f.tell()
+        sample = f.readlines(1 << 20)
+        row_bytes = sum(map(len, sample)) / len(sample) if sample else 1
+        target = max(1, int(row_bytes * chunksize))
+
+        while start < size:
+            f.seek(min(start + target, size))
+            if f.tell() < size:
+                f.readline()
+            end = f.tell()
+            yield ("csv", path, header, start, end)
+            start = end
+
+
+def parquet_shards(path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Découpe un Parquet en shards d'au plus `chunksize` lignes. Un row group
+    assez petit est lu par le worker lui-même ; un row group plus grand (cas
+    par défaut d'un fichier écrit d'un bloc) est lu ici par lots de
+    `chunksize` lignes, transmis tels quels aux workers.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for i in range(parquet_file.num_row_groups):
+        if parquet_file.metadata.row_group(i).num_rows <= chunksize:
+            yield ("parquet", path, i)
+            continue
+        for batch in parquet_file.iter_batches(batch_size=chunksize, row_groups=[i]):
+            yield ("batch", batch)
+
+
+def read_shard(shard):
+    if shard[0] == "csv":
+        _, path, header, start, end = shard
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return pd.read_csv(io.BytesIO(header + data))
+
+    if shard[0] == "batch":
+        return shard[1].to_pandas()
+
+    import pyarrow.parquet as pq
+
+    _, path, row_group = shard
+    return pq.ParquetFile(path).read_row_group(row_group).to_pandas()
+
+
+# État propre à chaque worker du pool (modèle chargé une seule fois)
+_worker = {}
+
+
+def _init_worker(model_path, nthread):
+    model = load_model(model_path)
+    set_nthread(model, nthread)
+    _worker["model"] = model
+    _worker["encoder"] = load_encoder(model_path, model)
+
+
+def _score_shard(shard, id_column, explain_k=None):
+    chunk = read_shard(shard)
+    ids = chunk[id_column].to_numpy() if id_column else None
+    matrix = _worker["encoder"].transform(chunk)
+    probas = _worker["model"].predict_proba(matrix)[:, 1]
+    return ids, probas, explain_chunk(_worker["model"], _worker["encoder"], matrix, explain_k)
+
+
+def score_file_parallel(
+    model_path,
+    input_path,
+    output_path,
+    workers=None,
+    nthread=1,
+    chunksize=DEFAULT_CHUNKSIZE,
+    id_column=None,
+    explain_k=None,
+):
+    """
+    Score un fichier en parallèle sur un pool de processus.
+
+    Le fichier est découpé en shards, chaque worker charge le modèle une fois
+    (initializer) puis lit, encode et score ses shards. Les résultats sont
+    réécrits dans l'ordre du fichier d'entrée, avec au plus 2 shards en vol
+    par worker pour borner la mémoire.
+    """
+    workers = workers or max(1, (os.cpu_count() or 1) // nthread)
+    shards = parquet_shards(input_path, chunksize) if is_parquet(input_path) else csv_shards(input_path, chunksize)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(model_path, nthread)
+    ) as executor, PredictionWriter(output_path) as writer:
+        in_flight = deque()
+        for shard in shards:
+            in_flight.append(executor.submit(_score_shard, shard, id_column, explain_k))
+            if len(in_flight) >= 2 * workers:
+                ids, probas, reasons = in_flight.popleft().result()
+                writer.write(predictions_frame(ids, probas, id_column, reasons=reasons))
+        while in_flight:
+            ids, probas, reasons = in_flight.popleft().result()
+            writer.write(predictions_frame(ids, probas, id_column, reasons=reasons))
+
+    print(
+        f"✅ {writer.rows} lignes scorées par {workers} worker(s) x {nthread} thread(s), "
+        f"prédictions écrites dans {output_path}"
+    )
+    return writer.rows
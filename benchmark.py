@@ -0,0 +1,382 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from explanations import contributions
+from model_pipeline import evaluate_model, load_model, prepare_data, save_model, train_model
+from native_training import MemorySampler
+
+# Tailles de dataset nommées, utilisables avec --sizes
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Nombre de lignes générées et écrites à la fois (mémoire bornée même à 10M lignes)
+GENERATE_CHUNK_ROWS = 500_000
+
+# Seuil par défaut de détection des régressions (+10 %)
+DEFAULT_THRESHOLD = 0.10
+
+# Métriques comparées entre deux exécutions
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+STATES = ["AK", "AL", "AZ", "CA", "CO", "FL", "GA", "IL", "MA", "MI", "NJ", "NY", "OH", "TX", "WA"]
+
+
+def parse_size(size):
+    """
+    "10k" -> 10000, "1m" -> 1000000, ou un entier tel quel.
+    """
+    size = str(size).lower()
+    if size in SIZES:
+        return SIZES[size]
+    if size[-1] in "km":
+        return int(float(size[:-1]) * (1_000 if size[-1] == "k" else 1_000_000))
+    return int(size)
+
+
+def synthetic_churn_frame(n_rows, seed=0):
+    """
+    Données synthétiques au format du dataset churn (mêmes colonnes brutes que
+    celles attendues par `prepare_data`), avec une cible corrélée aux appels
+    au service client, au forfait international et aux minutes de jour.
+    """
+    rng = np.random.default_rng(seed)
+
+    def normal(mean, std, low=0):
+        return np.maximum(low, rng.normal(mean, std, n_rows)).round(1)
+
+    df = pd.DataFrame(
+        {
+            "State": rng.choice(STATES, n_rows),
+            "Account length": rng.integers(1, 244, n_rows),
+            "Area code": rng.choice([408, 415, 510], n_rows),
+            "International plan": rng.choice(["No", "Yes"], n_rows, p=[0.9, 0.1]),
+            "Voice mail plan": rng.choice(["No", "Yes"], n_rows, p=[0.72, 0.28]),
+            "Total day minutes": normal(180, 54),
+            "Total day calls": rng.poisson(100, n_rows),
+            "Total eve minutes": normal(200, 50),
+            "Total eve calls": rng.poisson(100, n_rows),
+            "Total night minutes": normal(200, 50),
+            "Total night calls": rng.poisson(100, n_rows),
+            "Total intl minutes": normal(10, 2.8),
+            "Total intl calls": rng.poisson(4.5, n_rows),
+            "Customer service calls": rng.poisson(1.5, n_rows),
+        }
+    )
+
+    score = (
+        -3.0
+        + 0.6 * df["Customer service calls"].to_numpy()
+        + 1.8 * (df["International plan"].to_numpy() == "Yes")
+        + 0.015 * (df["Total day minutes"].to_numpy() - 180)
+        - 0.6 * (df["Voice mail plan"].to_numpy() == "Yes")
+    )
+    df["Churn"] = rng.random(n_rows) < 1 / (1 + np.exp(-score))
+    return df
+
+
+def generate_dataset(path, n_rows, seed=0, chunk_rows=GENERATE_CHUNK_ROWS):
+    """
+    Écrit un CSV synthétique de `n_rows` lignes, bloc par bloc.
+    """
+    written = 0
+    with open(path, "w", newline="") as f:
+        while written < n_rows:
+            n = min(chunk_rows, n_rows - written)
+            frame = synthetic_churn_frame(n, seed=seed + written)
+            frame.to_csv(f, index=False, header=written == 0)
+            written += n
+    return path
+
+
+def summarize(samples, peak_rss):
+    """
+    Percentiles (en ms) d'une liste de durées en secondes.
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "samples": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "peak_rss_mb": float(peak_rss),
+    }
+
+
+def time_stage(fn, repeat=1, setup=None):
+    """
+    Exécute `fn` `repeat` fois. Retourne (résumé, dernier résultat).
+    `setup` est appelé avant chaque exécution, hors chronométrage.
+    """
+    samples = []
+    result = None
+    with MemorySampler() as memory:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            result = fn()
+            samples.append(time.perf_counter() - start)
+    return summarize(samples, memory.peak), result
+
+
+def time_requests(send, payloads):
+    """
+    Une requête par payload, chronométrée individuellement.
+    """
+    samples = []
+    with MemorySampler() as memory:
+        for payload in payloads:
+            start = time.perf_counter()
+            response = send(payload)
+            samples.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"⚠️ Requête en échec ({response.status_code}) : {response.text[:200]}")
+    return summarize(samples, memory.peak)
+
+
+@contextmanager
+def serving(holder, model_path):
+    """
+    Sert temporairement le modèle du benchmark via le `ModelHolder` d'une
+    application, puis restaure le modèle d'origine.
+    """
+    original_path, original_snapshot = holder.model_path, holder.current
+    holder.model_path = model_path
+    try:
+        holder.load()
+        yield holder.current
+    finally:
+        holder.model_path = original_path
+        holder._snapshot = original_snapshot
+
+
+def json_records(frame):
+    """
+    Lignes brutes (sans la cible) au format JSON des API.
+    """
+    records = frame.drop(columns=["Churn"]).to_dict(orient="records")
+    return [{key: value.item() if hasattr(value, "item") else value for key, value in r.items()} for r in records]
+
+
+def requests_during(job_done, send, payloads):
+    """
+    Rejoue les payloads en boucle tant que `job_done()` est faux (au moins
+    une fois chacun), chaque requête chronométrée individuellement.
+    """
+    samples = []
+    with MemorySampler() as memory:
+        i = 0
+        while i < len(payloads) or not job_done():
+            start = time.perf_counter()
+            response = send(payloads[i % len(payloads)])
+            samples.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"⚠️ Requête en échec ({response.status_code}) : {response.text[:200]}")
+            i += 1
+    return summarize(samples, memory.peak)
+
+
+def bench_fastapi(model_path, records, batches, history_path=None):
+    import app as fastapi_app
+    from fastapi.testclient import TestClient
+
+    results = {}
+    with serving(fastapi_app.holder, model_path), TestClient(fastapi_app.app) as client:
+        # Lignes toutes différentes : le cache de prédictions ne sert jamais
+        fastapi_app.cache.clear()
+        results["fastapi_predict_single"] = time_requests(
+            lambda record: client.post("/predict", json={"features": record}), records
+        )
+        fastapi_app.cache.clear()
+        results[f"fastapi_predict_batch_{len(batches[0])}"] = time_requests(
+            lambda batch: client.post("/predict/batch", json={"records": batch}), batches
+        )
+        fastapi_app.cache.clear()
+
+        if history_path is not None:
+            # Latence de /predict pendant un réentraînement (processus séparé) :
+            # doit rester proche de fastapi_predict_single
+            job_id = fastapi_app.retrain_jobs.submit(
+                model_path=model_path, history_path=history_path, nthread=1, register_name=None
+            )
+            results["fastapi_predict_during_retrain"] = requests_during(
+                lambda: fastapi_app.retrain_jobs.get(job_id)["status"] in ("succeeded", "failed"),
+                lambda record: client.post("/predict", json={"features": record}),
+                records,
+            )
+            fastapi_app.cache.clear()
+    return results
+
+
+def bench_flask(model_path, records):
+    import appFlask
+
+    client = appFlask.app.test_client()
+    with serving(appFlask.holder, model_path) as snapshot:
+        columns = snapshot.encoder.input_columns
+        forms = [{"features": [str(record.get(name, 0)) for name in columns]} for record in records]
+        return {"flask_predict_single": time_requests(lambda form: client.post("/predict", data=form), forms)}
+
+
+def run_size(n_rows, workdir, repeat=3, n_requests=200, batch_size=256, n_batches=20, seed=0):
+    """
+    Benchmark complet pour un dataset de `n_rows` lignes.
+    """
+    train_path = generate_dataset(os.path.join(workdir, f"train-{n_rows}.csv"), n_rows, seed=seed)
+    test_path = generate_dataset(
+        os.path.join(workdir, f"test-{n_rows}.csv"), max(1_000, n_rows // 4), seed=seed + 1
+    )
+    model_path = os.path.join(workdir, f"model-{n_rows}.pkl")
+    cache_dir = os.path.join(workdir, "prepared")
+    results = {}
+
+    print(f"📌 Benchmark sur {n_rows} lignes...")
+    results["prepare_data_cold"], _ = time_stage(
+        lambda: prepare_data(train_path, test_path, cache_dir=None), repeat
+    )
+    prepare_data(train_path, test_path, cache_dir=cache_dir)
+    results["prepare_data_cached"], (X_train, _, _, _, encoder) = time_stage(
+        lambda: prepare_data(train_path, test_path, return_encoder=True, cache_dir=cache_dir), repeat
+    )
+    results["train_model"], model = time_stage(lambda: train_model(train_path), repeat)
+    results["evaluate_model"], _ = time_stage(lambda: evaluate_model(model, test_path), repeat)
+    results["save_model"], _ = time_stage(lambda: save_model(model, model_path, encoder=encoder), repeat)
+    results["load_model"], _ = time_stage(lambda: load_model(model_path), repeat)
+
+    # Coût d'une explication (TreeSHAP exact) face à la prédiction, pour 1 000 lignes
+    sample = X_train[:1_000]
+    results["predict_proba_1k"], _ = time_stage(lambda: model.predict_proba(sample), repeat)
+    results["explain_1k"], _ = time_stage(lambda: contributions(model, sample, approximate=False), repeat)
+
+    records = json_records(synthetic_churn_frame(n_requests, seed=seed + 2))
+    batch_records = json_records(synthetic_churn_frame(batch_size * n_batches, seed=seed + 3))
+    batches = [batch_records[i : i + batch_size] for i in range(0, len(batch_records), batch_size)]
+    results.update(bench_fastapi(model_path, records, batches, history_path=test_path))
+    results.update(bench_flask(model_path, records))
+
+    for stage, summary in results.items():
+        print(
+            f"⏱️ {stage:<32} p50={summary['p50_ms']:9.2f} ms  p95={summary['p95_ms']:9.2f} ms  "
+            f"p99={summary['p99_ms']:9.2f} ms  RSS max={summary['peak_rss_mb']:7.0f} Mo"
+        )
+    return results
+
+
+def environment():
+    import xgboost
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgboost.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(sizes, output, workdir=None, **kwargs):
+    """
+    Lance le benchmark pour chaque taille et écrit les résultats en JSON.
+    """
+    report = {"environment": environment(), "results": {}}
+    with tempfile.TemporaryDirectory(prefix="bench-", dir=workdir) as tmp_dir:
+        for size in sizes:
+            for stage, summary in run_size(parse_size(size), tmp_dir, **kwargs).items():
+                report["results"][f"{size}/{stage}"] = summary
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Résultats du benchmark écrits dans {output}")
+    return report
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare deux rapports. Retourne la liste des régressions : métriques
+    dépassant la référence de plus de `threshold` (en relatif).
+    """
+    regressions = []
+    for key, reference in baseline["results"].items():
+        measured = current["results"].get(key)
+        if measured is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = reference.get(metric), measured.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            if change > threshold:
+                regressions.append(
+                    {"stage": key, "metric": metric, "baseline": before, "current": after, "change": change}
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de l'entraînement et du service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Générer un dataset synthétique")
+    generate.add_argument("--rows", default="10k", help="Nombre de lignes (10k, 1m, 10m...)")
+    generate.add_argument("--output", required=True, help="Fichier CSV de sortie")
+    generate.add_argument("--seed", type=int, default=0)
+
+    bench = commands.add_parser("run", help="Lancer le benchmark")
+    bench.add_argument("--sizes", default="10k", help="Tailles séparées par des virgules (10k,1m,10m)")
+    bench.add_argument("--output", default="benchmark.json", help="Fichier JSON des résultats")
+    bench.add_argument("--repeat", type=int, default=3, help="Répétitions par étape")
+    bench.add_argument("--requests", type=int, default=200, help="Requêtes unitaires par API")
+    bench.add_argument("--batch_size", type=int, default=256, help="Lignes par requête /predict/batch")
+    bench.add_argument("--workdir", help="Répertoire des fichiers temporaires")
+
+    check = commands.add_parser("compare", help="Comparer à une référence")
+    check.add_argument("baseline", help="Rapport JSON de référence")
+    check.add_argument("current", help="Rapport JSON à vérifier")
+    check.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Tolérance relative")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generate_dataset(args.output, parse_size(args.rows), seed=args.seed)
+        print(f"✅ {parse_size(args.rows)} lignes écrites dans {args.output}")
+        return 0
+
+    if args.command == "run":
+        run(
+            args.sizes.split(","),
+            args.output,
+            workdir=args.workdir,
+            repeat=args.repeat,
+            n_requests=args.requests,
+            batch_size=args.batch_size,
+        )
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for r in regressions:
+        print(
+            f"❌ Régression {r['stage']} {r['metric']} : {r['baseline']:.2f} -> {r['current']:.2f} "
+            f"(+{r['change']:.0%})"
+        )
+    if not regressions:
+        print(f"✅ Aucune régression au-delà de {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
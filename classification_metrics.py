@@ -0,0 +1,91 @@
+import numpy as np
+
+# Bornes des probabilités dans la log-loss (évite log(0))
+LOGLOSS_EPSILON = 1e-15
+
+
+def confusion_matrix(y_true, y_pred):
+    """
+    Matrice de confusion binaire [[TN, FP], [FN, TP]] en un seul comptage.
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    y_pred = np.asarray(y_pred).astype(np.int64)
+    return np.bincount(2 * y_true + y_pred, minlength=4).reshape(2, 2)
+
+
+def accuracy(y_true, y_pred):
+    y_true = np.asarray(y_true)
+    if not len(y_true):
+        return float("nan")
+    return float(np.mean(y_true == np.asarray(y_pred)))
+
+
+def log_loss(y_true, proba):
+    y_true = np.asarray(y_true, dtype=np.float64)
+    proba = np.clip(np.asarray(proba, dtype=np.float64), LOGLOSS_EPSILON, 1 - LOGLOSS_EPSILON)
+    return float(-np.mean(y_true * np.log(proba) + (1 - y_true) * np.log1p(-proba)))
+
+
+def score_counts(y_true, proba):
+    """
+    Scores distincts (croissants) et effectifs de positifs / négatifs par
+    score : représentation compacte, cumulable bloc par bloc, dont dérivent
+    l'AUC et les matrices de confusion à tout seuil.
+    """
+    y_true = np.asarray(y_true).astype(bool).ravel()
+    scores, inverse = np.unique(np.asarray(proba, dtype=np.float64).ravel(), return_inverse=True)
+    inverse = inverse.ravel()
+    positives = np.bincount(inverse[y_true], minlength=len(scores))
+    negatives = np.bincount(inverse, minlength=len(scores)) - positives
+    return scores, positives, negatives
+
+
+def roc_auc_from_counts(positives, negatives):
+    """
+    Aire sous la courbe ROC (Mann-Whitney) à partir des effectifs par score
+    croissant : chaque positif compte les négatifs de score inférieur, les
+    ex-aequo pour moitié. NaN si une seule classe est présente.
+    """
+    n_pos, n_neg = int(np.sum(positives)), int(np.sum(negatives))
+    if not n_pos or not n_neg:
+        return float("nan")
+    negatives = np.asarray(negatives, dtype=np.float64)
+    below = np.cumsum(negatives) - negatives
+    return float(np.sum(positives * (below + negatives / 2)) / (n_pos * n_neg))
+
+
+def roc_auc(y_true, proba):
+    """
+    Aire sous la courbe ROC, ex-aequo comptés pour moitié. NaN si une seule
+    classe est présente.
+    """
+    _, positives, negatives = score_counts(y_true, proba)
+    return roc_auc_from_counts(positives, negatives)
+
+
+def confusion_at(scores, positives, negatives, threshold):
+    """
+    Matrice de confusion [[TN, FP], [FN, TP]] en prédisant positif tout
+    score >= `threshold`, à partir des effectifs par score croissant.
+    """
+    start = int(np.searchsorted(scores, threshold, side="left"))
+    tn, fn = int(np.sum(negatives[:start])), int(np.sum(positives[:start]))
+    fp, tp = int(np.sum(negatives[start:])), int(np.sum(positives[start:]))
+    return np.array([[tn, fp], [fn, tp]], dtype=np.int64)
+
+
+def binary_metrics(y_true, proba, threshold=0.5):
+    """
+    Accuracy, AUC, log-loss et matrice de confusion d'un classifieur binaire,
+    calculées sur des tableaux NumPy (aucune boucle Python par ligne).
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    scores, positives, negatives = score_counts(y_true, proba)
+    confusion = confusion_at(scores, positives, negatives, threshold)
+    return {
+        "accuracy": float(np.trace(confusion) / max(len(y_true), 1)),
+        "auc": roc_auc_from_counts(positives, negatives),
+        "logloss": log_loss(y_true, proba),
+        "confusion": confusion.tolist(),
+    }
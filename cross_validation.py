@@ -0,0 +1,190 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+
+from classification_metrics import binary_metrics
+from dataset_cache import DEFAULT_CACHE_DIR
+from model_pipeline import SELECTED_FEATURES, prepare_cached
+from native_training import DEFAULT_NUM_BOOST_ROUND, train_params
+
+DEFAULT_FOLDS = 5
+
+# Lignes lues à la fois dans le memmap (seule copie des données dans un worker)
+BLOCK_ROWS = 65_536
+
+CV_METRICS = ("accuracy", "auc", "logloss")
+
+
+def assign_folds(y, k, seed=0):
+    """
+    Pli de chaque ligne (0..k-1), stratifié : chaque pli garde la proportion
+    de churn du dataset. Déterministe pour un `seed` donné, ce qui permet à
+    chaque worker de le recalculer au lieu de le recevoir.
+    """
+    if k < 2:
+        raise ValueError("⚠️ La validation croisée demande au moins 2 plis")
+    y = np.asarray(y)
+    if len(y) < k:
+        raise ValueError(f"⚠️ {len(y)} lignes pour {k} plis")
+    rng = np.random.default_rng(seed)
+    folds = np.empty(len(y), dtype=np.int16)
+    start = 0
+    for label in np.unique(y):
+        rows = rng.permutation(np.flatnonzero(y == label))
+        # Décalage d'une classe à l'autre : tailles de plis équilibrées
+        folds[rows] = (np.arange(len(rows)) + start) % k
+        start += len(rows)
+    return folds
+
+
+class FoldIter(xgb.DataIter):
+    """
+    Lignes d'entraînement d'un pli, lues par blocs dans le memmap partagé :
+    XGBoost les quantifie au fil de l'eau, sans copie de la matrice entière.
+    """
+
+    def __init__(self, X, y, keep, block_rows=BLOCK_ROWS):
+        self.X = X
+        self.y = y
+        self.keep = keep
+        self.block_rows = block_rows
+        self._start = 0
+        super().__init__()
+
+    def next(self, input_data):
+        while self._start < len(self.X):
+            start, end = self._start, min(self._start + self.block_rows, len(self.X))
+            self._start = end
+            mask = self.keep[start:end]
+            if mask.any():
+                input_data(
+                    data=self.X[start:end][mask],
+                    label=self.y[start:end][mask],
+                    feature_names=list(SELECTED_FEATURES),
+                )
+                return True
+        return False
+
+    def reset(self):
+        self._start = 0
+
+
+# Données du worker : X et y ouverts une seule fois en mémoire mappée
+# (pages partagées entre tous les processus), plis recalculés localement
+_worker = {}
+
+
+def _init_worker(data_dir, k, seed, nthread):
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+    _worker.update(X=X, y=y, folds=assign_folds(y, k, seed), nthread=nthread)
+
+
+def _predict_rows(booster, X, rows, block_rows=BLOCK_ROWS):
+    """
+    Probabilités des lignes sélectionnées par `rows`, bloc par bloc.
+    """
+    probas = [
+        booster.inplace_predict(X[start:start + block_rows][rows[start:start + block_rows]])
+        for start in range(0, len(X), block_rows)
+        if rows[start:start + block_rows].any()
+    ]
+    return np.concatenate(probas) if probas else np.empty(0)
+
+
+def _run_fold(fold, params, num_boost_round):
+    start = time.perf_counter()
+    X, y, folds = _worker["X"], _worker["y"], _worker["folds"]
+    test = folds == fold
+
+    dtrain = xgb.QuantileDMatrix(FoldIter(X, y, ~test), nthread=_worker["nthread"])
+    booster = xgb.train(train_params(params, _worker["nthread"]), dtrain, num_boost_round=num_boost_round)
+    del dtrain
+
+    result = binary_metrics(y[test], _predict_rows(booster, X, test))
+    result.update(
+        fold=fold,
+        train_rows=int(len(y) - test.sum()),
+        test_rows=int(test.sum()),
+        seconds=time.perf_counter() - start,
+    )
+    return result
+
+
+def aggregate_folds(results):
+    """
+    Moyenne et écart-type de chaque métrique sur les plis, matrice de
+    confusion cumulée.
+    """
+    summary = {}
+    for name in CV_METRICS:
+        values = np.array([r[name] for r in results], dtype=np.float64)
+        summary[f"{name}_mean"] = float(np.nanmean(values))
+        summary[f"{name}_std"] = float(np.nanstd(values, ddof=1)) if len(values) > 1 else 0.0
+    summary["confusion"] = np.sum([r["confusion"] for r in results], axis=0).tolist()
+    return summary
+
+
+def cross_validate(
+    train_path,
+    k=DEFAULT_FOLDS,
+    params=None,
+    num_boost_round=DEFAULT_NUM_BOOST_ROUND,
+    workers=None,
+    nthread=1,
+    seed=0,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """
+    Validation croisée stratifiée à `k` plis sur un pool de processus.
+
+    Le CSV est préparé une seule fois dans le cache (`X.npy`, `y.npy`) ;
+    chaque worker l'ouvre en mémoire mappée et entraîne ses plis sur les
+    lignes lues par blocs, sans copie ni sérialisation de la matrice.
+
+    Retourne (résultats par pli, résumé agrégé avec la durée totale).
+    """
+    start = time.perf_counter()
+    workers = workers or max(1, min(k, (os.cpu_count() or 1) // nthread))
+    data_dir = prepare_cached(train_path, cache_dir)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(data_dir, k, seed, nthread)
+    ) as executor:
+        futures = [executor.submit(_run_fold, fold, params, num_boost_round) for fold in range(k)]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(
+                f"📊 Pli {result['fold']} : accuracy={result['accuracy']:.4f}, auc={result['auc']:.4f}, "
+                f"logloss={result['logloss']:.4f} ({result['seconds']:.2f} s)"
+            )
+
+    summary = aggregate_folds(results)
+    summary.update(workers=workers, seconds=time.perf_counter() - start)
+    return results, summary
+
+
+def log_cv_to_mlflow(tracker, results, summary, params=None):
+    """
+    Enregistre les métriques de chaque pli (une étape par pli), le résumé et
+    les paramètres sur le run de `tracker`, en un seul `log_batch`.
+    """
+    metrics = []
+    for result in results:
+        (tn, fp), (fn, tp) = result["confusion"]
+        values = {name: result[name] for name in CV_METRICS}
+        values.update(tn=tn, fp=fp, fn=fn, tp=tp, seconds=result["seconds"])
+        metrics.extend((f"cv_fold_{name}", value, result["fold"]) for name, value in values.items())
+
+    (tn, fp), (fn, tp) = summary["confusion"]
+    totals = {key: value for key, value in summary.items() if key not in ("confusion", "workers")}
+    totals.update(tn=tn, fp=fp, fn=fn, tp=tp)
+    metrics.extend((f"cv_{name}", value, 0) for name, value in totals.items())
+
+    params = {"cv_folds": len(results), "cv_workers": summary["workers"], **(params or {})}
+    tracker.log_batch(params=params, metrics=metrics)
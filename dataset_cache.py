@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+
+# Répertoire par défaut du cache des datasets préparés
+DEFAULT_CACHE_DIR = os.environ.get("PREPARED_CACHE_DIR", os.path.join(".cache", "prepared"))
+
+# À incrémenter si le format des fichiers du cache change
+CACHE_FORMAT_VERSION = 1
+
+
+def file_digest(path, block_size=1 << 20):
+    """
+    Empreinte du contenu d'un fichier source.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(path, columns, categorical_cols, encoder=None):
+    """
+    Clé d'un dataset préparé : contenu du fichier source + schéma d'encodage
+    (+ plan d'encodage imposé, le cas échéant). Toute modification de l'un
+    ou de l'autre produit une nouvelle clé.
+    """
+    schema = json.dumps(
+        {
+            "version": CACHE_FORMAT_VERSION,
+            "columns": list(columns),
+            "categorical": list(categorical_cols),
+            "encoder": encoder.to_dict() if encoder is not None else None,
+        },
+        sort_keys=True,
+    )
+    schema_digest = hashlib.blake2b(schema.encode(), digest_size=8).hexdigest()
+    return f"{file_digest(path)}-{schema_digest}"
+
+
+def entry_dir(cache_dir, key):
+    return os.path.join(cache_dir, key)
+
+
+def load_prepared(cache_dir, key):
+    """
+    Charge un dataset préparé depuis le cache, en mémoire mappée (sans copie).
+    Retourne (X, y, encoder) ou None si l'entrée n'existe pas.
+    """
+    path = entry_dir(cache_dir, key)
+    if not os.path.isdir(path):
+        return None
+    X = np.load(os.path.join(path, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(path, "y.npy"), mmap_mode="r")
+    encoder = FeatureEncoder.load(os.path.join(path, "encoder.json"))
+    return X, y, encoder
+
+
+def save_prepared(cache_dir, key, X, y, encoder):
+    """
+    Écrit un dataset préparé dans le cache. L'entrée est construite dans un
+    répertoire temporaire puis renommée : un lecteur ne voit jamais une
+    entrée incomplète.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    try:
+        np.save(os.path.join(tmp_path, "X.npy"), np.ascontiguousarray(X, dtype=np.float32))
+        np.save(os.path.join(tmp_path, "y.npy"), np.ascontiguousarray(y))
+        with open(os.path.join(tmp_path, "encoder.json"), "w") as f:
+            json.dump(encoder.to_dict(), f)
+        os.rename(tmp_path, entry_dir(cache_dir, key))
+    except OSError as e:
+        # Entrée déjà écrite par un autre processus, ou écriture impossible
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(entry_dir(cache_dir, key)):
+            print(f"⚠️ Dataset préparé non mis en cache : {e}")
@@ -0,0 +1,502 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Version du format du profil de référence
+PROFILE_FORMAT_VERSION = 1
+
+# Nombre d'intervalles (quantiles de la référence) par feature numérique
+DEFAULT_BINS = 20
+
+# Seuil de PSI au-delà duquel une feature est signalée (0.1 : à surveiller, 0.2 : dérive)
+PSI_THRESHOLD = float(os.environ.get("DRIFT_PSI_THRESHOLD", "0.2"))
+
+# Plancher des proportions dans le calcul du PSI (évite log(0) sur un intervalle vide)
+PSI_EPSILON = 1e-4
+
+
+def profile_path_for(model_path):
+    """
+    Profil de référence sauvegardé à côté d'un modèle (`model.pkl` -> `model.profile.json`).
+    """
+    return os.path.splitext(model_path)[0] + ".profile.json"
+
+
+def _category_groups(encoder):
+    """
+    Catégorie -> (valeurs, positions des colonnes one-hot), catégories encodées seulement.
+    """
+    groups = {}
+    for col, slots in encoder.category_slots.items():
+        if slots:
+            values = sorted(slots)
+            groups[col] = (values, [slots[value] for value in values])
+    return groups
+
+
+def _category_counts(rows, columns):
+    """
+    Effectifs de chaque valeur d'une catégorie, plus "autre" (aucune case à 1).
+    """
+    hot = rows[:, columns] > 0.5
+    return np.append(hot.sum(axis=0), (~hot.any(axis=1)).sum())
+
+
+def build_profile(X, encoder, bins=DEFAULT_BINS, source=None):
+    """
+    Profil de référence des données d'entraînement encodées : moments,
+    bornes, intervalles (quantiles) et leurs proportions pour chaque
+    feature, fréquences de chaque catégorie.
+    """
+    X = np.asarray(X)
+    one_hot = {i for _, columns in _category_groups(encoder).values() for i in columns}
+    features = []
+    for i, name in enumerate(encoder.columns):
+        column = X[:, i].astype(np.float64)
+        finite = column[np.isfinite(column)]
+        if i in one_hot:
+            cuts = np.array([0.5])
+        elif finite.size:
+            cuts = np.unique(np.quantile(finite, np.linspace(0, 1, bins + 1)[1:-1]))
+        else:
+            cuts = np.array([], dtype=np.float64)
+        counts = np.bincount(np.searchsorted(cuts, finite, side="right"), minlength=len(cuts) + 1)
+        features.append(
+            {
+                "name": name,
+                "one_hot": i in one_hot,
+                "mean": float(finite.mean()) if finite.size else 0.0,
+                "std": float(finite.std()) if finite.size else 0.0,
+                "min": float(finite.min()) if finite.size else 0.0,
+                "max": float(finite.max()) if finite.size else 0.0,
+                "cuts": cuts.tolist(),
+                "proportions": (counts / max(finite.size, 1)).tolist(),
+            }
+        )
+
+    categories = {}
+    for col, (values, columns) in _category_groups(encoder).items():
+        counts = _category_counts(X, columns)
+        categories[col] = {
+            "values": values + ["<autre>"],
+            "columns": columns,
+            "proportions": (counts / max(len(X), 1)).tolist(),
+        }
+
+    return {
+        "format_version": PROFILE_FORMAT_VERSION,
+        "created_at": time.time(),
+        "source": source,
+        "rows": int(len(X)),
+        "features": features,
+        "categories": categories,
+    }
+
+
+def save_profile(profile, path):
+    """
+    Écriture atomique du profil (JSON).
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, path)
+    print(f"💾 Profil de référence sauvegardé sous {path} ({profile['rows']} lignes)")
+
+
+def load_profile(path):
+    with open(path) as f:
+        profile = json.load(f)
+    if profile.get("format_version", 0) > PROFILE_FORMAT_VERSION:
+        raise ValueError(f"⚠️ Profil en version {profile['format_version']}, non supporté")
+    return profile
+
+
+def population_stability_index(expected, actual):
+    """
+    PSI entre deux distributions sur les mêmes intervalles (proportions).
+    """
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), PSI_EPSILON)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(expected, actual):
+    """
+    Statistique de Kolmogorov-Smirnov évaluée aux bornes des intervalles :
+    écart maximal entre les fonctions de répartition cumulées.
+    """
+    return float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected)), initial=0.0))
+
+
+class StreamingStats:
+    """
+    Statistiques de flux à mémoire constante, fusionnables (`merge`) :
+
+    - moyenne et variance par feature (Welford, combinaison de Chan) ;
+    - min / max, valeurs non finies, valeurs hors de l'étendue de référence ;
+    - histogramme sur les intervalles de la référence (esquisse de quantiles :
+      PSI, KS et quantiles approchés) ;
+    - effectifs de chaque catégorie.
+
+    Aucune ligne brute n'est conservée : la mémoire ne dépend que du nombre
+    de features et d'intervalles.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        features = profile["features"]
+        n_features = len(features)
+        self.cuts = [np.asarray(feature["cuts"], dtype=np.float64) for feature in features]
+        self.offsets = np.cumsum([0] + [len(cuts) + 1 for cuts in self.cuts])
+        self.ref_min = np.array([feature["min"] for feature in features])
+        self.ref_max = np.array([feature["max"] for feature in features])
+        self.groups = [(col, group["columns"]) for col, group in profile["categories"].items()]
+
+        self.rows = 0
+        self.count = np.zeros(n_features, dtype=np.int64)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+        self.nonfinite = np.zeros(n_features, dtype=np.int64)
+        self.out_of_range = np.zeros(n_features, dtype=np.int64)
+        self.bins = np.zeros(self.offsets[-1], dtype=np.int64)
+        self.categories = [np.zeros(len(columns) + 1, dtype=np.int64) for _, columns in self.groups]
+
+    def update(self, rows):
+        """
+        Intègre un bloc de lignes encodées (n_lignes, n_features).
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if not len(rows):
+            return
+        finite = np.isfinite(rows)
+        count = finite.sum(axis=0)
+        values = np.where(finite, rows, 0.0)
+        safe_count = np.maximum(count, 1)
+        mean = values.sum(axis=0) / safe_count
+        m2 = (np.where(finite, rows - mean, 0.0) ** 2).sum(axis=0)
+        self._combine(count, mean, m2)
+
+        self.rows += len(rows)
+        self.min = np.fmin(self.min, np.where(finite, rows, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(finite, rows, -np.inf).max(axis=0))
+        self.nonfinite += len(rows) - count
+        self.out_of_range += (finite & ((rows < self.ref_min) | (rows > self.ref_max))).sum(axis=0)
+
+        # Intervalle de chaque valeur, décalé par feature, puis un seul comptage
+        indices = [
+            np.searchsorted(cuts, rows[finite[:, i], i], side="right") + offset
+            for i, (cuts, offset) in enumerate(zip(self.cuts, self.offsets))
+        ]
+        self.bins += np.bincount(np.concatenate(indices), minlength=len(self.bins))
+        for counts, (_, columns) in zip(self.categories, self.groups):
+            counts += _category_counts(rows, columns)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        safe_total = np.maximum(total, 1)
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta**2 * self.count * count / safe_total
+        self.count = total
+
+    def merge(self, other):
+        """
+        Ajoute les statistiques d'un autre flux (même profil de référence).
+        """
+        self._combine(other.count, other.mean, other.m2)
+        self.rows += other.rows
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.nonfinite += other.nonfinite
+        self.out_of_range += other.out_of_range
+        self.bins += other.bins
+        for counts, other_counts in zip(self.categories, other.categories):
+            counts += other_counts
+        return self
+
+    def quantile(self, i, q):
+        """
+        Quantile approché de la feature `i`, interpolé dans l'histogramme.
+        """
+        counts = self.bins[self.offsets[i]:self.offsets[i + 1]]
+        if not counts.sum():
+            return float("nan")
+        edges = np.concatenate(([self.min[i]], self.cuts[i], [self.max[i]]))
+        edges = np.clip(edges, self.min[i], self.max[i])
+        cumulative = np.concatenate(([0.0], np.cumsum(counts) / counts.sum()))
+        return float(np.interp(q, cumulative, edges))
+
+    def report(self, psi_threshold=PSI_THRESHOLD):
+        """
+        Dérive de chaque feature et catégorie par rapport à la référence.
+        """
+        reference = self.profile
+        features = []
+        for i, ref in enumerate(reference["features"]):
+            counts = self.bins[self.offsets[i]:self.offsets[i + 1]]
+            actual = counts / max(counts.sum(), 1)
+            std = float(np.sqrt(self.m2[i] / self.count[i])) if self.count[i] else 0.0
+            psi = population_stability_index(ref["proportions"], actual)
+            features.append(
+                {
+                    "feature": ref["name"],
+                    "psi": psi,
+                    "ks": ks_statistic(ref["proportions"], actual),
+                    "mean": float(self.mean[i]),
+                    "std": std,
+                    "reference_mean": ref["mean"],
+                    "reference_std": ref["std"],
+                    "median": self.quantile(i, 0.5),
+                    "min": float(self.min[i]) if self.count[i] else None,
+                    "max": float(self.max[i]) if self.count[i] else None,
+                    "nonfinite_rate": float(self.nonfinite[i] / max(self.rows, 1)),
+                    "out_of_range_rate": float(self.out_of_range[i] / max(self.rows, 1)),
+                    "drift": psi >= psi_threshold,
+                }
+            )
+
+        categories = []
+        for counts, (col, _) in zip(self.categories, self.groups):
+            ref = reference["categories"][col]
+            actual = counts / max(counts.sum(), 1)
+            psi = population_stability_index(ref["proportions"], actual)
+            categories.append(
+                {
+                    "category": col,
+                    "psi": psi,
+                    "frequencies": dict(zip(ref["values"], actual.tolist())),
+                    "reference_frequencies": dict(zip(ref["values"], ref["proportions"])),
+                    "drift": psi >= psi_threshold,
+                }
+            )
+
+        # Petit échantillon face à la référence : seuil critique du test KS à 5 %
+        n, m = max(self.rows, 1), max(reference["rows"], 1)
+        return {
+            "rows": int(self.rows),
+            "reference_rows": reference["rows"],
+            "ks_critical": float(1.36 * np.sqrt((n + m) / (n * m))),
+            "drifted_features": [f["feature"] for f in features if f["drift"]]
+            + [c["category"] for c in categories if c["drift"]],
+            "features": features,
+            "categories": categories,
+        }
+
+
+class DriftMonitor:
+    """
+    Suivi en ligne de la dérive des entrées du service.
+
+    `observe(vecteur)` ne fait que copier le vecteur encodé dans un tampon
+    de taille fixe (quelques microsecondes) ; le tampon est intégré d'un
+    coup, de façon vectorisée, aux statistiques de la fenêtre courante quand
+    il est plein. Toutes les `publish_interval` secondes, un thread de fond
+    calcule PSI/KS contre le profil de référence et publie le rapport en un
+    seul envoi à chaque `sink` (liste de documents), puis ouvre une nouvelle
+    fenêtre ; la fenêtre close est fusionnée dans les statistiques cumulées.
+
+    Sans profil de référence, le suivi est désactivé (`observe` ne fait rien).
+    """
+
+    def __init__(self, profile_path=None, buffer_rows=256, publish_interval=60.0, min_rows=100, sinks=()):
+        self.profile_path = profile_path
+        self.buffer_rows = buffer_rows
+        self.publish_interval = publish_interval
+        self.min_rows = min_rows
+        self.sinks = list(sinks)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._profile_mtime = None
+        self.profile = None
+        self.window = None
+        self.total = None
+        self.latest = None
+        self.publishes = 0
+        self.failed_publishes = 0
+        self.load_reference()
+
+    @property
+    def enabled(self):
+        return self.profile is not None
+
+    def load_reference(self):
+        """
+        (Re)charge le profil de référence s'il a changé ; les statistiques
+        repartent de zéro. Retourne True si un nouveau profil a été chargé.
+        """
+        if not self.profile_path or not os.path.exists(self.profile_path):
+            return False
+        mtime = os.stat(self.profile_path).st_mtime_ns
+        if mtime == self._profile_mtime:
+            return False
+        profile = load_profile(self.profile_path)
+        n_features = len(profile["features"])
+        with self._lock:
+            self.profile = profile
+            self._profile_mtime = mtime
+            self._buffer = np.empty((self.buffer_rows, n_features), dtype=np.float32)
+            self._buffered = 0
+            self.window = StreamingStats(profile)
+            self.total = StreamingStats(profile)
+        print(f"📊 Profil de référence chargé pour le suivi de dérive : {self.profile_path}")
+        return True
+
+    def observe(self, vector):
+        """
+        Enregistre un vecteur encodé servi par /predict.
+        """
+        if self.profile is None or len(vector) != self._buffer.shape[1]:
+            return
+        with self._lock:
+            self._buffer[self._buffered] = vector
+            self._buffered += 1
+            if self._buffered == self.buffer_rows:
+                self.window.update(self._buffer)
+                self._buffered = 0
+
+    def observe_batch(self, matrix):
+        """
+        Enregistre un lot de vecteurs encodés (intégré directement).
+        """
+        if self.profile is None or matrix.ndim != 2 or matrix.shape[1] != self._buffer.shape[1]:
+            return
+        with self._lock:
+            self.window.update(matrix)
+
+    def _drain(self):
+        if self._buffered:
+            self.window.update(self._buffer[:self._buffered])
+            self._buffered = 0
+
+    def snapshot(self):
+        """
+        Rapport sur les statistiques cumulées (fenêtre en cours comprise).
+        """
+        if self.profile is None:
+            return None
+        with self._lock:
+            self._drain()
+            merged = StreamingStats(self.profile).merge(self.total).merge(self.window)
+        return merged.report()
+
+    def publish(self):
+        """
+        Clôt la fenêtre courante (si elle compte au moins `min_rows` lignes),
+        calcule son rapport et l'envoie aux `sinks`. Retourne le rapport.
+        """
+        self.load_reference()
+        if self.profile is None:
+            return None
+        with self._lock:
+            self._drain()
+            if self.window.rows < self.min_rows:
+                return None
+            window, self.window = self.window, StreamingStats(self.profile)
+            self.total.merge(window)
+
+        report = window.report()
+        report["published_at"] = time.time()
+        self.latest = report
+        self.publishes += 1
+        if report["drifted_features"]:
+            print(f"⚠️ Dérive détectée ({window.rows} lignes) : {report['drifted_features']}")
+
+        documents = report_documents(report)
+        for sink in self.sinks:
+            try:
+                sink(documents)
+            except Exception as e:
+                self.failed_publishes += 1
+                print(f"❌ Échec de la publication du rapport de dérive : {e}")
+        return report
+
+    def _run(self):
+        while not self._stop.wait(self.publish_interval):
+            try:
+                self.publish()
+            except Exception as e:
+                self.failed_publishes += 1
+                print(f"❌ Erreur du suivi de dérive : {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            pending = self._buffered + (self.window.rows if self.window is not None else 0)
+        return {
+            "enabled": self.enabled,
+            "window_rows": pending,
+            "total_rows": self.total.rows if self.total is not None else 0,
+            "publishes": self.publishes,
+            "failed_publishes": self.failed_publishes,
+            "drifted_features": len(self.latest["drifted_features"]) if self.latest else 0,
+        }
+
+
+def report_documents(report):
+    """
+    Un document par feature et par catégorie, pour un envoi groupé (`_bulk`).
+    """
+    common = {"published_at": report["published_at"], "rows": report["rows"]}
+    documents = [dict(common, type="feature", **feature) for feature in report["features"]]
+    documents.extend(dict(common, type="category", **category) for category in report["categories"])
+    return documents
+
+
+def elasticsearch_sink(host, index="churn-drift"):
+    """
+    Envoie les documents d'un rapport via le handler `_bulk` d'Elasticsearch
+    (file bornée, thread de fond : jamais bloquant).
+    """
+    from elasticsearch_logging import ElasticsearchHandler
+
+    handler = ElasticsearchHandler(host=host, index=index)
+
+    def sink(documents):
+        for document in documents:
+            handler.submit(document)
+
+    return sink
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profil de référence pour le suivi de dérive")
+    parser.add_argument("train_path", help="CSV d'entraînement du modèle")
+    parser.add_argument("--model", default="model.pkl", help="Modèle servi (profil sauvegardé à côté)")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS, help="Intervalles par feature numérique")
+    args = parser.parse_args(argv)
+
+    import pickle
+
+    import pandas as pd
+
+    from feature_encoder import load_encoder
+
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    encoder = load_encoder(args.model, model)
+    X = encoder.transform(pd.read_csv(args.train_path))
+    save_profile(build_profile(X, encoder, args.bins, source=args.train_path), profile_path_for(args.model))
+
+
+if __name__ == "__main__":
+    main()
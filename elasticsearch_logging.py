@@ -1,42 +1,232 @@
-import logging
 import datetime
-from elasticsearch import Elasticsearch
 import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
 
 # 🔹 Connexion à Elasticsearch
-ELASTICSEARCH_HOST = "http://localhost:9200"  # Assurez-vous qu'Elasticsearch tourne bien
-ELASTICSEARCH_INDEX = "mlflow-logs"  # Nom de l'index pour les logs
+ELASTICSEARCH_HOST = os.environ.get("ELASTICSEARCH_HOST", "http://localhost:9200")
+ELASTICSEARCH_INDEX = os.environ.get("ELASTICSEARCH_INDEX", "mlflow-logs")  # Nom de l'index pour les logs
+
+# Statuts HTTP pour lesquels un envoi est retenté (surcharge ou panne passagère)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def record_document(record):
+    """
+    Document Elasticsearch d'un enregistrement de log (construit directement,
+    sans passer par une chaîne JSON formatée puis relue).
+    """
+    return {
+        "timestamp": datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(),
+        "level": record.levelname,
+        "message": record.getMessage(),
+        "module": record.module,
+        "function": record.funcName,
+        "line": record.lineno,
+    }
 
-# 🔹 Configuration de la connexion
-try:
-    es = Elasticsearch([ELASTICSEARCH_HOST])
-    if not es.ping():
-        raise ValueError("Connexion à Elasticsearch échouée. Vérifiez que le service tourne.")
-except Exception as e:
-    print(f"❌ Erreur de connexion à Elasticsearch: {e}")
 
 # 🔹 Définir un logger personnalisé
 class ElasticsearchHandler(logging.Handler):
-    """ Handler personnalisé pour envoyer les logs vers Elasticsearch """
-    
+    """
+    Handler non bloquant : `emit` ne fait qu'ajouter le document à une file
+    bornée en mémoire. Un thread de fond envoie la file par lots via l'API
+    `_bulk`, dès que `batch_size` documents sont en attente ou que le plus
+    ancien a plus de `flush_interval` secondes. Si la file est pleine, le
+    document le plus ancien est abandonné (compteur `dropped`).
+    """
+
+    def __init__(
+        self,
+        host=ELASTICSEARCH_HOST,
+        index=ELASTICSEARCH_INDEX,
+        max_queue=10_000,
+        batch_size=500,
+        flush_interval=1.0,
+        max_retries=3,
+        backoff=0.5,
+        max_backoff=10.0,
+        timeout=5.0,
+        shutdown_timeout=5.0,
+    ):
+        super().__init__()
+        self.url = f"{host.rstrip('/')}/{index}/_bulk"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.shutdown_timeout = shutdown_timeout
+
+        self._queue = deque(maxlen=max_queue)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        self._flush_requested = False
+        self._in_flight = 0
+
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+
     def emit(self, record):
-        log_entry = self.format(record)
         try:
-            es.index(index=ELASTICSEARCH_INDEX, body=json.loads(log_entry))
-        except Exception as e:
-            print(f"❌ Erreur lors de l'envoi du log vers Elasticsearch: {e}")
-
-# 🔹 Configuration du format des logs
-log_formatter = logging.Formatter(
-    json.dumps({
-        "timestamp": "%(asctime)s",
-        "level": "%(levelname)s",
-        "message": "%(message)s",
-        "module": "%(module)s",
-        "function": "%(funcName)s",
-        "line": "%(lineno)d"
-    })
-)
+            self.submit(record_document(record))
+        except Exception:
+            self.handleError(record)
+
+    def submit(self, document):
+        """
+        Met un document en file d'envoi, sans jamais bloquer sur le réseau.
+        """
+        with self._cond:
+            if self._closing:
+                self.dropped += 1
+                return
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append((time.monotonic(), document))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="es-bulk", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _ready(self):
+        if self._closing or self._flush_requested:
+            return True
+        if len(self._queue) >= self.batch_size:
+            return True
+        return bool(self._queue) and time.monotonic() - self._queue[0][0] >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    timeout = None
+                    if self._queue:
+                        timeout = self._queue[0][0] + self.flush_interval - time.monotonic()
+                    self._cond.wait(timeout)
+                if not self._queue:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closing:
+                        return
+                    continue
+                batch = [self._queue.popleft()[1] for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+
+            self._send(batch)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _post(self, documents):
+        lines = []
+        for document in documents:
+            lines.append('{"index":{}}')
+            lines.append(json.dumps(document, default=str))
+        request = urllib.request.Request(
+            self.url,
+            data=("\n".join(lines) + "\n").encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def _send(self, documents):
+        """
+        Envoie un lot avec retentatives et backoff exponentiel (avec gigue).
+        Seuls les documents en erreur passagère (429, 5xx) sont renvoyés.
+        """
+        pending = documents
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                result = self._post(pending)
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRYABLE_STATUS:
+                    print(f"❌ Lot de logs refusé par Elasticsearch (HTTP {e.code})")
+                    break
+                continue
+            except (urllib.error.URLError, OSError, ValueError):
+                continue
+
+            self.batches += 1
+            if not result.get("errors"):
+                self.sent += len(pending)
+                return
+            retry = []
+            for document, item in zip(pending, result.get("items", [])):
+                status = next(iter(item.values()), {}).get("status", 500)
+                if status < 300:
+                    self.sent += 1
+                elif status in RETRYABLE_STATUS:
+                    retry.append(document)
+                else:
+                    self.failed += 1
+            if not retry:
+                return
+            pending = retry
+
+        self.failed += len(pending)
+        print(f"❌ Erreur lors de l'envoi de {len(pending)} log(s) vers Elasticsearch")
+
+    def flush(self, timeout=None):
+        """
+        Attend que la file soit vidée, au plus `timeout` secondes (défaut :
+        `shutdown_timeout`). `logging.shutdown` appelle `flush()` avant
+        `close()` : sans borne, la sortie d'une commande resterait bloquée
+        sur les retentatives quand Elasticsearch est indisponible.
+        """
+        if timeout is None:
+            timeout = self.shutdown_timeout
+        with self._cond:
+            if self._thread is None or self._closing:
+                return
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def close(self):
+        """
+        Vide la file puis arrête le thread d'envoi (au plus `shutdown_timeout`
+        secondes). Appelé automatiquement par `logging.shutdown` à la sortie.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.shutdown_timeout)
+        super().close()
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+        }
+
 
 # 🔹 Création du logger
 logger = logging.getLogger("elasticsearch_logger")
@@ -44,7 +234,6 @@ logger.setLevel(logging.INFO)
 
 # 🔹 Ajout du handler Elasticsearch
 es_handler = ElasticsearchHandler()
-es_handler.setFormatter(log_formatter)
 logger.addHandler(es_handler)
 
 # 🔹 Ajout d'un handler de console
@@ -60,4 +249,5 @@ def log_test():
 
 if __name__ == "__main__":
     log_test()
-
+    es_handler.flush(timeout=10)
+    print(f"📊 {es_handler.stats()}")
@@ -0,0 +1,238 @@
+import json
+import os
+
+import numpy as np
+
+from classification_metrics import confusion_at, roc_auc_from_counts, score_counts
+
+# Nombre maximal de scores distincts gardés exactement ; au-delà, les scores
+# sont arrondis à `DEFAULT_RESOLUTION` (mémoire bornée quel que soit le volume)
+MAX_DISTINCT_SCORES = 1_000_000
+DEFAULT_RESOLUTION = 1e-6
+
+# Points des courbes sauvegardées (échantillonnées selon la part de population ciblée)
+CURVE_POINTS = 1001
+
+CURVE_COLUMNS = (
+    "threshold", "population", "tp", "fp", "tpr", "fpr", "precision", "recall", "f1", "gain", "lift", "cost",
+)
+
+
+class ScoreAccumulator:
+    """
+    Effectifs de positifs et de négatifs par score distinct, triés, cumulés
+    bloc par bloc (`update`) ou fusionnés entre accumulateurs (`merge`) :
+    le jeu de test n'a jamais besoin de tenir en mémoire.
+
+    Toutes les métriques, pour tous les seuils, sont ensuite dérivées de
+    sommes cumulées sur ces tableaux triés (`report`, `curves`).
+    """
+
+    def __init__(self, max_distinct=MAX_DISTINCT_SCORES, resolution=DEFAULT_RESOLUTION):
+        self.max_distinct = max_distinct
+        self.resolution = resolution
+        self.rounded = False
+        self.rows = 0
+        self.scores = np.empty(0)
+        self.positives = np.empty(0, dtype=np.int64)
+        self.negatives = np.empty(0, dtype=np.int64)
+
+    def update(self, y_true, proba):
+        """
+        Ajoute un bloc de labels (0/1) et de probabilités de la classe positive.
+        """
+        y_true = np.asarray(y_true).astype(bool).ravel()
+        proba = np.asarray(proba, dtype=np.float64).ravel()
+        if len(y_true) != len(proba):
+            raise ValueError(f"⚠️ {len(y_true)} labels pour {len(proba)} probabilités")
+        if self.rounded:
+            proba = self._round(proba)
+        self._add(*score_counts(y_true, proba))
+        self.rows += len(proba)
+
+    def merge(self, other):
+        self._add(other.scores, other.positives, other.negatives)
+        self.rows += other.rows
+        return self
+
+    def _round(self, scores):
+        return np.round(scores / self.resolution) * self.resolution
+
+    def _add(self, scores, positives, negatives):
+        scores = np.concatenate((self.scores, scores))
+        if self.rounded:
+            scores = self._round(scores)
+        merged, inverse = np.unique(scores, return_inverse=True)
+        inverse = inverse.ravel()
+        self.positives = np.bincount(
+            inverse, weights=np.concatenate((self.positives, positives)), minlength=len(merged)
+        ).astype(np.int64)
+        self.negatives = np.bincount(
+            inverse, weights=np.concatenate((self.negatives, negatives)), minlength=len(merged)
+        ).astype(np.int64)
+        self.scores = merged
+        if not self.rounded and len(self.scores) > self.max_distinct:
+            self.rounded = True
+            self._add(np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def _cumulative(self):
+        """
+        Seuils décroissants et (vrais positifs, faux positifs) quand on
+        prédit positif toute ligne de score >= seuil.
+        """
+        thresholds = self.scores[::-1]
+        return thresholds, np.cumsum(self.positives[::-1]), np.cumsum(self.negatives[::-1])
+
+    def report(self, threshold=0.5, cost_fp=1.0, cost_fn=1.0):
+        """
+        Métriques au seuil `threshold`, AUC ROC et PR, lift du premier décile
+        et seuils optimaux (F1 maximal, coût `cost_fp * FP + cost_fn * FN`
+        minimal : coût d'une action inutile face à un churn manqué).
+        """
+        thresholds, tp, fp = self._cumulative()
+        P, N = int(self.positives.sum()), int(self.negatives.sum())
+        if not self.rows:
+            raise ValueError("⚠️ Aucune prédiction à évaluer")
+
+        confusion = confusion_at(self.scores, self.positives, self.negatives, threshold)
+        (tn_t, fp_t), (fn_t, tp_t) = confusion.tolist()
+        precision_t = tp_t / (tp_t + fp_t) if tp_t + fp_t else 0.0
+        recall_t = tp_t / P if P else 0.0
+        f1_t = 2 * precision_t * recall_t / (precision_t + recall_t) if precision_t + recall_t else 0.0
+
+        report = {
+            "rows": self.rows,
+            "positives": P,
+            "base_rate": P / self.rows,
+            "threshold": threshold,
+            "accuracy": (tp_t + tn_t) / self.rows,
+            "precision": precision_t,
+            "recall": recall_t,
+            "f1": f1_t,
+            "confusion": confusion.tolist(),
+            "distinct_scores": len(self.scores),
+            "rounded_scores": self.rounded,
+        }
+        if P and N:
+            tpr = np.concatenate(([0.0], tp / P))
+            precision = tp / (tp + fp)
+            report["roc_auc"] = roc_auc_from_counts(self.positives, self.negatives)
+            # Précision moyenne : aire sous la courbe précision / rappel en escalier
+            report["pr_auc"] = float(np.sum(np.diff(tpr) * precision))
+            # Lift du premier décile : part des churns captés en ciblant 10 % des clients, divisée par 10 %
+            population = np.concatenate(([0.0], (tp + fp) / self.rows))
+            report["lift_top_decile"] = float(np.interp(0.1, population, tpr) / 0.1)
+
+            f1 = 2 * tp / (tp + fp + P)
+            best = int(np.argmax(f1))
+            report["best_f1"] = {"threshold": float(thresholds[best]), "f1": float(f1[best])}
+        else:
+            report.update(roc_auc=None, pr_auc=None, lift_top_decile=None, best_f1=None)
+
+        # Coût de chaque seuil, y compris « ne cibler personne » (seuil au-dessus de tous les scores)
+        cost = np.concatenate(([cost_fn * P], cost_fp * fp + cost_fn * (P - tp)))
+        best = int(np.argmin(cost))
+        report["best_cost"] = {
+            "threshold": float(thresholds[best - 1]) if best else None,
+            "cost": float(cost[best]),
+            "cost_fp": cost_fp,
+            "cost_fn": cost_fn,
+            "population": float((tp[best - 1] + fp[best - 1]) / self.rows) if best else 0.0,
+        }
+        return report
+
+    def curves(self, points=CURVE_POINTS, cost_fp=1.0, cost_fn=1.0):
+        """
+        Courbes ROC, précision / rappel, gain, lift et coût, échantillonnées
+        en au plus `points` seuils répartis sur la part de population ciblée.
+        Retourne un dictionnaire colonne -> tableau.
+        """
+        thresholds, tp, fp = self._cumulative()
+        P, N = max(int(self.positives.sum()), 1), max(int(self.negatives.sum()), 1)
+        population = (tp + fp) / max(self.rows, 1)
+        grid = np.searchsorted(population, np.linspace(0, 1, points), side="left")
+        keep = np.unique(grid.clip(0, len(tp) - 1))
+        tp, fp, population, thresholds = tp[keep], fp[keep], population[keep], thresholds[keep]
+        precision = tp / np.maximum(tp + fp, 1)
+        recall = tp / P
+        return {
+            "threshold": thresholds,
+            "population": population,
+            "tp": tp,
+            "fp": fp,
+            "tpr": recall,
+            "fpr": fp / N,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * tp / (tp + fp + P),
+            "gain": recall,
+            "lift": precision / (P / max(self.rows, 1)),
+            "cost": cost_fp * fp + cost_fn * (P - tp),
+        }
+
+
+def save_report(report, curves, directory):
+    """
+    Écrit le rapport (`evaluation.json`) et les courbes (`threshold_curve.csv`).
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "evaluation.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    table = np.column_stack([curves[name] for name in CURVE_COLUMNS])
+    np.savetxt(
+        os.path.join(directory, "threshold_curve.csv"),
+        table,
+        delimiter=",",
+        header=",".join(CURVE_COLUMNS),
+        comments="",
+        fmt="%.10g",
+    )
+    return directory
+
+
+def evaluate_file(model, encoder, path, chunksize=None, accumulator=None):
+    """
+    Score un fichier de test (CSV/Parquet) bloc par bloc avec un seul appel
+    à `predict_proba` par bloc et cumule les scores.
+    """
+    from batch_scoring import DEFAULT_CHUNKSIZE, read_chunks
+    from feature_encoder import TARGET_COL
+
+    accumulator = accumulator or ScoreAccumulator()
+    for chunk in read_chunks(path, chunksize or DEFAULT_CHUNKSIZE):
+        if TARGET_COL not in chunk.columns:
+            raise ValueError("⚠️ La colonne 'Churn' est manquante dans les datasets.")
+        proba = model.predict_proba(encoder.transform(chunk))[:, 1]
+        accumulator.update(encoder.encode_target(chunk[TARGET_COL]), proba)
+    return accumulator
+
+
+def report_metrics(report):
+    """
+    Métriques scalaires du rapport, à enregistrer dans MLflow.
+    """
+    metrics = {
+        f"eval_{name}": report[name]
+        for name in ("accuracy", "precision", "recall", "f1", "roc_auc", "pr_auc", "lift_top_decile", "base_rate")
+        if report[name] is not None
+    }
+    if report["best_f1"]:
+        metrics["eval_best_f1_threshold"] = report["best_f1"]["threshold"]
+    if report["best_cost"]["threshold"] is not None:
+        metrics["eval_best_cost_threshold"] = report["best_cost"]["threshold"]
+    metrics["eval_best_cost"] = report["best_cost"]["cost"]
+    return metrics
+
+
+def log_evaluation(tracker, report, curves, directory):
+    """
+    Métriques en un seul `log_batch` et courbes en artefacts (`evaluation/`).
+    """
+    save_report(report, curves, directory)
+    params = {
+        "eval_threshold": report["threshold"],
+        "eval_cost_fp": report["best_cost"]["cost_fp"],
+        "eval_cost_fn": report["best_cost"]["cost_fn"],
+    }
+    tracker.log_batch(params=params, metrics=[(key, value, 0) for key, value in report_metrics(report).items()])
+    tracker.log_artifacts(directory, "evaluation")
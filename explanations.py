@@ -0,0 +1,121 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+# Nombre de features les plus contributives renvoyées par ligne
+DEFAULT_TOP_K = int(os.environ.get("EXPLAIN_TOP_K", "5"))
+
+# Contributions approchées (méthode de Saabas, un chemin par arbre) au lieu de
+# TreeSHAP exact : beaucoup moins coûteuses, mais moins fidèles (non cohérentes au sens de SHAP)
+APPROX_CONTRIBS = os.environ.get("EXPLAIN_APPROX", "0") == "1"
+
+
+def contributions(model, matrix, approximate=APPROX_CONTRIBS):
+    """
+    Contributions TreeSHAP de chaque feature (`pred_contribs` de XGBoost),
+    en un seul appel pour tout le lot. Retourne une matrice float32
+    (n, n_features + 1) : la dernière colonne est le biais, et la somme
+    d'une ligne est la marge (log-odds) prédite par le modèle.
+    """
+    import xgboost as xgb
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    # Même nombre d'arbres que predict_proba (arrêt anticipé éventuel)
+    best = getattr(model, "best_iteration", None)
+    data = xgb.DMatrix(np.ascontiguousarray(matrix, dtype=np.float32), missing=np.nan)
+    contribs = booster.predict(
+        data,
+        pred_contribs=True,
+        approx_contribs=approximate,
+        validate_features=False,
+        iteration_range=(0, best + 1) if best is not None else (0, 0),
+    )
+    return contribs.astype(np.float32, copy=False)
+
+
+def top_k(contribs, k=DEFAULT_TOP_K):
+    """
+    Les `k` features de plus forte contribution absolue par ligne, triées.
+    Retourne (indices int32 (n, k), contributions float32 (n, k)).
+    """
+    values = contribs[:, :-1]
+    k = min(k, values.shape[1])
+    if k < 1:
+        raise ValueError("⚠️ top_k doit être au moins 1")
+    magnitude = -np.abs(values)
+    indices = np.argpartition(magnitude, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(magnitude, indices, axis=1), axis=1, kind="stable")
+    indices = np.take_along_axis(indices, order, axis=1)
+    return indices.astype(np.int32), np.take_along_axis(values, indices, axis=1)
+
+
+def reasons_frame(contribs, feature_names, k=DEFAULT_TOP_K):
+    """
+    Colonnes `top_feature_j` / `top_contribution_j` (j = 1..k) à ajouter
+    aux prédictions d'un bloc.
+    """
+    import pandas as pd
+
+    indices, values = top_k(contribs, k)
+    names = np.asarray(feature_names, dtype=object)
+    columns = {}
+    for j in range(indices.shape[1]):
+        columns[f"top_feature_{j + 1}"] = names[indices[:, j]]
+        columns[f"top_contribution_{j + 1}"] = values[:, j]
+    return pd.DataFrame(columns)
+
+
+def benchmark(model, matrix, repeats=5):
+    """
+    Coût de l'explication comparé à celui de `predict_proba` sur le même lot,
+    ramené à 1 000 lignes (meilleur de `repeats` essais).
+    """
+
+    def best_ms(fn):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(matrix)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000 * 1000 / len(matrix)
+
+    predict_ms = best_ms(model.predict_proba)
+    explain_ms = best_ms(lambda X: contributions(model, X, approximate=False))
+    approx_ms = best_ms(lambda X: contributions(model, X, approximate=True))
+    return {
+        "rows": len(matrix),
+        "predict_ms_per_1k": predict_ms,
+        "explain_ms_per_1k": explain_ms,
+        "explain_approx_ms_per_1k": approx_ms,
+        "explain_over_predict": explain_ms / predict_ms,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coût des explications (pred_contribs) pour 1 000 lignes")
+    parser.add_argument("input_path", help="Fichier CSV/Parquet à expliquer")
+    parser.add_argument("--model", default="model.pkl", help="Modèle servi")
+    parser.add_argument("--rows", type=int, default=10_000, help="Lignes lues pour la mesure")
+    parser.add_argument("--repeats", type=int, default=5, help="Essais par mesure")
+    args = parser.parse_args(argv)
+
+    from batch_scoring import read_chunks
+    from feature_encoder import load_encoder
+    from model_pipeline import load_model
+
+    model = load_model(args.model)
+    encoder = load_encoder(args.model, model)
+    matrix = encoder.transform(next(read_chunks(args.input_path, args.rows)))
+    result = benchmark(model, matrix, args.repeats)
+    print(
+        f"⏱️ {result['rows']} lignes : predict_proba {result['predict_ms_per_1k']:.2f} ms / 1k lignes, "
+        f"pred_contribs {result['explain_ms_per_1k']:.2f} ms / 1k lignes "
+        f"(x{result['explain_over_predict']:.1f}), approché {result['explain_approx_ms_per_1k']:.2f} ms / 1k lignes"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    main()
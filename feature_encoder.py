@@ -0,0 +1,208 @@
+import json
+import os
+
+import numpy as np
+
+# Colonnes catégoriques encodées en one-hot (même convention que pd.get_dummies)
+CATEGORICAL_COLS = ["State", "International plan", "Voice mail plan"]
+TARGET_COL = "Churn"
+
+# Valeurs de la cible considérées comme un churn
+POSITIVE_LABELS = ["true", "yes", "1", "1.0"]
+
+
+def encoder_path_for(model_path):
+    """
+    Chemin du plan d'encodage sauvegardé à côté d'un modèle.
+    """
+    return os.path.splitext(model_path)[0] + ".encoder.json"
+
+
+class FeatureEncoder:
+    """
+    Plan d'encodage compilé partagé entre l'entraînement et le service.
+
+    Les colonnes de sortie suivent l'ordre des features du modèle.
+    Une colonne `<catégorie>_<valeur>` (ex: `State_CA`) est une case one-hot,
+    toutes les autres sont numériques. Les valeurs sont écrites directement
+    dans un tableau NumPy float32, sans pandas.
+    """
+
+    def __init__(self, columns, categorical_cols=None, categories=None):
+        self.columns = list(columns)
+        self.categorical_cols = list(
+            CATEGORICAL_COLS if categorical_cols is None else categorical_cols
+        )
+        self.categories = {col: list(values) for col, values in (categories or {}).items()}
+        self.n_features = len(self.columns)
+
+        # Index colonne -> position dans le vecteur encodé
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+
+        # Catégorie -> {valeur -> position} et colonnes numériques -> position
+        self.category_slots = {col: {} for col in self.categorical_cols}
+        self.numeric_slots = {}
+        for i, name in enumerate(self.columns):
+            for col in self.categorical_cols:
+                if name.startswith(col + "_"):
+                    self.category_slots[col][name[len(col) + 1:]] = i
+                    break
+            else:
+                self.numeric_slots[name] = i
+
+        # Plan de lecture d'un enregistrement : une seule recherche par clé
+        self._record_plan = {name: i for name, i in self.column_index.items()}
+        self._record_plan.update(self.category_slots)
+
+    @classmethod
+    def fit(cls, df, columns, categorical_cols=None):
+        """
+        Construit le plan d'encodage à partir du DataFrame d'entraînement brut.
+        """
+        encoder = cls(columns, categorical_cols)
+        missing = [name for name in encoder.numeric_slots if name not in df.columns]
+        if missing:
+            raise ValueError(f"⚠️ Colonnes manquantes dans le dataset : {missing}")
+
+        encoder.categories = {
+            col: sorted(str(value) for value in df[col].dropna().unique())
+            for col in encoder.categorical_cols
+            if col in df.columns
+        }
+        return encoder
+
+    @classmethod
+    def from_feature_names(cls, feature_names, categorical_cols=None):
+        """
+        Reconstruit le plan à partir des seuls noms de features d'un modèle.
+        """
+        return cls([str(name) for name in feature_names], categorical_cols)
+
+    @property
+    def input_columns(self):
+        """
+        Colonnes brutes attendues en entrée (catégories non encodées).
+        """
+        names = []
+        for name in self.columns:
+            if name not in self.numeric_slots:
+                name = next(col for col in self.categorical_cols if name.startswith(col + "_"))
+            if name not in names:
+                names.append(name)
+        return names
+
+    def transform(self, df):
+        """
+        Encode un DataFrame brut en une matrice (n_lignes, n_features) float32.
+        """
+        out = np.zeros((len(df), self.n_features), dtype=np.float32)
+
+        for name, i in self.numeric_slots.items():
+            if name not in df.columns:
+                raise ValueError(f"⚠️ Colonne manquante dans le dataset : {name}")
+            out[:, i] = df[name].to_numpy(dtype=np.float32)
+
+        for col, slots in self.category_slots.items():
+            if col in df.columns:
+                values = df[col].astype(str).to_numpy()
+                for value, i in slots.items():
+                    out[:, i] = values == value
+            else:
+                # Données déjà encodées (ex: colonne `State_CA` présente)
+                for value, i in slots.items():
+                    dummy = f"{col}_{value}"
+                    if dummy in df.columns:
+                        out[:, i] = df[dummy].to_numpy(dtype=np.float32)
+        return out
+
+    def encode_record(self, record, out=None):
+        """
+        Encode une seule ligne dans un vecteur float32.
+
+        `record` est soit une séquence déjà encodée dans l'ordre des colonnes,
+        soit un dictionnaire {colonne brute ou encodée: valeur}. Les colonnes
+        absentes valent 0 et les clés inconnues sont ignorées.
+        """
+        if out is None:
+            out = np.zeros(self.n_features, dtype=np.float32)
+
+        if not isinstance(record, dict):
+            if len(record) != self.n_features:
+                raise ValueError(
+                    f"Feature shape mismatch, expected: {self.n_features}, got {len(record)}"
+                )
+            out[:] = record
+            return out
+
+        plan = self._record_plan
+        for key, value in record.items():
+            slot = plan.get(key)
+            if slot is None:
+                continue
+            if isinstance(slot, dict):
+                i = slot.get(str(value))
+                if i is not None:
+                    out[i] = 1.0
+            else:
+                out[slot] = float(value)
+        return out
+
+    def encode_records(self, records):
+        """
+        Encode plusieurs lignes dans une matrice pré-allouée.
+        """
+        out = np.zeros((len(records), self.n_features), dtype=np.float32)
+        for i, record in enumerate(records):
+            self.encode_record(record, out[i])
+        return out
+
+    @staticmethod
+    def encode_target(values):
+        """
+        Convertit la cible (`True`/`False`, `Yes`/`No`, 0/1) en entiers 0/1.
+        """
+        values = np.asarray(values)
+        if values.dtype == bool:
+            return values.astype(np.int64)
+        labels = np.char.lower(values.astype(str))
+        return np.isin(labels, POSITIVE_LABELS).astype(np.int64)
+
+    def to_dict(self):
+        return {
+            "columns": self.columns,
+            "categorical_cols": self.categorical_cols,
+            "categories": self.categories,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["columns"], data.get("categorical_cols"), data.get("categories"))
+
+    def save(self, filename):
+        """
+        Sauvegarde le plan d'encodage au format JSON.
+        """
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"💾 Plan d'encodage sauvegardé sous {filename}")
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Charge un plan d'encodage depuis un fichier JSON.
+        """
+        with open(filename) as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_encoder(model_path, model=None):
+    """
+    Charge le plan d'encodage sauvegardé avec le modèle.
+    À défaut, le reconstruit à partir de `model.feature_names_in_`.
+    """
+    path = encoder_path_for(model_path)
+    if os.path.exists(path):
+        return FeatureEncoder.load(path)
+    if model is not None and hasattr(model, "feature_names_in_"):
+        return FeatureEncoder.from_feature_names(model.feature_names_in_)
+    raise FileNotFoundError(f"⚠️ Plan d'encodage introuvable : {path}")
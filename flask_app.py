@@ -1,15 +1,67 @@
 from flask import Flask, request, jsonify
+import os
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 
 app = Flask(__name__)
 
+# Service FastAPI vers lequel les prédictions sont relayées
+FASTAPI_URL = os.environ.get("FASTAPI_URL", "http://127.0.0.1:8000")
+
+# Délais (connexion, lecture) en secondes
+TIMEOUT = (
+    float(os.environ.get("PROXY_CONNECT_TIMEOUT", "1")),
+    float(os.environ.get("PROXY_READ_TIMEOUT", "10")),
+)
+
+# Requêtes relayées simultanément (taille du pool de connexions) et attente
+# maximale (secondes) d'une place libre avant de répondre 503
+POOL_SIZE = int(os.environ.get("PROXY_POOL_SIZE", "32"))
+POOL_TIMEOUT = float(os.environ.get("PROXY_POOL_TIMEOUT", "1"))
+
+
+def make_session(pool_size=POOL_SIZE):
+    """
+    Session HTTP partagée : connexions keep-alive réutilisées d'une requête
+    à l'autre (pas de nouvelle connexion TCP par prédiction). Le nombre de
+    requêtes en vol est borné par `slots`, le pool ne bloque donc jamais.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = make_session()
+slots = threading.BoundedSemaphore(POOL_SIZE)
+
 
 @app.route("/predict", methods=["POST"])
 def predict():
     data = request.get_json()
-    response = requests.post("http://127.0.0.1:8000/predict", json=data)
-    return jsonify(response.json())
+    # Toutes les connexions sont occupées : refus immédiat plutôt qu'une file sans limite
+    if not slots.acquire(timeout=POOL_TIMEOUT):
+        return jsonify({"detail": "Proxy surchargé, réessayer plus tard"}), 503, {"Retry-After": "1"}
+    try:
+        response = session.post(f"{FASTAPI_URL}/predict", json=data, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        return jsonify({"detail": f"Service de prédiction injoignable : {e}"}), 502
+    finally:
+        slots.release()
+    # Statut et en-têtes de surcharge (503 + Retry-After) relayés tels quels
+    headers = {"Retry-After": response.headers["Retry-After"]} if "Retry-After" in response.headers else {}
+    try:
+        payload = response.json()
+    except ValueError:
+        # Réponse non JSON d'un intermédiaire (page HTML 502, 504 vide...)
+        return jsonify(
+            {"detail": f"Réponse invalide du service de prédiction (HTTP {response.status_code})"}
+        ), 502, headers
+    return jsonify(payload), response.status_code, headers
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=True)
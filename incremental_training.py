@@ -0,0 +1,267 @@
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+import xgboost as xgb
+
+from feature_encoder import TARGET_COL, load_encoder
+from model_pipeline import load_model, save_model
+from model_serving import export_native_model, native_model_path, tree_params
+from native_training import booster_to_classifier
+
+# Fichier d'historique alimenté en continu (nouvelles lignes ajoutées à la fin)
+DEFAULT_HISTORY_PATH = os.environ.get("RETRAIN_DATA_PATH", "churn-history.csv")
+
+# Nombre d'arbres ajoutés par réentraînement en mode "continue"
+DEFAULT_ROUNDS = 20
+
+RETRAIN_MODES = ("continue", "update")
+
+# Nombre de jobs conservés pour l'endpoint de statut
+MAX_TRACKED_JOBS = 100
+
+
+def state_path_for(model_path):
+    """
+    Fichier d'état du réentraînement incrémental, à côté du modèle.
+    """
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.retrain-state.json"
+
+
+def load_state(model_path):
+    try:
+        with open(state_path_for(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(model_path, state):
+    path = state_path_for(model_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_delta(history_path, offset=0):
+    """
+    Lit les lignes complètes ajoutées au CSV depuis l'octet `offset`.
+    Retourne (DataFrame ou None, nouvel offset). Une ligne en cours
+    d'écriture (sans fin de ligne) est laissée pour le prochain passage.
+    Si le fichier a été tronqué ou remplacé, il est relu depuis le début.
+    """
+    with open(history_path, "rb") as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        if offset > size or offset < len(header):
+            if offset > size:
+                print(f"⚠️ {history_path} a été tronqué, relecture depuis le début")
+            offset = len(header)
+        f.seek(offset)
+        data = f.read()
+
+    end = data.rfind(b"\n") + 1
+    if end == 0:
+        return None, offset
+    return pd.read_csv(io.BytesIO(header + data[:end])), offset + end
+
+
+def continue_params(mode, nthread=None, model_params=None):
+    """
+    Paramètres d'entraînement : `xgb.train` ne reprend pas ceux du booster,
+    les hyperparamètres d'arbre du modèle (`model_params`, profondeur,
+    learning rate...) sont donc repassés explicitement.
+    """
+    params = dict(model_params or {})
+    params.update(objective="binary:logistic", eval_metric="logloss", nthread=nthread or os.cpu_count() or 1)
+    if mode == "update":
+        # Rafraîchit les valeurs de feuilles (et statistiques) des arbres
+        # existants sur les nouvelles données, sans en ajouter
+        params.update(process_type="update", updater="refresh", refresh_leaf=True)
+    return params
+
+
+def retrain_incremental(
+    model_path,
+    history_path=DEFAULT_HISTORY_PATH,
+    mode="continue",
+    rounds=DEFAULT_ROUNDS,
+    nthread=None,
+    register_name=None,
+    experiment_name="Churn_Model_Experiment",
+):
+    """
+    Réentraîne le modèle servi sur les seules lignes ajoutées à `history_path`
+    depuis le dernier passage (offset en octets mémorisé à côté du modèle),
+    encodées avec le plan d'encodage sauvegardé.
+
+    - mode "continue" : ajoute `rounds` arbres (warm start `xgb_model=`) ;
+    - mode "update" : rafraîchit les feuilles des arbres existants
+      (`process_type="update"`).
+
+    Le coût ne dépend que du volume de nouvelles données. Le modèle est
+    sauvegardé à la place de l'ancien (rechargé à chaud par le service) et,
+    si `register_name` est fourni, enregistré comme nouvelle version MLflow.
+    """
+    if mode not in RETRAIN_MODES:
+        raise ValueError(f"⚠️ Mode de réentraînement inconnu : {mode}")
+
+    start = time.perf_counter()
+    state = load_state(model_path)
+    offset = state.get("offset", 0) if state.get("history_path") == os.path.abspath(history_path) else 0
+    delta, new_offset = read_delta(history_path, offset)
+    if delta is None or delta.empty:
+        print("✅ Aucune nouvelle donnée depuis le dernier réentraînement")
+        return {"status": "no_new_data", "rows": 0, "offset": new_offset}
+    if TARGET_COL not in delta.columns:
+        raise ValueError("⚠️ La colonne 'Churn' est manquante dans les nouvelles données.")
+
+    model = load_model(model_path)
+    encoder = load_encoder(model_path, model)
+    dtrain = xgb.DMatrix(
+        encoder.transform(delta),
+        label=encoder.encode_target(delta[TARGET_COL]),
+        feature_names=encoder.columns,
+    )
+
+    booster = model.get_booster()
+    trees_before = booster.num_boosted_rounds()
+    num_boost_round = rounds if mode == "continue" else trees_before
+    params = continue_params(mode, nthread, tree_params(model))
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, xgb_model=booster)
+    new_model = booster_to_classifier(booster)
+
+    save_model(new_model, model_path, encoder=encoder)
+    if os.path.exists(native_model_path(model_path)):
+        export_native_model(new_model, native_model_path(model_path))
+
+    result = {
+        "status": "trained",
+        "mode": mode,
+        "rows": len(delta),
+        "offset": new_offset,
+        "trees_before": trees_before,
+        "trees_after": booster.num_boosted_rounds(),
+        "seconds": time.perf_counter() - start,
+    }
+    if register_name:
+        result["registered_as"] = register_name
+        _log_to_mlflow(new_model, result, register_name, experiment_name)
+
+    # L'offset n'avance qu'une fois le modèle sauvegardé
+    save_state(
+        model_path,
+        {
+            "history_path": os.path.abspath(history_path),
+            "offset": new_offset,
+            "rows": len(delta),
+            "updated_at": time.time(),
+            "mode": mode,
+        },
+    )
+    print(
+        f"✅ Réentraînement incrémental ({mode}) sur {len(delta)} nouvelles lignes : "
+        f"{result['trees_before']} -> {result['trees_after']} arbres en {result['seconds']:.2f} s"
+    )
+    return result
+
+
+def _log_to_mlflow(model, result, register_name, experiment_name):
+    from mlflow_tracking import AsyncRunTracker
+
+    with AsyncRunTracker(experiment_name, run_name=f"retrain-{result['mode']}") as tracker:
+        tracker.log_params({"mode": result["mode"], "delta_rows": result["rows"], "incremental": True})
+        tracker.log_metrics(
+            {"retrain_seconds": result["seconds"], "trees": result["trees_after"]}
+        )
+        tracker.log_model(model, "xgboost_model")
+        tracker.register_model("xgboost_model", register_name)
+
+
+def _lower_priority():
+    """
+    Initialisation des processus de réentraînement : priorité CPU réduite,
+    l'inférence du service reste prioritaire.
+    """
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+class RetrainJobs:
+    """
+    Jobs de réentraînement exécutés en arrière-plan, un à la fois (les
+    offsets de l'historique restent cohérents). `submit` retourne tout de
+    suite un identifiant, `get` donne le statut du job.
+
+    Avec `processes=True`, l'entraînement tourne dans un processus séparé
+    (démarré en "spawn", sans hériter des threads du service) : il ne
+    prend ni le GIL ni les threads d'inférence du serveur.
+    """
+
+    def __init__(self, target=retrain_incremental, processes=True):
+        self.target = target
+        self.processes = processes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrain")
+        self._pool = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _process_pool(self):
+        # Créé au premier job : importer le service ne lance aucun processus
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_lower_priority
+            )
+        return self._pool
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, kwargs):
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            if self.processes:
+                result = self._process_pool().submit(self.target, **kwargs).result()
+            else:
+                result = self.target(**kwargs)
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            print(f"⚠️ Réentraînement {job_id} en échec : {e}")
+            return
+        self._update(job_id, status="succeeded", result=result, finished_at=time.time())
+
+    def submit(self, **kwargs):
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "params": {key: value for key, value in kwargs.items() if isinstance(value, (str, int, float))},
+            }
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job_id, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorFull(RuntimeError):
+    """
+    File d'inférence pleine : la requête est rejetée (HTTP 503) plutôt
+    que mise en attente.
+    """
+
+
+class BoundedExecutor:
+    """
+    Pool de threads dédié à l'inférence, avec une file bornée.
+
+    Au plus `max_workers` tâches s'exécutent et `max_queue` attendent ;
+    au-delà, `submit` lève `ExecutorFull` immédiatement. La latence reste
+    bornée sous charge au lieu d'accumuler des threads et des requêtes en
+    attente.
+
+    Compatible avec `loop.run_in_executor` (utilisé par `MicroBatcher`).
+    """
+
+    def __init__(self, max_workers=1, max_queue=64, thread_name_prefix="inference"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorFull(f"File d'inférence pleine ({self.max_workers + self.max_queue} tâches)")
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    async def run(self, fn, *args):
+        """
+        Exécute `fn(*args)` dans le pool et attend son résultat sans bloquer
+        la boucle asyncio.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -1,24 +1,20 @@
 import argparse
-import mlflow
-import mlflow.xgboost
-from model_pipeline import (
-    prepare_data,
-    train_model,
-    evaluate_model,
-    save_model,
-    load_model,
-)
-import pandas as pd
-import xgboost as xgb
-import logging
 import datetime
-from elasticsearch import Elasticsearch
+import logging
+import os
+
+# Les dépendances lourdes (mlflow, xgboost, pandas...) sont importées dans
+# chaque commande : `--help` et `--predict` démarrent sans les charger
 
-# 📌 Configuration MLflow
-mlflow.set_tracking_uri("http://localhost:5002")  # Assurez-vous que MLflow tourne sur ce port
+# 📌 Configuration MLflow (appliquée au premier usage)
+MLFLOW_TRACKING_URI = os.environ.get("MLFLOW_TRACKING_URI", "http://localhost:5002")  # Assurez-vous que MLflow tourne sur ce port
 
-# 📌 Connexion à Elasticsearch
-es = Elasticsearch(["http://localhost:9200"])
+# Modèle produit par --train / --tune, et export natif éventuel (chargeable sans XGBoost)
+MODEL_FILE = "xgboost_model.pkl"
+NATIVE_MODEL_FILE = os.path.splitext(MODEL_FILE)[0] + ".ubj"
+
+# Profil de référence des données d'entraînement (suivi de dérive du service)
+PROFILE_FILE = os.path.splitext(MODEL_FILE)[0] + ".profile.json"
 
 # Configuration du logger pour envoyer les logs à Elasticsearch
 logger = logging.getLogger("mlflow_logger")
@@ -26,13 +22,81 @@ logger.setLevel(logging.INFO)
 handler = logging.StreamHandler()
 logger.addHandler(handler)
 
+# 📌 Envoi asynchrone vers Elasticsearch (file bornée + `_bulk` en arrière-plan),
+# créé au premier message
+_es_metrics = None
+
+
+def es_metrics():
+    global _es_metrics
+    if _es_metrics is None:
+        from elasticsearch_logging import ElasticsearchHandler
+
+        _es_metrics = ElasticsearchHandler(index="mlflow-metrics")
+    return _es_metrics
+
+
+def setup_mlflow():
+    import mlflow
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    return mlflow
+
+
 # Fonction pour envoyer les logs vers Elasticsearch
 def log_to_elasticsearch(message):
-    try:
-        es.index(index="mlflow-metrics", body={"message": message})
-        logger.info(f"📊 Log envoyé à Elasticsearch : {message}")
-    except Exception as e:
-        logger.error(f"❌ Erreur d'envoi du log vers Elasticsearch: {e}")
+    es_metrics().submit({"message": message, "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()})
+    logger.info(f"📊 Log mis en file pour Elasticsearch : {message}")
+
+
+def save_cli_model(model, encoder, train_path=None):
+    """
+    Sauvegarde le modèle de la CLI : pickle, plan d'encodage et bundle
+    (avec l'empreinte des données d'entraînement), utilisé par le chemin
+    rapide de --predict.
+    """
+    from dataset_cache import file_digest
+    from model_pipeline import save_model
+
+    training_data_hash = file_digest(train_path) if train_path and os.path.exists(train_path) else None
+    save_model(model, MODEL_FILE, encoder=encoder, training_data_hash=training_data_hash)
+
+
+def predict_one(values):
+    """
+    Chemin rapide de --predict : prédicteur compilé lu dans le bundle (ou
+    dans un export natif .ubj), s'il est à jour par rapport au pickle, sans
+    XGBoost, pandas ni MLflow.
+    À défaut, le pickle est chargé avec XGBoost.
+    Retourne (prédiction, nombre de features attendu).
+    """
+    from model_bundle import current_bundle_path
+
+    forest = None
+    bundle_path = current_bundle_path(MODEL_FILE)
+    if bundle_path is not None:
+        from model_bundle import load_bundle_predictor
+
+        forest, _ = load_bundle_predictor(bundle_path)
+    elif os.path.exists(NATIVE_MODEL_FILE) and os.path.getmtime(NATIVE_MODEL_FILE) >= os.path.getmtime(MODEL_FILE):
+        from tree_predictor import CompiledForest
+
+        forest = CompiledForest.from_native_file(NATIVE_MODEL_FILE)
+
+    if forest is not None:
+        if len(values) != forest.n_features:
+            return None, forest.n_features
+        return int(forest.predict_positive(values) >= 0.5), forest.n_features
+
+    import pickle
+
+    with open(MODEL_FILE, "rb") as f:
+        model = pickle.load(f)
+    n_features = len(model.feature_names_in_) if hasattr(model, "feature_names_in_") else len(values)
+    if len(values) != n_features:
+        return None, n_features
+    return int(model.predict([values])[0]), n_features
+
 
 # 📌 Fonction principale
 def main():
@@ -40,18 +104,51 @@ def main():
 
     parser.add_argument("--prepare", action="store_true", help="Préparer les données")
     parser.add_argument("--train", action="store_true", help="Entraîner le modèle")
+    parser.add_argument("--tune", action="store_true", help="Rechercher les meilleurs hyperparamètres")
     parser.add_argument("--evaluate", action="store_true", help="Évaluer le modèle")
+    parser.add_argument("--cost_fp", type=float, default=1.0, help="Coût d'un faux positif (action de rétention inutile)")
+    parser.add_argument("--cost_fn", type=float, default=1.0, help="Coût d'un faux négatif (churn manqué)")
+    parser.add_argument("--cv", type=int, metavar="K", help="Validation croisée à K plis sur --train_path")
     parser.add_argument("--predict", action="store_true", help="Faire une prédiction")
     parser.add_argument("--train_path", type=str, help="Chemin du fichier d'entraînement")
     parser.add_argument("--test_path", type=str, help="Chemin du fichier de test")
     parser.add_argument("--input", type=str, help="Données pour la prédiction (ex: '5.1,3.5,1.4,0.2')")
+    parser.add_argument("--score-file", type=str, help="Fichier CSV/Parquet à scorer par blocs")
+    parser.add_argument("--output", type=str, default="predictions.csv", help="Fichier de sortie des prédictions")
+    parser.add_argument("--chunksize", type=int, help="Nombre de lignes par bloc (défaut 100 000)")
+    parser.add_argument("--id_column", type=str, help="Colonne identifiant recopiée dans la sortie")
+    parser.add_argument("--pipeline", action="store_true", help="Lire/encoder le bloc suivant pendant la prédiction")
+    parser.add_argument("--workers", type=int, help="Nombre de processus pour le scoring parallèle")
+    parser.add_argument(
+        "--explain",
+        type=int,
+        nargs="?",
+        const=5,
+        metavar="K",
+        help="Ajouter au scoring les K features les plus contributives par ligne (défaut 5)",
+    )
+    parser.add_argument("--nthread", type=int, help="Threads XGBoost (par worker pour le scoring, défaut 1)")
+    parser.add_argument(
+        "--engine",
+        choices=["sklearn", "native", "external"],
+        default="sklearn",
+        help="Entraînement : XGBClassifier.fit, QuantileDMatrix native, ou mémoire externe par blocs",
+    )
+
+    parser.add_argument("--search", choices=["random", "grid", "halving"], default="random", help="Stratégie de recherche")
+    parser.add_argument("--n_trials", type=int, default=20, help="Nombre de configurations tirées (random/halving)")
+    parser.add_argument("--max_rounds", type=int, default=300, help="Nombre maximal d'itérations par essai")
 
     args = parser.parse_args()
 
     if args.prepare:
         logger.info("📌 Préparation des données...")
         try:
-            X_train, X_test, y_train, y_test = prepare_data(args.train_path, args.test_path)
+            from model_pipeline import prepare_data
+
+            X_train, X_test, y_train, y_test = prepare_data(
+                args.train_path, args.test_path, profile_path=PROFILE_FILE
+            )
             logger.info("✅ Données préparées avec succès !")
         except Exception as e:
             logger.error(f"⚠️ Erreur lors de la préparation des données : {e}")
@@ -59,59 +156,175 @@ def main():
     if args.train:
         logger.info("📌 Entraînement du modèle...")
         try:
-            X_train, X_test, y_train, y_test = prepare_data(args.train_path, args.test_path)
+            from batch_scoring import DEFAULT_CHUNKSIZE
+            from mlflow_tracking import AsyncRunTracker
+            from model_pipeline import evaluate_model, prepare_data
+            from native_training import measure, train_external_memory, train_quantile_dmatrix
 
-            # 📌 Initialiser MLflow
-            mlflow.set_experiment("Churn_Model_Experiment")  
+            if args.engine != "external":
+                X_train, X_test, y_train, y_test, encoder = prepare_data(
+                    args.train_path, args.test_path, return_encoder=True, profile_path=PROFILE_FILE
+                )
 
-            with mlflow.start_run() as run:
+            # 📌 Initialiser MLflow (suivi asynchrone : aucun appel réseau bloquant)
+            with AsyncRunTracker("Churn_Model_Experiment", tracking_uri=MLFLOW_TRACKING_URI) as tracker:
                 logger.info("🚀 Début de l'entraînement du modèle...")
 
-                # 📌 Définition du modèle XGBoost
-                model = xgb.XGBClassifier(
-                    max_depth=3,
-                    learning_rate=0.1,
-                    use_label_encoder=False,
-                    eval_metric="logloss",
-                )
-
                 # 📌 Entraîner le modèle
-                logger.info("🔄 Entraînement en cours...")
-                model.fit(X_train, y_train)
+                logger.info(f"🔄 Entraînement en cours (moteur : {args.engine})...")
+                if args.engine == "external":
+                    (model, encoder, train_samples), train_seconds, peak_rss = measure(
+                        train_external_memory,
+                        args.train_path,
+                        nthread=args.nthread,
+                        chunksize=args.chunksize or DEFAULT_CHUNKSIZE,
+                    )
+                elif args.engine == "native":
+                    model, train_seconds, peak_rss = measure(
+                        train_quantile_dmatrix, X_train.values, y_train.values, nthread=args.nthread
+                    )
+                    train_samples = len(X_train)
+                else:
+                    import xgboost as xgb
+
+                    # 📌 Définition du modèle XGBoost
+                    model = xgb.XGBClassifier(
+                        max_depth=3,
+                        learning_rate=0.1,
+                        use_label_encoder=False,
+                        eval_metric="logloss",
+                        n_jobs=args.nthread,
+                    )
+                    _, train_seconds, peak_rss = measure(model.fit, X_train, y_train)
+                    train_samples = len(X_train)
+                logger.info(f"⏱️ Entraînement : {train_seconds:.2f} s, mémoire ajoutée (pic RSS) {peak_rss:.0f} Mo")
 
                 # 📌 Enregistrer les hyperparamètres et métriques
-                mlflow.log_param("train_samples", len(X_train))
-                mlflow.log_param("test_samples", len(X_test))
-                mlflow.log_param("max_depth", 3)
-                mlflow.log_param("learning_rate", 0.1)
+                tracker.log_param("train_samples", train_samples)
+                if args.engine != "external":
+                    tracker.log_param("test_samples", len(X_test))
+                tracker.log_params({"max_depth": 3, "learning_rate": 0.1, "engine": args.engine})
+                tracker.log_metrics({"train_seconds": train_seconds, "peak_rss_delta_mb": peak_rss})
 
                 # 📌 Sauvegarde du modèle
-                mlflow.xgboost.log_model(model, "xgboost_model")
-                save_model(model, "xgboost_model.pkl")
+                tracker.log_model(model, "xgboost_model")
+                save_cli_model(model, encoder, args.train_path)
 
-                # 📌 Enregistrement du modèle dans le Model Registry
-                run_id = run.info.run_id
-                model_uri = f"runs:/{run_id}/xgboost_model"
-                mlflow.register_model(model_uri, "XGBoost_Model")
-                logger.info(f"✅ Modèle enregistré dans MLflow avec run ID: {run_id}")
+                # 📌 Enregistrement du modèle dans le Model Registry (en arrière-plan)
+                tracker.register_model("xgboost_model", "XGBoost_Model")
+                logger.info(f"✅ Modèle programmé pour le Model Registry (run ID: {tracker.run_id})")
 
                 # 📌 Évaluation du modèle
                 accuracy = evaluate_model(model, args.test_path)
                 logger.info(f"🎯 Model Training Completed! Accuracy: {accuracy:.4f}")
 
                 # 📌 Enregistrer les métriques dans MLflow et Elasticsearch
-                mlflow.log_metric("accuracy", accuracy)
+                tracker.log_metric("accuracy", accuracy)
                 log_to_elasticsearch(f"accuracy: {accuracy:.4f}")
 
         except Exception as e:
             logger.error(f"⚠️ Erreur durant l'entraînement : {e}")
 
+    if args.tune:
+        logger.info("📌 Recherche d'hyperparamètres...")
+        try:
+            from native_training import measure
+            from tuning import log_trials_to_mlflow, tune
+
+            mlflow = setup_mlflow()
+            mlflow.set_experiment("Churn_Model_Experiment")
+
+            with mlflow.start_run(run_name=f"tuning-{args.search}") as run:
+                (results, best, model, encoder), tune_seconds, _ = measure(
+                    tune,
+                    args.train_path,
+                    args.test_path,
+                    strategy=args.search,
+                    n_trials=args.n_trials,
+                    max_rounds=args.max_rounds,
+                    workers=args.workers,
+                    nthread=args.nthread or 1,
+                )
+                pruned = sum(r["pruned"] for r in results)
+                logger.info(
+                    f"🏆 Meilleur essai {best['trial']} : logloss={best['logloss']:.4f}, "
+                    f"params={best['params']} ({len(results)} essais, {pruned} élagués, {tune_seconds:.1f} s)"
+                )
+
+                # 📌 Essais en runs imbriqués, puis meilleur résultat sur le run parent
+                log_trials_to_mlflow(results, run.info.run_id, run.info.experiment_id)
+                mlflow.log_params({**best["params"], "search": args.search, "trials": len(results)})
+                mlflow.log_metrics(
+                    {"best_logloss": best["logloss"], "best_auc": best["auc"], "tune_seconds": tune_seconds}
+                )
+
+                # 📌 Sauvegarde du meilleur modèle
+                save_cli_model(model, encoder, args.train_path)
+                log_to_elasticsearch(f"tuning_best_logloss: {best['logloss']:.4f}")
+
+        except Exception as e:
+            logger.error(f"⚠️ Erreur durant la recherche d'hyperparamètres : {e}")
+
+    if args.cv:
+        logger.info(f"📌 Validation croisée à {args.cv} plis...")
+        try:
+            from cross_validation import cross_validate, log_cv_to_mlflow
+            from mlflow_tracking import AsyncRunTracker
+
+            results, summary = cross_validate(
+                args.train_path, k=args.cv, workers=args.workers, nthread=args.nthread or 1
+            )
+            logger.info(
+                f"✅ accuracy={summary['accuracy_mean']:.4f} ± {summary['accuracy_std']:.4f}, "
+                f"auc={summary['auc_mean']:.4f} ± {summary['auc_std']:.4f}, "
+                f"logloss={summary['logloss_mean']:.4f} ± {summary['logloss_std']:.4f} "
+                f"({summary['seconds']:.1f} s, {summary['workers']} workers)"
+            )
+            logger.info(f"📊 Matrice de confusion cumulée [[TN, FP], [FN, TP]] : {summary['confusion']}")
+
+            # 📌 Métriques par pli et agrégées envoyées en un seul lot
+            with AsyncRunTracker(
+                "Churn_Model_Experiment", run_name=f"cv-{args.cv}", tracking_uri=MLFLOW_TRACKING_URI
+            ) as tracker:
+                log_cv_to_mlflow(tracker, results, summary, params={"nthread": args.nthread or 1})
+
+        except Exception as e:
+            logger.error(f"⚠️ Erreur durant la validation croisée : {e}")
+
     if args.evaluate:
         logger.info("📌 Évaluation du modèle...")
         try:
-            model = load_model("xgboost_model.pkl")
-            accuracy = evaluate_model(model, args.test_path)
-            logger.info(f"✅ Précision du modèle : {accuracy:.4f}")
+            import tempfile
+
+            from evaluation import evaluate_file, log_evaluation
+            from feature_encoder import load_encoder
+            from mlflow_tracking import AsyncRunTracker
+            from model_pipeline import load_model
+
+            model = load_model(MODEL_FILE)
+            encoder = load_encoder(MODEL_FILE, model)
+
+            # 📌 Un seul predict_proba par bloc, toutes les métriques et courbes en une passe triée
+            scores = evaluate_file(model, encoder, args.test_path, chunksize=args.chunksize)
+            report = scores.report(cost_fp=args.cost_fp, cost_fn=args.cost_fn)
+            curves = scores.curves(cost_fp=args.cost_fp, cost_fn=args.cost_fn)
+            accuracy = report["accuracy"]
+            logger.info(
+                f"✅ Précision du modèle : {accuracy:.4f} (précision {report['precision']:.4f}, "
+                f"rappel {report['recall']:.4f}, F1 {report['f1']:.4f})"
+            )
+            if report["roc_auc"] is not None:
+                logger.info(
+                    f"📊 ROC-AUC {report['roc_auc']:.4f}, PR-AUC {report['pr_auc']:.4f}, "
+                    f"lift du 1er décile {report['lift_top_decile']:.2f}"
+                )
+            logger.info(f"📊 Seuil de coût minimal (FP={args.cost_fp}, FN={args.cost_fn}) : {report['best_cost']}")
+
+            # 📌 Métriques et courbes enregistrées dans MLflow (artefacts evaluation/)
+            with tempfile.TemporaryDirectory() as report_dir, AsyncRunTracker(
+                "Churn_Model_Experiment", run_name="evaluation", tracking_uri=MLFLOW_TRACKING_URI
+            ) as tracker:
+                log_evaluation(tracker, report, curves, report_dir)
 
             # 📌 Loguer la métrique dans Elasticsearch
             log_to_elasticsearch(f"evaluation_accuracy: {accuracy:.4f}")
@@ -123,26 +336,67 @@ def main():
         logger.info("📌 Prédiction en cours...")
         try:
             if args.input:
-                model = load_model("xgboost_model.pkl")
                 data = list(map(float, args.input.split(",")))
+                prediction, n_features = predict_one(data)
 
                 # 📌 Vérifier si les features correspondent (ajout d'une vérification)
-                if hasattr(model, "feature_names_in_") and len(data) != len(model.feature_names_in_):
-                    logger.error(
-                        f"⚠️ Erreur : nombre de features incorrect. Attendu {len(model.feature_names_in_)}, reçu {len(data)}."
-                    )
+                if prediction is None:
+                    logger.error(f"⚠️ Erreur : nombre de features incorrect. Attendu {n_features}, reçu {len(data)}.")
                 else:
-                    prediction = model.predict([data])[0]
                     logger.info(f"✅ Prédiction : {prediction}")
 
-                    # 📌 Loguer la prédiction dans Elasticsearch
-                    log_to_elasticsearch(f"prediction: {prediction}")
+                    # 📌 Loguer la prédiction dans Elasticsearch (si configuré : la
+                    # vidange de la file à la sortie coûterait plusieurs secondes
+                    # sans serveur joignable)
+                    if os.environ.get("ELASTICSEARCH_HOST"):
+                        log_to_elasticsearch(f"prediction: {prediction}")
 
             else:
                 logger.error("⚠️ Veuillez fournir des données avec --input.")
         except Exception as e:
             logger.error(f"⚠️ Erreur durant la prédiction : {e}")
 
+    if args.score_file:
+        logger.info("📌 Scoring du fichier par blocs...")
+        try:
+            from batch_scoring import DEFAULT_CHUNKSIZE, score_file, score_file_parallel
+
+            chunksize = args.chunksize or DEFAULT_CHUNKSIZE
+            if args.workers:
+                rows = score_file_parallel(
+                    MODEL_FILE,
+                    args.score_file,
+                    args.output,
+                    workers=args.workers,
+                    nthread=args.nthread or 1,
+                    chunksize=chunksize,
+                    id_column=args.id_column,
+                    explain_k=args.explain,
+                )
+            else:
+                from feature_encoder import load_encoder
+                from model_pipeline import load_model
+
+                model = load_model(MODEL_FILE)
+                encoder = load_encoder(MODEL_FILE, model)
+                rows = score_file(
+                    model,
+                    encoder,
+                    args.score_file,
+                    args.output,
+                    chunksize=chunksize,
+                    id_column=args.id_column,
+                    pipeline=args.pipeline,
+                    explain_k=args.explain,
+                )
+            logger.info(f"✅ {rows} prédictions écrites dans {args.output}")
+
+            # 📌 Loguer le volume scoré dans Elasticsearch
+            log_to_elasticsearch(f"scored_rows: {rows}")
+
+        except Exception as e:
+            logger.error(f"⚠️ Erreur durant le scoring du fichier : {e}")
+
 if __name__ == "__main__":
     main()
 
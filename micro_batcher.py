@@ -0,0 +1,163 @@
+import asyncio
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes concurrentes en un seul appel vectorisé au modèle.
+
+    Les vecteurs soumis sont accumulés jusqu'à `max_batch_size` lignes ou
+    `max_wait_us` microsecondes après la première requête du lot, puis
+    `predict_fn(matrice)` est exécuté une seule fois dans `executor` et chaque
+    ligne du résultat est rendue à la coroutine qui l'attend.
+
+    Les requêtes soumises avec une `key` (ex: la version du modèle) ne sont
+    regroupées qu'avec celles de même clé, et `predict_fn(matrice, key)` est
+    alors appelé.
+
+    Au-delà de `max_pending` requêtes en attente (0 : illimité), `submit`
+    lève `asyncio.QueueFull` au lieu d'allonger la file.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_us=1000, executor=None, max_pending=0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size doit être >= 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self.executor = executor
+        self.max_pending = max_pending
+
+        self._loop = None
+        self._queue = None
+        self._task = None
+        self._pending = None
+
+        # Statistiques : histogramme des tailles de lot (puissances de 2)
+        self.buckets = []
+        size = 1
+        while size < max_batch_size:
+            self.buckets.append(size)
+            size *= 2
+        self.buckets.append(max_batch_size)
+        self.batch_size_counts = [0] * len(self.buckets)
+        self.batches = 0
+        self.requests = 0
+        self.max_queue_depth = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        """
+        Démarre la boucle de regroupement sur la boucle asyncio courante.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._pending = None
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, vector, key=None):
+        """
+        Soumet une ligne encodée et attend sa prédiction.
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((vector, key, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return await future
+
+    async def stop(self):
+        """
+        Arrête la boucle de regroupement.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _collect(self):
+        """
+        Attend la première requête puis remplit le lot jusqu'à la taille
+        maximale, l'expiration du délai ou l'arrivée d'une autre clé.
+        """
+        if self._pending is not None:
+            first, self._pending = self._pending, None
+        else:
+            first = await self._queue.get()
+        key = first[1]
+        batch = [first]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item[1] is not key and item[1] != key:
+                # Clé différente : l'élément ouvrira le prochain lot
+                self._pending = item
+                break
+            batch.append(item)
+        return key, batch
+
+    async def _run(self):
+        while True:
+            key, batch = await self._collect()
+            futures = [future for _, _, future in batch]
+            self._record(len(batch))
+            try:
+                matrix = np.stack([vector for vector, _, _ in batch])
+                args = (matrix,) if key is None else (matrix, key)
+                results = await self._loop.run_in_executor(
+                    self.executor, self.predict_fn, *args
+                )
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record(self, size):
+        self.batches += 1
+        self.requests += size
+        for i, bound in enumerate(self.buckets):
+            if size <= bound:
+                self.batch_size_counts[i] += 1
+                break
+
+    def stats(self):
+        """
+        Profondeur de file et histogramme des tailles de lot.
+        """
+        return {
+            "queue_depth": (self._queue.qsize() if self._queue is not None else 0)
+            + (self._pending is not None),
+            "max_queue_depth": self.max_queue_depth,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {
+                str(bound): count for bound, count in zip(self.buckets, self.batch_size_counts)
+            },
+        }
@@ -0,0 +1,487 @@
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# Répertoire local où sont déversés les runs non envoyés (serveur injoignable)
+DEFAULT_SPILL_DIR = os.environ.get("MLFLOW_SPILL_DIR", os.path.join(".cache", "mlflow-spill"))
+
+# Limites d'un appel `log_batch` côté serveur MLflow
+MAX_BATCH_METRICS = 1000
+MAX_BATCH_PARAMS = 100
+MAX_BATCH_TAGS = 100
+
+# Codes d'erreur MLflow considérés comme passagers (le run est déversé puis rejoué)
+TRANSIENT_ERROR_CODES = {"INTERNAL_ERROR", "TEMPORARILY_UNAVAILABLE", "REQUEST_LIMIT_EXCEEDED"}
+
+BATCH_OPS = ("param", "metric", "tag")
+
+# Relances et délai (secondes) des requêtes HTTP du client MLflow : par défaut
+# (7 relances, 120 s) un serveur injoignable bloquerait l'envoi plusieurs minutes
+HTTP_MAX_RETRIES = os.environ.get("MLFLOW_HTTP_REQUEST_MAX_RETRIES", "2")
+HTTP_TIMEOUT = os.environ.get("MLFLOW_HTTP_REQUEST_TIMEOUT", "10")
+
+# Fichiers de déversement des trackers actifs de ce processus (jamais rejoués
+# par un autre tracker tant que leur run est en cours)
+_active_spills = set()
+
+
+def is_transient(error):
+    """
+    Erreur réseau ou serveur indisponible : le run sera rejoué plus tard.
+    Les erreurs de validation (paramètre déjà défini, etc.) ne le sont pas.
+    """
+    from mlflow.exceptions import MlflowException
+
+    if isinstance(error, MlflowException):
+        return error.error_code in TRANSIENT_ERROR_CODES
+    return isinstance(error, (OSError, ConnectionError, TimeoutError))
+
+
+def _client(tracking_uri):
+    from mlflow.tracking import MlflowClient
+
+    # Lus par MLflow à chaque requête
+    os.environ.setdefault("MLFLOW_HTTP_REQUEST_MAX_RETRIES", HTTP_MAX_RETRIES)
+    os.environ.setdefault("MLFLOW_HTTP_REQUEST_TIMEOUT", HTTP_TIMEOUT)
+    return MlflowClient(tracking_uri, registry_uri=tracking_uri)
+
+
+def _ensure_run(client, header):
+    """
+    Crée le run décrit par l'en-tête s'il n'existe pas encore côté serveur.
+    """
+    if header.get("run_id"):
+        return header["run_id"]
+    experiment = client.get_experiment_by_name(header["experiment"])
+    experiment_id = (
+        experiment.experiment_id if experiment else client.create_experiment(header["experiment"])
+    )
+    run = client.create_run(experiment_id, start_time=header["start_time"], run_name=header.get("run_name"))
+    header["run_id"] = run.info.run_id
+    return header["run_id"]
+
+
+def _send_batch(client, run_id, ops):
+    from mlflow.entities import Metric, Param, RunTag
+
+    params = [Param(op["key"], op["value"]) for op in ops if op["op"] == "param"]
+    metrics = [
+        Metric(op["key"], op["value"], op["timestamp"], op["step"]) for op in ops if op["op"] == "metric"
+    ]
+    tags = [RunTag(op["key"], op["value"]) for op in ops if op["op"] == "tag"]
+    while params or metrics or tags:
+        client.log_batch(
+            run_id,
+            metrics=metrics[:MAX_BATCH_METRICS],
+            params=params[:MAX_BATCH_PARAMS],
+            tags=tags[:MAX_BATCH_TAGS],
+        )
+        params, metrics, tags = (
+            params[MAX_BATCH_PARAMS:],
+            metrics[MAX_BATCH_METRICS:],
+            tags[MAX_BATCH_TAGS:],
+        )
+
+
+def _register_model(client, run_id, artifact_path, name):
+    from mlflow.exceptions import MlflowException
+
+    try:
+        client.create_registered_model(name)
+    except MlflowException as e:
+        if e.error_code != "RESOURCE_ALREADY_EXISTS":
+            raise
+    source = f"{client.get_run(run_id).info.artifact_uri}/{artifact_path}"
+    client.create_model_version(name, source, run_id)
+
+
+class ApplyError(Exception):
+    """
+    Échec d'une opération : `applied` opérations ont déjà été appliquées.
+    """
+
+    def __init__(self, error, applied):
+        super().__init__(str(error))
+        self.error = error
+        self.applied = applied
+
+
+def apply_ops(client, header, ops):
+    """
+    Applique une suite d'opérations à un run, dans l'ordre (le run est créé
+    au besoin et son identifiant noté dans `header`). Les paramètres,
+    métriques et tags consécutifs sont regroupés en un seul `log_batch`.
+    """
+    done = 0
+    try:
+        run_id = _ensure_run(client, header)
+        while done < len(ops):
+            op = ops[done]
+            if op["op"] in BATCH_OPS:
+                end = done
+                while end < len(ops) and ops[end]["op"] in BATCH_OPS:
+                    end += 1
+                _send_batch(client, run_id, ops[done:end])
+                done = end
+                continue
+
+            if op["op"] == "artifacts":
+                client.log_artifacts(run_id, op["local_dir"], op["artifact_path"])
+                shutil.rmtree(op["local_dir"], ignore_errors=True)
+            elif op["op"] == "register":
+                _register_model(client, run_id, op["artifact_path"], op["name"])
+            elif op["op"] == "end":
+                client.set_terminated(run_id, status=op["status"], end_time=op["end_time"])
+            done += 1
+    except Exception as e:
+        raise ApplyError(e, done) from e
+
+
+def _write_spill(path, header, ops):
+    """
+    Écrit (atomiquement) un run à rejouer : en-tête puis une opération par ligne.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(json.dumps(header) + "\n")
+        for op in ops:
+            f.write(json.dumps(op) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _read_spill(path):
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0], lines[1:]
+
+
+def replay_file(path, client):
+    """
+    Rejoue un fichier de déversement. Retourne (rejoué entièrement, en-tête) ;
+    un fichier entièrement rejoué est supprimé. Après un nouvel échec passager, il est
+    réécrit avec les opérations restantes ; une erreur définitive le met de
+    côté (`.failed`).
+    """
+    header, ops = _read_spill(path)
+    try:
+        apply_ops(client, header, ops)
+    except ApplyError as e:
+        if not is_transient(e.error):
+            print(f"❌ Run MLflow déversé abandonné ({path}) : {e}")
+            os.replace(path, f"{path}.failed")
+            return False, header
+        # L'en-tête contient désormais le run_id s'il a pu être créé
+        _write_spill(path, header, ops[e.applied :])
+        return False, header
+    os.remove(path)
+    return True, header
+
+
+def replay_spilled(spill_dir=DEFAULT_SPILL_DIR, tracking_uri=None):
+    """
+    Rejoue les runs déversés localement (tous, ou seulement ceux de
+    `tracking_uri`). Retourne le nombre de runs rejoués.
+    """
+    replayed = 0
+    clients = {}
+    for path in sorted(glob.glob(os.path.join(spill_dir, "*.jsonl"))):
+        if path in _active_spills:
+            continue
+        uri = _read_spill(path)[0]["tracking_uri"]
+        if tracking_uri and uri != tracking_uri:
+            continue
+        if uri not in clients:
+            clients[uri] = _client(uri)
+        if replay_file(path, clients[uri])[0]:
+            replayed += 1
+    if replayed:
+        print(f"✅ {replayed} run(s) MLflow rejoué(s) depuis {spill_dir}")
+    return replayed
+
+
+class AsyncRunTracker:
+    """
+    Run MLflow suivi en arrière-plan.
+
+    Les appels `log_param`, `log_metric`, `set_tag`, `log_model`... ne font
+    qu'ajouter une opération en mémoire. Un thread de fond crée le run puis
+    envoie les opérations par `log_batch` toutes les `flush_interval`
+    secondes : l'entraînement ne dépend plus de la latence du serveur.
+
+    Si le serveur est injoignable, le run est déversé dans un fichier local
+    (`spill_dir`) et rejoué plus tard, par ce même tracker au vidage suivant
+    ou par `replay_spilled` au démarrage d'un run suivant.
+    """
+
+    def __init__(
+        self,
+        experiment_name,
+        run_name=None,
+        tracking_uri=None,
+        spill_dir=DEFAULT_SPILL_DIR,
+        flush_interval=1.0,
+        shutdown_timeout=30.0,
+    ):
+        import mlflow
+
+        self.tracking_uri = tracking_uri or mlflow.get_tracking_uri()
+        self.spill_dir = spill_dir
+        self.flush_interval = flush_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.spill_path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.jsonl")
+        self._header = {
+            "experiment": experiment_name,
+            "run_name": run_name,
+            "start_time": int(time.time() * 1000),
+            "tracking_uri": self.tracking_uri,
+            "run_id": None,
+        }
+
+        self._ops = []
+        # Opérations prises par le thread de fond, pas encore envoyées ni déversées
+        self._pending = []
+        # Positionné par `end` quand il a déversé lui-même les opérations du thread
+        self._abandoned = False
+        self._cond = threading.Condition()
+        self._closing = False
+        self._flush_requested = False
+        self._sending = False
+        self._run_created = threading.Event()
+        self.spilled = False
+        self._spill_lock = threading.Lock()
+        _active_spills.add(self.spill_path)
+        self._thread = threading.Thread(target=self._run, name="mlflow-tracker", daemon=True)
+        self._thread.start()
+
+    # --- API appelée depuis l'entraînement (jamais bloquante sur le réseau) ---
+
+    def _enqueue(self, op):
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("⚠️ Run MLflow déjà terminé")
+            self._ops.append(op)
+
+    def log_param(self, key, value):
+        self._enqueue({"op": "param", "key": key, "value": str(value)})
+
+    def log_params(self, params):
+        for key, value in params.items():
+            self.log_param(key, value)
+
+    def log_metric(self, key, value, step=0):
+        self._enqueue(
+            {"op": "metric", "key": key, "value": float(value), "timestamp": int(time.time() * 1000), "step": step}
+        )
+
+    def log_metrics(self, metrics, step=0):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step)
+
+    def set_tag(self, key, value):
+        self._enqueue({"op": "tag", "key": key, "value": str(value)})
+
+    def log_batch(self, params=None, metrics=(), tags=None):
+        """
+        Paramètres, métriques `(clé, valeur, étape)` et tags ajoutés ensemble :
+        ils partent dans le même `log_batch` (dans la limite de taille d'un appel).
+        """
+        timestamp = int(time.time() * 1000)
+        ops = [{"op": "param", "key": key, "value": str(value)} for key, value in (params or {}).items()]
+        ops.extend(
+            {"op": "metric", "key": key, "value": float(value), "timestamp": timestamp, "step": step}
+            for key, value, step in metrics
+        )
+        ops.extend({"op": "tag", "key": key, "value": str(value)} for key, value in (tags or {}).items())
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("⚠️ Run MLflow déjà terminé")
+            self._ops.extend(ops)
+
+    def _staging_dir(self, artifact_path):
+        return os.path.join(self.spill_dir, "artifacts", uuid.uuid4().hex, artifact_path)
+
+    def log_artifacts(self, local_dir, artifact_path):
+        """
+        Copie `local_dir` dans une zone de transit puis programme son envoi.
+        """
+        staged = self._staging_dir(artifact_path)
+        shutil.copytree(local_dir, staged)
+        self._enqueue({"op": "artifacts", "local_dir": staged, "artifact_path": artifact_path})
+
+    def log_model(self, model, artifact_path):
+        """
+        Sérialise le modèle XGBoost au format MLflow en local ; l'envoi des
+        artefacts se fait en arrière-plan.
+        """
+        import mlflow.xgboost
+
+        staged = self._staging_dir(artifact_path)
+        mlflow.xgboost.save_model(model, staged)
+        self._enqueue({"op": "artifacts", "local_dir": staged, "artifact_path": artifact_path})
+
+    def register_model(self, artifact_path, name):
+        self._enqueue({"op": "register", "artifact_path": artifact_path, "name": name})
+
+    @property
+    def run_id(self):
+        return self._header["run_id"]
+
+    def wait_run_id(self, timeout=None):
+        """
+        Identifiant du run une fois créé côté serveur (None si injoignable).
+        """
+        self._run_created.wait(timeout)
+        return self.run_id
+
+    def flush(self, timeout=None):
+        """
+        Attend l'envoi (ou le déversement) de toutes les opérations en attente.
+        """
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._ops and not self._sending, timeout)
+
+    def end(self, status="FINISHED"):
+        """
+        Termine le run. Si le serveur ne répond pas dans `shutdown_timeout`
+        secondes, les opérations restantes (en cours d'envoi puis en file, dans
+        l'ordre) sont déversées pour être rejouées.
+        """
+        with self._cond:
+            if self._closing:
+                return
+            self._ops.append({"op": "end", "status": status, "end_time": int(time.time() * 1000)})
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(self.shutdown_timeout)
+
+        with self._cond:
+            # Thread encore bloqué sur le réseau : on reprend aussi ce qu'il envoyait
+            ops, self._pending, self._ops = self._pending + self._ops, [], []
+            self._abandoned = self._thread.is_alive()
+        if ops:
+            self._spill(ops)
+        if not self._thread.is_alive():
+            _active_spills.discard(self.spill_path)
+        if self.spilled:
+            print(f"💾 Run MLflow déversé dans {self.spill_path}, il sera rejoué plus tard")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end("FAILED" if exc_type else "FINISHED")
+
+    # --- Thread de fond ---
+
+    def _spill(self, ops):
+        """
+        Ajoute des opérations au fichier de déversement du run.
+        """
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            if os.path.exists(self.spill_path):
+                header, previous = _read_spill(self.spill_path)
+            else:
+                header, previous = dict(self._header), []
+            _write_spill(self.spill_path, header, previous + ops)
+            self.spilled = True
+
+    def _spill_pending(self, ops):
+        """
+        Déverse depuis le thread de fond les opérations en cours d'envoi, sauf
+        si `end` les a déjà reprises.
+        """
+        with self._cond:
+            if self._abandoned:
+                return
+            self._spill(ops)
+            self._pending = []
+
+    def _acknowledge(self, remaining=()):
+        with self._cond:
+            if not self._abandoned:
+                self._pending = list(remaining)
+
+    def _take(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._closing or self._flush_requested, self.flush_interval)
+            self._flush_requested = False
+            # Les opérations d'un envoi interrompu par une erreur sont retentées en tête
+            ops, self._ops = self._pending + self._ops, []
+            self._pending = list(ops)
+            self._sending = True
+            return ops, self._closing
+
+    def _done_sending(self):
+        with self._cond:
+            self._sending = False
+            self._cond.notify_all()
+
+    def _run(self):
+        client = None
+        # Rejoue d'abord les runs d'exécutions précédentes restés en local
+        try:
+            replay_spilled(self.spill_dir, self.tracking_uri)
+        except Exception as e:
+            print(f"⚠️ Rejeu des runs MLflow déversés impossible : {e}")
+
+        while True:
+            ops, closing = self._take()
+            try:
+                client = client or _client(self.tracking_uri)
+                if self.spilled:
+                    # Serveur déjà en échec : on ajoute au fichier et on retente le rejeu
+                    if ops:
+                        self._spill_pending(ops)
+                    self._replay_own(client)
+                else:
+                    self._send(client, ops)
+            except Exception as e:
+                print(f"❌ Erreur de suivi MLflow : {e}")
+            finally:
+                self._done_sending()
+            if closing:
+                return
+
+    def _send(self, client, ops):
+        while ops:
+            try:
+                apply_ops(client, self._header, ops)
+                self._acknowledge()
+                break
+            except ApplyError as e:
+                if is_transient(e.error):
+                    print(f"⚠️ Serveur MLflow injoignable, run déversé localement : {e}")
+                    self._spill_pending(ops[e.applied :])
+                    break
+                # Erreur définitive : on écarte l'opération fautive et on continue
+                print(f"❌ Erreur de suivi MLflow (opération ignorée) : {e}")
+                skip = e.applied + 1
+                if ops[e.applied]["op"] in BATCH_OPS:
+                    while skip < len(ops) and ops[skip]["op"] in BATCH_OPS:
+                        skip += 1
+                ops = ops[skip:]
+                self._acknowledge(ops)
+        if not ops and not self._header["run_id"]:
+            try:
+                _ensure_run(client, self._header)
+            except Exception as e:
+                if is_transient(e):
+                    self._spill_pending([])
+        if self._header["run_id"]:
+            self._run_created.set()
+
+    def _replay_own(self, client):
+        with self._spill_lock:
+            replayed, header = replay_file(self.spill_path, client)
+            self._header["run_id"] = header.get("run_id")
+            if replayed or not os.path.exists(self.spill_path):
+                self.spilled = False
+        if self._header["run_id"]:
+            self._run_created.set()
@@ -0,0 +1,308 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from feature_encoder import FeatureEncoder
+from tree_predictor import CompiledForest
+
+# Identification du format ; à incrémenter si la structure du bundle change
+BUNDLE_FORMAT = "churn-model-bundle"
+BUNDLE_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+BOOSTER_FILE = "model.ubj"
+PREDICTOR_DIR = "predictor"
+
+REQUIRED_KEYS = ("format", "format_version", "model_version", "feature_names", "encoder", "files")
+
+# Modèle chargé depuis un bundle : modèle XGBoost, plan d'encodage, manifeste
+# et prédicteur compilé (None s'il n'a pas été sauvegardé)
+ModelBundle = namedtuple("ModelBundle", ["model", "encoder", "manifest", "forest"])
+
+
+class BundleError(ValueError):
+    """
+    Bundle incomplet, corrompu ou incompatible avec ce code.
+    """
+
+
+def bundle_path_for(model_path):
+    """
+    Répertoire du bundle à côté d'un modèle (`model.pkl` -> `model.bundle`).
+    """
+    return os.path.splitext(model_path)[0] + ".bundle"
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe_files(root):
+    """
+    Taille et empreinte de chaque fichier du bundle (chemins relatifs).
+    """
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            if relative != MANIFEST_FILE:
+                files[relative] = {"bytes": os.path.getsize(path), "sha256": _sha256(path)}
+    return files
+
+
+def _source_info(path):
+    """
+    Identité du pickle accompagné par le bundle (taille, date, sha256).
+    """
+    stat = os.stat(path)
+    return {
+        "file": os.path.basename(path),
+        "bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _sha256(path),
+    }
+
+
+def current_bundle_path(model_path):
+    """
+    Bundle à charger pour `model_path`, ou None s'il n'existe pas ou ne
+    correspond plus au pickle (pickle réécrit sans bundle, copié à la
+    main...) : c'est alors le pickle qui fait foi. Sans pickle, le bundle
+    est toujours utilisé.
+    """
+    path = bundle_path_for(model_path)
+    if not os.path.isdir(path):
+        return None
+    if not os.path.exists(model_path):
+        return path
+    stat = os.stat(model_path)
+    source = read_manifest(path).get("source")
+    if source is None:
+        # Bundle d'avant l'enregistrement du pickle source : comparaison des dates
+        return path if os.path.getmtime(os.path.join(path, MANIFEST_FILE)) >= stat.st_mtime else None
+    if (source["bytes"], source["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        return path
+    return path if source["sha256"] == _sha256(model_path) else None
+
+
+def _replace_dir(tmp_path, path):
+    """
+    Installe le répertoire construit à la place de l'ancien bundle. L'ancien
+    est renommé puis supprimé : un lecteur voit l'un ou l'autre, jamais un
+    mélange des deux.
+    """
+    old_path = None
+    if os.path.exists(path):
+        old_path = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".old-")
+        os.rmdir(old_path)
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    if old_path is not None:
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+def save_bundle(
+    model, path, encoder, training_data_hash=None, version=None, include_predictor=True, source_path=None
+):
+    """
+    Sauvegarde un modèle au format bundle :
+
+    - `manifest.json` : features, plan d'encodage, version du modèle,
+      empreinte des données d'entraînement, taille et sha256 des fichiers ;
+    - `model.ubj` : le booster au format natif XGBoost (UBJSON) ;
+    - `predictor/*.npy` : les tableaux du prédicteur compilé, si le modèle
+      est supporté (rechargés en mémoire mappée).
+
+    `source_path` est le pickle que le bundle accompagne : son identité est
+    enregistrée pour écarter le bundle si le pickle change sans lui.
+
+    Le bundle est construit dans un répertoire temporaire puis installé
+    d'un coup. Retourne le manifeste.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    os.chmod(tmp_path, 0o755)
+    try:
+        booster = model.get_booster()
+        model.save_model(os.path.join(tmp_path, BOOSTER_FILE))
+
+        predictor = None
+        if include_predictor:
+            try:
+                forest = CompiledForest.from_model(model)
+                predictor = forest.save_arrays(os.path.join(tmp_path, PREDICTOR_DIR))
+            except (NotImplementedError, AttributeError, KeyError, ValueError) as e:
+                print(f"⚠️ Prédicteur compilé non inclus dans le bundle : {e}")
+
+        files = _describe_files(tmp_path)
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "format_version": BUNDLE_FORMAT_VERSION,
+            "model_version": version or files[BOOSTER_FILE]["sha256"][:12],
+            "created_at": time.time(),
+            "training_data_hash": training_data_hash,
+            "feature_names": list(encoder.columns),
+            "encoder": encoder.to_dict(),
+            "n_trees": booster.num_boosted_rounds(),
+            "best_iteration": best_iteration,
+            "predictor": predictor,
+            "files": files,
+            "source": _source_info(source_path) if source_path else None,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        _replace_dir(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    print(f"💾 Bundle du modèle sauvegardé sous {path} (version {manifest['model_version']})")
+    return manifest
+
+
+def read_manifest(path):
+    """
+    Lit et valide le manifeste d'un bundle.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise BundleError(f"⚠️ Manifeste introuvable : {manifest_path}")
+    except json.JSONDecodeError as e:
+        raise BundleError(f"⚠️ Manifeste illisible ({manifest_path}) : {e}")
+
+    missing = [key for key in REQUIRED_KEYS if key not in manifest]
+    if missing:
+        raise BundleError(f"⚠️ Champs manquants dans le manifeste : {missing}")
+    if manifest["format"] != BUNDLE_FORMAT:
+        raise BundleError(f"⚠️ Format inconnu : {manifest['format']}")
+    if manifest["format_version"] > BUNDLE_FORMAT_VERSION:
+        raise BundleError(
+            f"⚠️ Bundle en version {manifest['format_version']}, ce code lit jusqu'à la version {BUNDLE_FORMAT_VERSION}"
+        )
+    if BOOSTER_FILE not in manifest["files"]:
+        raise BundleError(f"⚠️ {BOOSTER_FILE} absent du manifeste")
+    if list(manifest["encoder"]["columns"]) != list(manifest["feature_names"]):
+        raise BundleError("⚠️ Le plan d'encodage ne correspond pas aux features du manifeste")
+    return manifest
+
+
+def verify_files(path, manifest, checksums=True):
+    """
+    Vérifie la présence, la taille et (si `checksums`) l'empreinte des
+    fichiers listés dans le manifeste.
+    """
+    for relative, expected in manifest["files"].items():
+        file_path = os.path.join(path, relative)
+        if not os.path.isfile(file_path):
+            raise BundleError(f"⚠️ Fichier manquant dans le bundle : {relative}")
+        if os.path.getsize(file_path) != expected["bytes"]:
+            raise BundleError(f"⚠️ Taille inattendue pour {relative}")
+        if checksums and _sha256(file_path) != expected["sha256"]:
+            raise BundleError(f"⚠️ Empreinte sha256 différente pour {relative}")
+
+
+def load_bundle(path, nthread=None, checksums=True, load_predictor=True):
+    """
+    Charge un bundle après validation du manifeste et des fichiers, sans
+    unpickle : booster natif, prédicteur en mémoire mappée.
+    """
+    from model_serving import load_native_model
+
+    manifest = read_manifest(path)
+    verify_files(path, manifest, checksums)
+
+    model = load_native_model(os.path.join(path, BOOSTER_FILE), nthread)
+    booster = model.get_booster()
+    n_features = booster.num_features()
+    if n_features != len(manifest["feature_names"]):
+        raise BundleError(
+            f"⚠️ Le booster attend {n_features} features, le manifeste en liste {len(manifest['feature_names'])}"
+        )
+    if booster.feature_names is not None and list(booster.feature_names) != manifest["feature_names"]:
+        raise BundleError("⚠️ Les noms de features du booster diffèrent du manifeste")
+    if booster.num_boosted_rounds() != manifest.get("n_trees", booster.num_boosted_rounds()):
+        raise BundleError("⚠️ Nombre d'arbres différent du manifeste")
+
+    forest = None
+    if load_predictor and manifest.get("predictor"):
+        forest = CompiledForest.load_arrays(os.path.join(path, PREDICTOR_DIR), manifest["predictor"])
+    encoder = FeatureEncoder.from_dict(manifest["encoder"])
+    return ModelBundle(model, encoder, manifest, forest)
+
+
+def load_bundle_predictor(path):
+    """
+    Prédicteur compilé seul (sans XGBoost) et manifeste d'un bundle, pour
+    un démarrage rapide. Retourne (None, manifeste) si le bundle n'en a pas.
+    """
+    manifest = read_manifest(path)
+    verify_files(path, manifest, checksums=False)
+    if not manifest.get("predictor"):
+        return None, manifest
+    return CompiledForest.load_arrays(os.path.join(path, PREDICTOR_DIR), manifest["predictor"]), manifest
+
+
+def convert_pickle(pickle_path, output=None, training_data=None):
+    """
+    Convertit un modèle pickle existant (et son plan d'encodage) en bundle.
+    """
+    import pickle
+
+    from dataset_cache import file_digest
+    from feature_encoder import load_encoder
+
+    with open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    encoder = load_encoder(pickle_path, model)
+    return save_bundle(
+        model,
+        output or bundle_path_for(pickle_path),
+        encoder,
+        training_data_hash=file_digest(training_data) if training_data else None,
+        source_path=pickle_path,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bundles de modèle (manifeste + booster UBJSON)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Convertir un modèle .pkl en bundle")
+    convert.add_argument("model_path", help="Modèle pickle à convertir")
+    convert.add_argument("--output", help="Répertoire du bundle (défaut : <modèle>.bundle)")
+    convert.add_argument("--training-data", help="Données d'entraînement, pour l'empreinte du manifeste")
+
+    verify = commands.add_parser("verify", help="Valider un bundle")
+    verify.add_argument("bundle_path")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        convert_pickle(args.model_path, args.output, args.training_data)
+    else:
+        bundle = load_bundle(args.bundle_path)
+        manifest = bundle.manifest
+        print(
+            f"✅ Bundle valide : version {manifest['model_version']}, {manifest['n_trees']} arbres, "
+            f"{len(manifest['feature_names'])} features, prédicteur compilé : {'oui' if bundle.forest else 'non'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
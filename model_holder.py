@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder, load_encoder
+from model_bundle import MANIFEST_FILE, current_bundle_path, load_bundle
+from model_serving import NTHREAD_ENV, current_native_path, load_serving_model
+from tree_predictor import compile_predictor
+
+# Version du modèle servie : modèle, plan d'encodage, identifiant de version,
+# et prédicteur à utiliser pour `predict_proba` (compilé pour les petits lots)
+ModelSnapshot = namedtuple(
+    "ModelSnapshot", ["model", "encoder", "version", "loaded_at", "predictor"], defaults=(None,)
+)
+
+
+def validate_snapshot(snapshot, n_rows=16):
+    """
+    Chauffe le modèle et vérifie ses sorties sur un petit lot de validation,
+    après avoir vérifié que le plan d'encodage suit les features du modèle.
+    """
+    names = getattr(snapshot.model, "feature_names_in_", None)
+    if names is not None and snapshot.encoder.columns != [str(name) for name in names]:
+        raise ValueError("⚠️ Plan d'encodage différent des features du modèle")
+
+    rng = np.random.default_rng(0)
+    batch = rng.uniform(0, 300, (n_rows, snapshot.encoder.n_features)).astype(np.float32)
+    batch[0] = 0.0
+
+    probas = snapshot.model.predict_proba(batch)
+    if probas.shape != (n_rows, 2):
+        raise ValueError(f"⚠️ Sortie inattendue du modèle : {probas.shape}")
+    if not np.all(np.isfinite(probas)) or probas.min() < 0 or probas.max() > 1:
+        raise ValueError("⚠️ Probabilités invalides sur le lot de validation")
+
+
+def registry_encoder(model_path, model):
+    """
+    Plan d'encodage d'un modèle du registre : celui sauvegardé à côté de
+    `model_path` s'il décrit les mêmes colonnes, sinon reconstruit à partir des
+    features du modèle (le fichier local peut appartenir à un autre modèle).
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        raise ValueError("⚠️ Modèle du registre sans noms de features : encodage inconnu")
+    names = [str(name) for name in names]
+    try:
+        encoder = load_encoder(model_path)
+        if encoder.columns == names:
+            return encoder
+    except FileNotFoundError:
+        pass
+    return FeatureEncoder.from_feature_names(names)
+
+
+class ModelHolder:
+    """
+    Référence vers le modèle servi, remplaçable sans interrompre le service.
+
+    Le nouveau modèle est chargé, chauffé et validé à part, puis la référence
+    est remplacée d'un seul coup. Une requête qui a lu `current` termine sur
+    l'ancienne version. La source surveillée est soit l'artefact sur disque,
+    soit la dernière version d'un modèle du registre MLflow.
+    """
+
+    def __init__(self, model_path, registry_name=None, poll_interval=5.0):
+        self.model_path = model_path
+        self.registry_name = registry_name
+        self.poll_interval = poll_interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    @property
+    def current(self):
+        return self._snapshot
+
+    def _artifact_path(self):
+        """
+        Artefact servi : bundle, sinon format natif, sinon pickle (bundle et
+        format natif seulement s'ils correspondent toujours au pickle).
+        """
+        bundle_path = current_bundle_path(self.model_path)
+        if bundle_path is not None:
+            return os.path.join(bundle_path, MANIFEST_FILE)
+        return current_native_path(self.model_path) or self.model_path
+
+    def source_version(self):
+        """
+        Version disponible à la source (fichier ou registre MLflow).
+        """
+        if self.registry_name:
+            from mlflow.tracking import MlflowClient
+
+            versions = MlflowClient().search_model_versions(
+                f"name='{self.registry_name}'",
+                order_by=["version_number DESC"],
+                max_results=1,
+            )
+            return versions[0].version if versions else None
+
+        path = self._artifact_path()
+        stat = os.stat(path)
+        if os.path.basename(path) == MANIFEST_FILE:
+            with open(path) as f:
+                return f"{json.load(f)['model_version']}@{stat.st_mtime_ns}"
+        return f"{os.path.basename(path)}@{stat.st_mtime_ns}"
+
+    def _load(self, version):
+        if self.registry_name:
+            import mlflow.xgboost
+
+            model = mlflow.xgboost.load_model(f"models:/{self.registry_name}/{version}")
+            encoder = registry_encoder(self.model_path, model)
+            version = f"{self.registry_name}/{version}"
+        elif current_bundle_path(self.model_path) is not None:
+            nthread = int(os.environ.get(NTHREAD_ENV, "0")) or None
+            bundle = load_bundle(current_bundle_path(self.model_path), nthread)
+            predictor = compile_predictor(bundle.model, bundle.forest) or bundle.model
+            return ModelSnapshot(bundle.model, bundle.encoder, version, time.time(), predictor)
+        else:
+            model = load_serving_model(self.model_path)
+            encoder = load_encoder(self.model_path, model)
+        return ModelSnapshot(model, encoder, version, time.time(), compile_predictor(model) or model)
+
+    def load(self):
+        """
+        Charge, valide puis installe la version disponible à la source.
+        """
+        with self._lock:
+            version = self.source_version()
+            snapshot = self._load(version)
+            validate_snapshot(snapshot)
+            self._snapshot = snapshot
+            self.reloads += 1
+            return snapshot
+
+    def reload_if_changed(self):
+        """
+        Recharge le modèle si la source a changé. En cas d'échec, l'ancienne
+        version reste servie et une nouvelle tentative a lieu au prochain cycle.
+        """
+        try:
+            version = self.source_version()
+            if self._snapshot is not None and version in (
+                self._snapshot.version,
+                f"{self.registry_name}/{version}",
+            ):
+                return False
+            snapshot = self.load()
+            print(f"🔄 Nouveau modèle en service : {snapshot.version}")
+            return True
+        except Exception as e:
+            self.failed_reloads += 1
+            print(f"⚠️ Rechargement du modèle échoué, ancienne version conservée : {e}")
+            return False
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def start_watching(self):
+        """
+        Lance la surveillance de la source dans un thread de fond.
+        """
+        if self.poll_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
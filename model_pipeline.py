@@ -1,7 +1,13 @@
+import os
 import pandas as pd
 import numpy as np
 import pickle
 from xgboost import XGBClassifier
+from feature_encoder import CATEGORICAL_COLS, FeatureEncoder, TARGET_COL, encoder_path_for
+from dataset_cache import DEFAULT_CACHE_DIR, cache_key, entry_dir, load_prepared, save_prepared
+from model_bundle import bundle_path_for, current_bundle_path, load_bundle, save_bundle
+from model_serving import remember_tree_params
+from drift_monitor import build_profile, save_profile
 
 # Définition des 14 features à utiliser
 SELECTED_FEATURES = [
@@ -22,76 +28,88 @@ SELECTED_FEATURES = [
 ]
 
 
-def preprocess_data(df):
+def encode_file(path, encoder=None):
     """
-    Convertit les variables catégoriques en numériques pour XGBoost.
+    Lit un CSV et l'encode avec `encoder`, ou à défaut avec un plan
+    d'encodage appris sur ce fichier.
     """
-    categorical_cols = ["State", "International plan", "Voice mail plan"]
+    df = pd.read_csv(path)
 
-    # Vérifier quelles colonnes existent dans le dataset
-    categorical_cols = [col for col in categorical_cols if col in df.columns]
-
-    df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
-
-    # Vérifier si toutes les colonnes sont numériques après transformation
-    print(f"✅ Nombre de features après encodage : {df.shape[1]}")
-    print("✅ Vérification des types après transformation :")
-    print(df.dtypes)
+    # Vérifier si la colonne cible "Churn" est bien présente
+    if TARGET_COL not in df.columns:
+        raise ValueError("⚠️ La colonne 'Churn' est manquante dans les datasets.")
 
-    return df
+    file_encoder = encoder or FeatureEncoder.fit(df, SELECTED_FEATURES)
+    X = file_encoder.transform(df)
+    y = file_encoder.encode_target(df[TARGET_COL])
+    print(f"✅ Nombre de features après encodage : {X.shape[1]}")
+    return X, y, file_encoder
 
 
-def align_features(train_df, test_df):
-    """
-    S'assure que le dataset de test a les mêmes colonnes que le dataset d'entraînement.
-    Ajoute les colonnes manquantes avec des 0 et supprime les colonnes en trop.
+def prepare_arrays(path, encoder=None, cache_dir=DEFAULT_CACHE_DIR):
     """
-    train_cols = set(train_df.columns)
-    test_cols = set(test_df.columns)
-
-    # Ajouter les colonnes manquantes dans le test avec des 0
-    missing_cols = train_cols - test_cols
-    for col in missing_cols:
-        test_df[col] = 0
+    Encode un fichier CSV en tableaux NumPy (X float32, y 0/1) avec
+    `encoder` (par exemple le plan appris sur l'entraînement, appliqué au
+    test). Sans `encoder`, le plan d'encodage est appris sur ce fichier.
 
-    # Supprimer les colonnes en trop dans le test
-    extra_cols = test_cols - train_cols
-    test_df = test_df.drop(columns=extra_cols, errors="ignore")
-
-    # Réordonner les colonnes pour qu'elles soient identiques
-    test_df = test_df[train_df.columns]
+    Le résultat est mis en cache sous une clé dérivée du contenu du fichier,
+    de `SELECTED_FEATURES` et du plan imposé : les appels suivants relisent
+    les `.npy` en mémoire mappée au lieu de re-parser le CSV.
+    `cache_dir=None` désactive le cache.
+    """
+    key = None
+    if cache_dir:
+        key = cache_key(path, SELECTED_FEATURES, CATEGORICAL_COLS, encoder)
+        cached = load_prepared(cache_dir, key)
+        if cached is not None:
+            X, y, cached_encoder = cached
+            print(f"⚡ Dataset préparé chargé depuis le cache : {path}")
+            return X, y, cached_encoder
 
-    return test_df
+    X, y, file_encoder = encode_file(path, encoder)
+    if key is not None:
+        save_prepared(cache_dir, key, X, y, file_encoder)
+    return X, y, file_encoder
 
 
-def prepare_data(train_path, test_path):
+def prepare_cached(path, cache_dir=DEFAULT_CACHE_DIR):
     """
-    Charge et prépare les données d'entraînement et de test.
+    Garantit que le dataset préparé est en cache et retourne le répertoire de
+    l'entrée (X.npy, y.npy), que d'autres processus peuvent ouvrir en mémoire
+    mappée sans copie.
     """
-    train_df = pd.read_csv(train_path)
-    test_df = pd.read_csv(test_path)
+    key = cache_key(path, SELECTED_FEATURES, CATEGORICAL_COLS)
+    if not os.path.isdir(entry_dir(cache_dir, key)):
+        X, y, file_encoder = encode_file(path)
+        save_prepared(cache_dir, key, X, y, file_encoder)
+    return entry_dir(cache_dir, key)
 
-    # Appliquer la conversion des catégories en numériques
-    train_df = preprocess_data(train_df)
-    test_df = preprocess_data(test_df)
-
-    # Vérifier si la colonne cible "Churn" est bien présente
-    if "Churn" not in train_df.columns or "Churn" not in test_df.columns:
-        raise ValueError("⚠️ La colonne 'Churn' est manquante dans les datasets.")
-
-    # Aligner les features entre train et test
-    test_df = align_features(train_df, test_df)
-
-    # Séparer les features (X) et la cible (y)
-    X_train = train_df.drop(columns=["Churn"])
-    y_train = train_df["Churn"]
-    X_test = test_df.drop(columns=["Churn"])
-    y_test = test_df["Churn"]
-
-    # Sélectionner uniquement les 14 features
-    X_train = X_train[SELECTED_FEATURES]
-    X_test = X_test[SELECTED_FEATURES]
 
+def prepare_data(train_path, test_path, return_encoder=False, cache_dir=DEFAULT_CACHE_DIR, profile_path=None):
+    """
+    Charge et prépare les données d'entraînement et de test.
+    Le plan d'encodage est appris sur le dataset d'entraînement puis appliqué
+    tel quel au test, exactement comme au moment du service.
+    Avec `return_encoder=True`, retourne aussi le `FeatureEncoder`.
+    Avec `profile_path`, le profil de référence des données d'entraînement
+    (utilisé par le suivi de dérive du service) y est sauvegardé.
+    """
+    X_train, y_train, encoder = prepare_arrays(train_path, cache_dir=cache_dir)
+    if profile_path:
+        save_profile(build_profile(X_train, encoder, source=train_path), profile_path)
+    if test_path == train_path:
+        X_test, y_test = X_train, y_train
+    else:
+        X_test, y_test, _ = prepare_arrays(test_path, encoder, cache_dir=cache_dir)
+
+    # Les DataFrames partagent la mémoire des tableaux (pas de copie)
+    X_train = pd.DataFrame(X_train, columns=encoder.columns, copy=False)
+    X_test = pd.DataFrame(X_test, columns=encoder.columns, copy=False)
+    y_train = pd.Series(y_train, name=TARGET_COL, copy=False)
+    y_test = pd.Series(y_test, name=TARGET_COL, copy=False)
+
+    if return_encoder:
+        return X_train, X_test, y_train, y_test, encoder
     return X_train, X_test, y_train, y_test
 
 
@@ -111,11 +129,10 @@ def train_model(train_path):
 
 def custom_accuracy_score(y_true, y_pred):
     """
-    Fonction manuelle pour calculer la précision du modèle.
+    Fonction manuelle pour calculer la précision du modèle (comparaison
+    vectorisée, sans boucle Python sur les lignes).
     """
-    correct = sum(np.array(y_true) == np.array(y_pred))
-    total = len(y_true)
-    return correct / total
+    return float(np.mean(np.asarray(y_true) == np.asarray(y_pred)))
 
 
 def evaluate_model(model, test_path):
@@ -136,19 +153,41 @@ def evaluate_model(model, test_path):
     return accuracy
 
 
-def save_model(model, filename):
+def save_model(model, filename, encoder=None, training_data_hash=None):
     """
     Sauvegarde le modèle entraîné dans un fichier.
+    Le plan d'encodage, s'il est fourni, est sauvegardé à côté du modèle,
+    ainsi qu'un bundle (manifeste + booster natif) chargeable sans pickle.
     """
-    with open(filename, "wb") as f:
+    # Hyperparamètres conservés dans l'artefact (réentraînement incrémental)
+    remember_tree_params(model)
+
+    # Écriture atomique : un service qui surveille le fichier ne lit jamais
+    # un modèle à moitié écrit
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "wb") as f:
         pickle.dump(model, f)
+    os.replace(tmp_filename, filename)
     print(f"💾 Modèle sauvegardé sous {filename}")
 
+    if encoder is not None:
+        encoder.save(encoder_path_for(filename))
+        save_bundle(
+            model, bundle_path_for(filename), encoder, training_data_hash=training_data_hash, source_path=filename
+        )
+
 
 def load_model(filename):
     """
     Charge un modèle à partir d'un fichier.
-    """
+    Le bundle sauvegardé à côté est utilisé en priorité (sans unpickle),
+    s'il correspond toujours au pickle.
+    """
+    bundle_path = current_bundle_path(filename)
+    if bundle_path is not None:
+        model = load_bundle(bundle_path, load_predictor=False).model
+        print(f"📂 Modèle chargé depuis {bundle_path}")
+        return model
     with open(filename, "rb") as f:
         model = pickle.load(f)
     print(f"📂 Modèle chargé depuis {filename}")
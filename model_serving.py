@@ -0,0 +1,141 @@
+import json
+import os
+import pickle
+
+from xgboost import XGBClassifier
+
+# Nombre de threads XGBoost par worker (fixé par le lanceur `serve.py`)
+NTHREAD_ENV = "MODEL_NTHREAD"
+
+
+def set_nthread(model, nthread):
+    """
+    Fixe le nombre de threads XGBoost du modèle. Passe directement par le
+    booster : `set_params` échoue sur les pickles d'anciennes versions.
+    """
+    model.n_jobs = nthread
+    model.get_booster().set_param("nthread", nthread)
+
+
+# Hyperparamètres d'arbre (noms natifs XGBoost) et leur nom dans XGBClassifier
+TREE_PARAMS = {
+    "max_depth": "max_depth",
+    "eta": "learning_rate",
+    "gamma": "gamma",
+    "min_child_weight": "min_child_weight",
+    "max_delta_step": "max_delta_step",
+    "subsample": "subsample",
+    "colsample_bytree": "colsample_bytree",
+    "colsample_bylevel": "colsample_bylevel",
+    "colsample_bynode": "colsample_bynode",
+    "lambda": "reg_lambda",
+    "alpha": "reg_alpha",
+    "max_bin": "max_bin",
+    "max_leaves": "max_leaves",
+    "grow_policy": "grow_policy",
+}
+
+# Attribut du booster qui conserve ces hyperparamètres dans l'artefact
+TREE_PARAMS_ATTR = "tree_params"
+
+
+def _config_value(value):
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def tree_params(model):
+    """
+    Hyperparamètres d'arbre d'un XGBClassifier ou d'un booster.
+
+    Le format natif et `load_model` ne conservent pas la configuration
+    d'entraînement (un booster rechargé annonce max_depth=6, eta=0.3) :
+    la copie mémorisée par `remember_tree_params` l'emporte, puis les
+    attributs du XGBClassifier, puis la configuration du booster.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    config = json.loads(booster.save_config())["learner"]["gradient_booster"].get("tree_train_param", {})
+    params = {name: _config_value(config[name]) for name in TREE_PARAMS if name in config}
+    for name, attribute in TREE_PARAMS.items():
+        value = getattr(model, attribute, None)
+        if value is not None:
+            params[name] = value
+    saved = booster.attr(TREE_PARAMS_ATTR)
+    if saved:
+        params.update(json.loads(saved))
+    return params
+
+
+def remember_tree_params(model):
+    """
+    Copie les hyperparamètres d'arbre dans les attributs du booster, qui
+    sont sauvegardés avec le modèle (pickle, format natif, bundle).
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster.set_attr(**{TREE_PARAMS_ATTR: json.dumps(tree_params(model))})
+    return model
+
+
+def native_model_path(model_path):
+    """
+    Chemin du modèle au format natif XGBoost (UBJSON) à côté d'un pickle.
+    """
+    return os.path.splitext(model_path)[0] + ".ubj"
+
+
+def current_native_path(model_path):
+    """
+    Export natif à charger pour `model_path`, ou None s'il n'existe pas ou
+    s'il est plus ancien que le pickle (réécrit sans réexport).
+    """
+    native_path = native_model_path(model_path)
+    if not os.path.exists(native_path):
+        return None
+    if os.path.exists(model_path) and os.path.getmtime(native_path) < os.path.getmtime(model_path):
+        return None
+    return native_path
+
+
+def export_native_model(model, path):
+    """
+    Sauvegarde le modèle au format natif XGBoost, chargeable sans pickle.
+    """
+    # Fichier temporaire avec la même extension (XGBoost en déduit le format)
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{ext}"
+    model.save_model(tmp_path)
+    os.replace(tmp_path, path)
+    print(f"💾 Modèle natif sauvegardé sous {path}")
+
+
+def load_native_model(path, nthread=None):
+    """
+    Charge un modèle natif XGBoost sans unpickle. XGBoost lit le fichier et
+    reconstruit les arbres dans sa propre mémoire (chaque worker a sa copie).
+    """
+    model = XGBClassifier()
+    model.load_model(path)
+    if nthread:
+        set_nthread(model, nthread)
+    return model
+
+
+def load_serving_model(model_path):
+    """
+    Charge le modèle de service : format natif s'il a été exporté (et
+    n'est pas plus ancien que le pickle), sinon le pickle historique.
+    """
+    nthread = int(os.environ.get(NTHREAD_ENV, "0")) or None
+    native_path = current_native_path(model_path)
+    if native_path is not None:
+        return load_native_model(native_path, nthread)
+
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    if nthread:
+        set_nthread(model, nthread)
+    return model
@@ -0,0 +1,199 @@
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBClassifier
+
+from batch_scoring import DEFAULT_CHUNKSIZE, read_chunks
+from feature_encoder import FeatureEncoder, TARGET_COL
+from model_pipeline import SELECTED_FEATURES
+from model_serving import remember_tree_params
+
+# Hyperparamètres par défaut (mêmes valeurs que `main.py --train`)
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_depth": 3,
+    "learning_rate": 0.1,
+}
+DEFAULT_NUM_BOOST_ROUND = 100
+
+
+def peak_rss_mb():
+    """
+    Pic de mémoire résidente du processus, en Mo.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sur macOS, en Ko sous Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb():
+    """
+    Mémoire résidente actuelle (Linux), sinon le pic du processus.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+class MemorySampler:
+    """
+    Échantillonne la mémoire résidente dans un thread de fond pendant une
+    étape, pour en retenir le pic (y compris la mémoire native de XGBoost).
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss_mb())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.peak = current_rss_mb()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+def booster_to_classifier(booster):
+    """
+    Enveloppe un booster natif dans un `XGBClassifier`, pour rester compatible
+    avec `save_model`, `evaluate_model` et les API de service.
+    """
+    # La configuration d'entraînement est perdue à la sérialisation
+    remember_tree_params(booster)
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+
+def train_params(params=None, nthread=None):
+    merged = dict(DEFAULT_PARAMS)
+    merged.update(params or {})
+    merged["nthread"] = nthread or os.cpu_count() or 1
+    return merged
+
+
+def train_quantile_dmatrix(X, y, params=None, num_boost_round=DEFAULT_NUM_BOOST_ROUND, nthread=None):
+    """
+    Entraîne directement sur une `QuantileDMatrix` construite à partir des
+    tableaux float32 encodés : pas de conversion pandas, et les données sont
+    quantifiées une seule fois (tree_method="hist").
+    """
+    params = train_params(params, nthread)
+    dtrain = xgb.QuantileDMatrix(
+        np.asarray(X, dtype=np.float32),
+        label=np.asarray(y),
+        feature_names=list(SELECTED_FEATURES),
+        nthread=params["nthread"],
+    )
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+    return booster_to_classifier(booster)
+
+
+class CSVChunkIter(xgb.DataIter):
+    """
+    Itérateur XGBoost sur un CSV lu par blocs, pour l'entraînement en mémoire
+    externe. Chaque bloc est encodé avec le plan `SELECTED_FEATURES` ; les
+    catégories rencontrées sont accumulées dans l'encodeur.
+    """
+
+    def __init__(self, path, encoder, chunksize=DEFAULT_CHUNKSIZE, cache_prefix=None):
+        self.path = path
+        self.encoder = encoder
+        self.chunksize = chunksize
+        self.rows = 0
+        self._seen = {col: set() for col in encoder.categorical_cols}
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = read_chunks(self.path, self.chunksize)
+            self.rows = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+
+        if TARGET_COL not in chunk.columns:
+            raise ValueError("⚠️ La colonne 'Churn' est manquante dans les datasets.")
+        for col, seen in self._seen.items():
+            if col in chunk.columns:
+                seen.update(chunk[col].dropna().astype(str).unique())
+
+        self.rows += len(chunk)
+        input_data(
+            data=self.encoder.transform(chunk),
+            label=self.encoder.encode_target(chunk[TARGET_COL]),
+            feature_names=self.encoder.columns,
+        )
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+    def categories(self):
+        return {col: sorted(seen) for col, seen in self._seen.items() if seen}
+
+
+def train_external_memory(
+    path,
+    params=None,
+    num_boost_round=DEFAULT_NUM_BOOST_ROUND,
+    nthread=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+):
+    """
+    Entraîne sur un CSV plus grand que la mémoire : XGBoost lit le fichier
+    bloc par bloc via `CSVChunkIter` et garde ses pages quantifiées sur disque.
+    Retourne (modèle, encodeur, nombre de lignes).
+    """
+    params = train_params(params, nthread)
+    encoder = FeatureEncoder(SELECTED_FEATURES)
+
+    with tempfile.TemporaryDirectory(prefix="xgb-extmem-") as cache_dir:
+        it = CSVChunkIter(path, encoder, chunksize, cache_prefix=os.path.join(cache_dir, "cache"))
+        if hasattr(xgb, "ExtMemQuantileDMatrix"):
+            dtrain = xgb.ExtMemQuantileDMatrix(it, nthread=params["nthread"])
+        else:
+            dtrain = xgb.DMatrix(it, nthread=params["nthread"])
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+        del dtrain
+
+    encoder.categories = it.categories()
+    return booster_to_classifier(booster), encoder, it.rows
+
+
+def measure(fn, *args, **kwargs):
+    """
+    Exécute `fn` et retourne (résultat, durée en secondes, mémoire ajoutée en
+    Mo). La mémoire est échantillonnée pendant l'appel : c'est le pic atteint
+    moins la RSS de départ, et non le pic de toute la vie du processus.
+    """
+    baseline = current_rss_mb()
+    with MemorySampler() as memory:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    return result, seconds, max(0.0, memory.peak - baseline)
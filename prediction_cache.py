@@ -0,0 +1,111 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Surcoût approximatif d'une entrée (clé, tuple, nœud de l'OrderedDict)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def vector_key(vector):
+    """
+    Empreinte rapide d'un vecteur encodé (float32), utilisée comme clé de cache.
+    """
+    data = np.ascontiguousarray(vector, dtype=np.float32)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).digest()
+
+
+def value_size(value):
+    """
+    Taille mémoire approximative d'une valeur en cache.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes + ENTRY_OVERHEAD_BYTES
+    return sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+
+
+class PredictionCache:
+    """
+    Cache LRU/TTL des prédictions, borné en mémoire.
+
+    Les clés combinent la version du modèle et l'empreinte du vecteur encodé :
+    après un rechargement à chaud, les anciennes entrées ne sont plus jamais
+    lues et sortent du cache par l'éviction LRU.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        size = value_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self.current_bytes += size
+
+            # Éviction LRU jusqu'à revenir sous le budget mémoire
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
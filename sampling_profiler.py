@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Profilage à la demande (désactivé par défaut) : PROFILER_ENABLED=1
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILER_MAX_SECONDS = float(os.environ.get("PROFILER_MAX_SECONDS", "60"))
+DEFAULT_INTERVAL = 0.005
+
+# Un seul profilage à la fois par processus
+_running = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def collapse_stack(frame):
+    """
+    Pile d'appels au format "replié" des flame graphs : racine;...;feuille.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Profileur par échantillonnage : toutes les `interval` secondes, un thread
+    relève la pile de chaque autre thread du processus. Aucun coût sur les
+    requêtes en dehors des périodes de profilage.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            thread = names.get(thread_id, str(thread_id)).replace(";", ",")
+            self.stacks[f"{thread};{collapse_stack(frame)}"] += 1
+        self.samples += 1
+
+    def run(self, seconds):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+        return self
+
+    def collapsed(self):
+        """
+        Une ligne "pile nombre" par pile, lisible par flamegraph.pl ou speedscope.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile(seconds, interval=DEFAULT_INTERVAL, output=None):
+    """
+    Profile le processus pendant `seconds` secondes (borné par
+    PROFILER_MAX_SECONDS) et retourne les piles repliées ; les écrit aussi
+    dans `output` si fourni. Lève `ProfilerBusy` si un profilage est en cours.
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("⚠️ Un profilage est déjà en cours")
+    try:
+        profiler = SamplingProfiler(interval).run(min(seconds, PROFILER_MAX_SECONDS))
+    finally:
+        _running.release()
+
+    collapsed = profiler.collapsed()
+    if output:
+        with open(output, "w") as f:
+            f.write(collapsed)
+        print(f"💾 Profil ({profiler.samples} échantillons) écrit dans {output}")
+    return collapsed
@@ -0,0 +1,293 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# Répertoire du store et durée de validité des scores (défaut : 36 h, un
+# passage nocturne manqué est toléré)
+DEFAULT_STORE_PATH = os.environ.get("SCORE_STORE_PATH", "score_store")
+DEFAULT_MAX_AGE = float(os.environ.get("SCORE_STORE_MAX_AGE", str(36 * 3600)))
+
+# Fichier désignant la génération servie (remplacé atomiquement)
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# Générations conservées (la servie et la précédente, encore ouverte par les lecteurs)
+KEEP_GENERATIONS = 2
+
+# Résultat d'une recherche : probabilité, version du modèle, date du calcul,
+# et vecteur encodé (pour rescorer une entrée périmée)
+ScoreEntry = namedtuple("ScoreEntry", ["probability", "model_version", "scored_at", "features"])
+
+
+def _encode_ids(ids):
+    """
+    Identifiants en tableau triable : int64 si numériques entiers (y compris
+    en float, comme pandas les lit dès qu'un identifiant manque), sinon
+    octets UTF-8 de largeur fixe.
+    """
+    ids = np.asarray(ids)
+    if ids.dtype.kind == "f":
+        if not np.all(np.isfinite(ids)):
+            raise ValueError("⚠️ Identifiants manquants ou non finis")
+        if np.all(ids == np.floor(ids)):
+            return ids.astype(np.int64)
+    if ids.dtype.kind in "iu":
+        return ids.astype(np.int64)
+    return np.char.encode(ids.astype(str), "utf-8")
+
+
+def write_generation(root, ids, probas, features, model_version, source=None):
+    """
+    Écrit une génération du store (identifiants triés, probabilités,
+    vecteurs encodés) puis la rend courante d'un seul `os.replace` de
+    `CURRENT`. Pour un identifiant en double, la dernière ligne l'emporte.
+    Retourne le manifeste.
+    """
+    ids = _encode_ids(ids)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    last = np.append(ids[1:] != ids[:-1], True)
+    order, ids = order[last], ids[last]
+
+    os.makedirs(root, exist_ok=True)
+    built_at = time.time()
+    tmp_path = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+    os.chmod(tmp_path, 0o755)
+    try:
+        np.save(os.path.join(tmp_path, "ids.npy"), ids)
+        np.save(os.path.join(tmp_path, "probas.npy"), np.asarray(probas, dtype=np.float32)[order])
+        np.save(os.path.join(tmp_path, "features.npy"), np.asarray(features, dtype=np.float32)[order])
+        manifest = {
+            "model_version": model_version,
+            "built_at": built_at,
+            "rows": int(len(ids)),
+            "id_kind": "int" if ids.dtype.kind == "i" else "str",
+            "source": source,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Nom horodaté en millisecondes, unique et croissant (ordre utilisé par _prune)
+        stamp = int(built_at * 1000)
+        while os.path.exists(os.path.join(root, f"gen-{stamp}")):
+            stamp += 1
+        generation = f"gen-{stamp}"
+        os.rename(tmp_path, os.path.join(root, generation))
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    tmp_current = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(tmp_current, "w") as f:
+        f.write(generation)
+    os.replace(tmp_current, os.path.join(root, CURRENT_FILE))
+    _prune(root, generation)
+    print(f"💾 Store de scores {root}/{generation} : {len(ids)} abonnés, modèle {model_version}")
+    return manifest
+
+
+def _prune(root, current, keep=KEEP_GENERATIONS):
+    """
+    Supprime les anciennes générations ; les fichiers déjà ouverts en mémoire
+    mappée restent lisibles par les lecteurs jusqu'à leur fermeture.
+    """
+    generations = sorted(name for name in os.listdir(root) if name.startswith("gen-") and name != current)
+    for name in generations[: max(0, len(generations) - (keep - 1))]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def current_manifest(root=DEFAULT_STORE_PATH):
+    """
+    Manifeste de la génération courante, ou None si le store est vide.
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            generation = f.read().strip()
+        with open(os.path.join(root, generation, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def build_store(model_path, input_path, id_column, root=DEFAULT_STORE_PATH, chunksize=None, if_changed=False):
+    """
+    Job nocturne : score tous les abonnés d'un fichier (CSV/Parquet) avec le
+    modèle servi et publie une nouvelle génération du store, étiquetée avec
+    la même version que celle vue par le service.
+
+    Avec `if_changed`, ne reconstruit que si la version du modèle diffère de
+    celle du store (à lancer après chaque réentraînement). Retourne le
+    manifeste de la génération courante.
+    """
+    from batch_scoring import DEFAULT_CHUNKSIZE, read_chunks
+    from model_holder import ModelHolder
+
+    holder = ModelHolder(model_path)
+    holder.load()
+    snapshot = holder.current
+    manifest = current_manifest(root)
+    if if_changed and manifest is not None and manifest["model_version"] == snapshot.version:
+        print(f"✅ Store de scores déjà à jour (modèle {snapshot.version})")
+        return manifest
+    predictor = snapshot.predictor or snapshot.model
+
+    ids, probas, features = [], [], []
+    missing = 0
+    for chunk in read_chunks(input_path, chunksize or DEFAULT_CHUNKSIZE):
+        if id_column not in chunk.columns:
+            raise ValueError(f"⚠️ Colonne identifiant absente : {id_column}")
+        # Un abonné sans identifiant ne peut pas être retrouvé : ligne écartée
+        known = chunk[id_column].notna().to_numpy()
+        missing += int((~known).sum())
+        chunk = chunk[known]
+        matrix = snapshot.encoder.transform(chunk)
+        ids.append(chunk[id_column].to_numpy())
+        probas.append(predictor.predict_proba(matrix)[:, 1])
+        features.append(matrix)
+
+    if missing:
+        print(f"⚠️ {missing} ligne(s) sans identifiant écartée(s) du store")
+    return write_generation(
+        root,
+        np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+        np.concatenate(probas) if probas else np.empty(0, dtype=np.float32),
+        np.concatenate(features) if features else np.empty((0, snapshot.encoder.n_features), dtype=np.float32),
+        snapshot.version,
+        source=input_path,
+    )
+
+
+class ScoreGeneration:
+    """
+    Génération ouverte en lecture : tableaux triés en mémoire mappée,
+    recherche dichotomique par identifiant.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.path = path
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.probas = np.load(os.path.join(path, "probas.npy"), mmap_mode="r")
+        self.features = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+        self.model_version = self.manifest["model_version"]
+        self.built_at = self.manifest["built_at"]
+        self._int_ids = self.manifest["id_kind"] == "int"
+
+    def lookup(self, subscriber_id):
+        """
+        Entrée d'un abonné, ou None s'il n'est pas dans le store.
+        """
+        try:
+            key = int(subscriber_id) if self._int_ids else str(subscriber_id).encode("utf-8")
+            if self._int_ids and not -(2**63) <= key < 2**63:
+                return None
+        except ValueError:
+            return None
+        i = int(np.searchsorted(self.ids, key))
+        if i == len(self.ids) or self.ids[i] != key:
+            return None
+        return ScoreEntry(float(self.probas[i]), self.model_version, self.built_at, self.features[i])
+
+
+class ScoreStore:
+    """
+    Lecteur du store pour le service. La génération courante est relue
+    quand `CURRENT` change (vérifié au plus toutes les `poll_interval`
+    secondes, lors d'une recherche) : un rebuild est pris en compte sans
+    redémarrage, et une recherche ne voit jamais deux générations mélangées.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_PATH, max_age=DEFAULT_MAX_AGE, poll_interval=5.0):
+        self.root = root
+        self.max_age = max_age
+        self.poll_interval = poll_interval
+        self._generation = None
+        self._current_name = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @property
+    def generation(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._refresh()
+                    self._next_check = now + self.poll_interval
+        return self._generation
+
+    def _refresh(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            self._generation, self._current_name = None, None
+            return
+        if name != self._current_name:
+            try:
+                self._generation = ScoreGeneration(os.path.join(self.root, name))
+                self._current_name = name
+                print(f"📂 Store de scores chargé : {name} ({self._generation.manifest['rows']} abonnés)")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Génération du store illisible ({name}) : {e}")
+
+    def is_fresh(self, entry, model_version):
+        return entry.model_version == model_version and time.time() - entry.scored_at <= self.max_age
+
+    def lookup(self, subscriber_id, model_version):
+        """
+        Retourne (entrée ou None, fraîche ?) et met à jour les compteurs.
+        Une entrée est périmée si elle a été calculée par un autre modèle que
+        `model_version` ou il y a plus de `max_age` secondes.
+        """
+        generation = self.generation
+        entry = generation.lookup(subscriber_id) if generation is not None else None
+        if entry is None:
+            self.misses += 1
+            return None, False
+        if not self.is_fresh(entry, model_version):
+            self.stale += 1
+            return entry, False
+        self.hits += 1
+        return entry, True
+
+    def stats(self):
+        generation = self.generation
+        return {
+            "generation": self._current_name,
+            "rows": generation.manifest["rows"] if generation is not None else 0,
+            "model_version": generation.model_version if generation is not None else None,
+            "built_at": generation.built_at if generation is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store de scores précalculés par abonné")
+    parser.add_argument("input_path", help="Fichier des abonnés (CSV/Parquet)")
+    parser.add_argument("--id_column", required=True, help="Colonne identifiant de l'abonné")
+    parser.add_argument("--model", default="model.pkl", help="Modèle servi")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Répertoire du store (SCORE_STORE_PATH)")
+    parser.add_argument("--chunksize", type=int, help="Lignes par bloc (défaut 100 000)")
+    parser.add_argument(
+        "--if-changed", action="store_true", help="Ne reconstruire que si la version du modèle a changé"
+    )
+    args = parser.parse_args(argv)
+    build_store(args.model, args.input_path, args.id_column, args.store, args.chunksize, args.if_changed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+
+from model_bundle import bundle_path_for, convert_pickle
+from model_serving import NTHREAD_ENV, export_native_model, native_model_path
+
+# Mesure du démarrage d'un worker dans un processus neuf
+MEASURE_SNIPPET = """
+import json, pickle, sys, time
+from model_bundle import load_bundle, load_bundle_predictor
+from model_serving import load_native_model
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+path, fmt = sys.argv[1], sys.argv[2]
+before = rss_kb()
+start = time.perf_counter()
+if fmt == "native":
+    model = load_native_model(path)
+elif fmt == "bundle":
+    model = load_bundle(path).model
+elif fmt == "predictor":
+    model = load_bundle_predictor(path)[0]
+else:
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+elapsed = time.perf_counter() - start
+print(json.dumps({"load_seconds": elapsed, "rss_kb": rss_kb(), "rss_delta_kb": rss_kb() - before}))
+"""
+
+
+def available_cores():
+    """
+    Nombre de cœurs utilisables par ce processus (affinité CPU comprise).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_workers(cores, nthread=1, workers=None):
+    """
+    Répartit les cœurs entre workers et threads XGBoost sans surallocation.
+    """
+    nthread = max(1, min(nthread, cores))
+    if workers is None:
+        workers = max(1, cores // nthread)
+    return workers, nthread
+
+
+def measure_startup(path, fmt):
+    """
+    Temps de chargement et mémoire résidente d'un worker pour un format donné.
+    """
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", MEASURE_SNIPPET, os.path.abspath(path), fmt],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def artifact_size(path):
+    """
+    Taille d'un artefact sur disque (fichier, ou somme des fichiers d'un bundle).
+    """
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lancement multi-processus de l'API FastAPI")
+
+    parser.add_argument("--model_path", type=str, default="model.pkl", help="Modèle pickle source")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="Nombre de workers (défaut : cœurs / nthread)")
+    parser.add_argument("--nthread", type=int, default=1, help="Threads XGBoost par worker")
+    parser.add_argument("--export", action="store_true", help="Exporter le modèle au format natif et en bundle")
+    parser.add_argument("--measure", action="store_true", help="Comparer pickle, format natif et bundle")
+
+    args = parser.parse_args()
+    native_path = native_model_path(args.model_path)
+    bundle_path = bundle_path_for(args.model_path)
+
+    if args.export or (args.measure and not os.path.exists(native_path)):
+        with open(args.model_path, "rb") as f:
+            export_native_model(pickle.load(f), native_path)
+    if args.export or (args.measure and not os.path.exists(bundle_path)):
+        convert_pickle(args.model_path, bundle_path)
+
+    if args.measure:
+        # "predictor" : prédicteur compilé du bundle seul, sans XGBoost (CLI)
+        formats = (
+            ("pickle", args.model_path),
+            ("native", native_path),
+            ("bundle", bundle_path),
+            ("predictor", bundle_path),
+        )
+        for fmt, path in formats:
+            result = measure_startup(path, fmt)
+            print(
+                f"📊 {fmt:<9} : chargement {result['load_seconds'] * 1000:.1f} ms, "
+                f"RSS {result['rss_kb'] / 1024:.1f} Mo (+{result['rss_delta_kb'] / 1024:.1f} Mo), "
+                f"fichier {artifact_size(path) / 1024:.0f} Ko"
+            )
+        return
+
+    workers, nthread = plan_workers(available_cores(), args.nthread, args.workers)
+    os.environ[NTHREAD_ENV] = str(nthread)
+    os.environ["OMP_NUM_THREADS"] = str(nthread)
+    print(f"🚀 Démarrage de {workers} worker(s) avec {nthread} thread(s) XGBoost chacun")
+
+    import uvicorn
+
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
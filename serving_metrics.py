@@ -0,0 +1,299 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+# Bornes des histogrammes de latence (secondes) et de taille de lot
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+# Type MIME du format texte Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Chronologie de la requête HTTP en cours (début, fin du handler), partagée
+# entre le middleware et le handler
+request_timing = contextvars.ContextVar("request_timing", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Série associée à une combinaison de labels (créée au premier appel).
+        """
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, *labelvalues, amount=1):
+        self.labels(*labelvalues).inc(amount)
+
+    def render(self):
+        lines = self.header()
+        for values, child in sorted(self._children.copy().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_number(child.value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    Valeur instantanée ; `dec` et `set` en plus d'`inc`.
+    """
+
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.labels(*labelvalues).inc(-amount)
+
+    def set(self, value, *labelvalues):
+        self.labels(*labelvalues).value = value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Recherche dichotomique puis un seul incrément : coût constant, sans allocation
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, *labelvalues):
+        self.labels(*labelvalues).observe(value)
+
+    def render(self):
+        lines = self.header()
+        for values, child in sorted(self._children.copy().items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, [("le", _format_number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class StageTimer:
+    """
+    Chronomètre d'une étape (gestionnaire de contexte réutilisable par série).
+    """
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class ServingMetrics:
+    """
+    Métriques d'un service de scoring : durée par étape, requêtes par route
+    et statut, requêtes en cours, tailles de lot et version du modèle.
+    `render()` produit le format texte Prometheus exposé sur `/metrics`.
+    """
+
+    def __init__(self, service, holder=None):
+        self.service = service
+        self.holder = holder
+        self.stage_seconds = Histogram(
+            "churn_prediction_stage_seconds", "Durée de chaque étape de prédiction", labelnames=("stage",)
+        )
+        self.requests = Counter(
+            "churn_http_requests_total", "Requêtes HTTP traitées", labelnames=("path", "method", "status")
+        )
+        self.request_seconds = Histogram(
+            "churn_http_request_seconds", "Durée totale des requêtes HTTP", labelnames=("path",)
+        )
+        self.in_flight = Gauge("churn_http_requests_in_flight", "Requêtes HTTP en cours")
+        self.batch_size = Histogram(
+            "churn_prediction_batch_size", "Lignes par appel au modèle", buckets=BATCH_SIZE_BUCKETS
+        )
+        self.in_flight.set(0)
+
+    def stage(self, name):
+        """
+        `with metrics.stage("preprocess"): ...`
+        """
+        return StageTimer(self.stage_seconds.labels(name))
+
+    def observe_stage(self, name, seconds):
+        self.stage_seconds.labels(name).observe(seconds)
+
+    def request_started(self):
+        """
+        Début de traitement par le handler : le temps écoulé depuis l'arrivée
+        de la requête (parsing JSON, validation) est compté dans "parse".
+        """
+        timing = request_timing.get()
+        if timing is not None:
+            self.observe_stage("parse", time.perf_counter() - timing["start"])
+
+    def handler_done(self):
+        """
+        Fin du handler : la suite (sérialisation de la réponse) est comptée
+        dans "serialize" par le middleware.
+        """
+        timing = request_timing.get()
+        if timing is not None:
+            timing["handler_end"] = time.perf_counter()
+
+    def model_lines(self):
+        snapshot = self.holder.current if self.holder is not None else None
+        if snapshot is None:
+            return []
+        labels = _format_labels(("service", "version"), (self.service, snapshot.version))
+        return [
+            "# HELP churn_model_info Version du modèle servi",
+            "# TYPE churn_model_info gauge",
+            f"churn_model_info{labels} 1",
+            "# HELP churn_model_loaded_timestamp_seconds Chargement du modèle servi",
+            "# TYPE churn_model_loaded_timestamp_seconds gauge",
+            f"churn_model_loaded_timestamp_seconds {snapshot.loaded_at!r}",
+            "# HELP churn_model_reloads_total Rechargements du modèle",
+            "# TYPE churn_model_reloads_total counter",
+            f"churn_model_reloads_total {self.holder.reloads}",
+            "# HELP churn_model_failed_reloads_total Rechargements du modèle en échec",
+            "# TYPE churn_model_failed_reloads_total counter",
+            f"churn_model_failed_reloads_total {self.holder.failed_reloads}",
+        ]
+
+    def render(self, extra_lines=()):
+        lines = []
+        for metric in (self.stage_seconds, self.request_seconds, self.requests, self.in_flight, self.batch_size):
+            lines.extend(metric.render())
+        lines.extend(self.model_lines())
+        lines.extend(extra_lines)
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name, help_text, values):
+    """
+    Lignes Prometheus d'une jauge calculée à la demande ({label: valeur} ou valeur).
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    if isinstance(values, dict):
+        for label, value in values.items():
+            lines.append(f"{name}{_format_labels(('key',), (label,))} {_format_number(value)}")
+    else:
+        lines.append(f"{name} {_format_number(values)}")
+    return lines
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : requêtes en cours, durée totale et statut par route,
+    et durée de sérialisation de la réponse (fin du handler -> début de la
+    réponse).
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        timing = {"start": time.perf_counter(), "handler_end": None}
+        token = request_timing.set(timing)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if timing["handler_end"] is not None:
+                    metrics.observe_stage("serialize", time.perf_counter() - timing["handler_end"])
+            await send(message)
+
+        metrics.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight.dec()
+            request_timing.reset(token)
+            # Gabarit de la route (ex: /retrain/{job_id}) pour borner le nombre de séries
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            metrics.request_seconds.observe(time.perf_counter() - timing["start"], path)
+            metrics.requests.inc(path, scope["method"], str(status[0]))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Rendre les modules du projet importables quel que soit le lanceur de pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+
+client = TestClient(fastapi_app.app)
+
+ROW = [50, 415, 120.5, 80, 200.5, 90, 180.3, 85, 20.1, 10, 2.0, 1, 0, 0]
+
+
+def test_predict_batch_rows_matches_model():
+    rows = [ROW, [0.0] * 14]
+    response = client.post("/predict/batch", json={"rows": rows})
+    assert response.status_code == 200
+
+    body = response.json()
+    expected = fastapi_app.holder.current.model.predict_proba(np.array(rows, dtype=np.float32))[:, 1]
+    assert body["predictions"] == (expected >= 0.5).astype(int).tolist()
+    assert body["probabilities"] == pytest.approx(expected.tolist(), rel=1e-6)
+
+
+def test_predict_batch_columns_equals_rows():
+    names = list(fastapi_app.holder.current.model.feature_names_in_)
+    columns = {name: [value, value] for name, value in zip(names, ROW)}
+
+    by_columns = client.post("/predict/batch", json={"columns": columns}).json()
+    by_rows = client.post("/predict/batch", json={"rows": [ROW, ROW]}).json()
+    assert by_columns == by_rows
+
+
+def test_predict_batch_rejects_bad_shape():
+    response = client.post("/predict/batch", json={"rows": [[1.0, 2.0]]})
+    assert response.status_code == 400
+
+
+def test_predict_single_row_matches_batch():
+    fastapi_app.cache.clear()
+    single = client.post("/predict", json={"features": ROW}).json()
+    batch = client.post("/predict/batch", json={"rows": [ROW]}).json()
+    assert single["prediction"] == batch["predictions"][0]
+
+    stats = client.get("/stats/batching").json()
+    assert stats["requests"] >= 1
+
+
+def test_repeated_prediction_is_served_from_cache():
+    fastapi_app.cache.clear()
+    hits = fastapi_app.cache.hits
+
+    first = client.post("/predict", json={"features": ROW}).json()
+    second = client.post("/predict", json={"features": ROW}).json()
+    assert first == second
+    assert client.get("/stats/cache").json()["hits"] == hits + 1
+
+
+def test_full_inference_queue_returns_503(monkeypatch):
+    import threading
+
+    from inference_executor import BoundedExecutor
+
+    saturated = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+    saturated.submit(release.wait)
+    monkeypatch.setattr(fastapi_app, "inference", saturated)
+    monkeypatch.setattr(fastapi_app.batcher, "executor", saturated)
+    fastapi_app.cache.clear()
+
+    try:
+        batch = client.post("/predict/batch", json={"rows": [ROW]})
+        single = client.post("/predict", json={"features": ROW})
+    finally:
+        release.set()
+        saturated.shutdown()
+
+    assert batch.status_code == 503
+    assert batch.headers["Retry-After"] == "1"
+    assert single.status_code == 503
+    assert saturated.stats()["rejected"] == 2
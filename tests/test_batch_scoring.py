@@ -0,0 +1,111 @@
+import pickle
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_scoring import parquet_shards, prefetch, score_file, score_file_parallel
+from feature_encoder import load_encoder
+from test_feature_encoder import make_raw_frame
+
+
+@pytest.fixture
+def model_and_encoder():
+    with open("model.pkl", "rb") as f:
+        model = pickle.load(f)
+    return model, load_encoder("model.pkl", model)
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_score_file_matches_in_memory_predictions(tmp_path, model_and_encoder, fmt, pipeline):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    model, encoder = model_and_encoder
+    df = make_raw_frame()
+    df["customer_id"] = np.arange(len(df))
+
+    input_path = str(tmp_path / f"input.{fmt}")
+    output_path = str(tmp_path / f"output.{fmt}")
+    if fmt == "csv":
+        df.to_csv(input_path, index=False)
+    else:
+        df.to_parquet(input_path, index=False)
+
+    rows = score_file(
+        model, encoder, input_path, output_path, chunksize=7, id_column="customer_id", pipeline=pipeline
+    )
+    out = pd.read_csv(output_path) if fmt == "csv" else pd.read_parquet(output_path)
+
+    expected = model.predict_proba(encoder.transform(df))[:, 1]
+    assert rows == len(df)
+    assert out["customer_id"].tolist() == df["customer_id"].tolist()
+    np.testing.assert_allclose(out["churn_probability"], expected, rtol=1e-6)
+
+
+def test_parallel_scoring_keeps_input_order(tmp_path, model_and_encoder):
+    model, encoder = model_and_encoder
+    df = pd.concat([make_raw_frame()] * 10, ignore_index=True)
+    df["customer_id"] = np.arange(len(df))
+    input_path = str(tmp_path / "input.csv")
+    output_path = str(tmp_path / "output.csv")
+    df.to_csv(input_path, index=False)
+
+    rows = score_file_parallel(
+        "model.pkl", input_path, output_path, workers=2, chunksize=13, id_column="customer_id"
+    )
+    out = pd.read_csv(output_path)
+
+    expected = model.predict_proba(encoder.transform(df))[:, 1]
+    assert rows == len(df)
+    assert out["customer_id"].tolist() == df["customer_id"].tolist()
+    np.testing.assert_allclose(out["churn_probability"], expected, rtol=1e-6)
+
+
+def test_parallel_scoring_splits_a_single_parquet_row_group(tmp_path, model_and_encoder):
+    pytest.importorskip("pyarrow")
+    model, encoder = model_and_encoder
+    df = pd.concat([make_raw_frame()] * 10, ignore_index=True)
+    df["customer_id"] = np.arange(len(df))
+    input_path = str(tmp_path / "input.parquet")
+    output_path = str(tmp_path / "output.parquet")
+    df.to_parquet(input_path, index=False, row_group_size=len(df))
+
+    shards = list(parquet_shards(input_path, chunksize=13))
+    assert len(shards) == -(-len(df) // 13)
+    assert max(shard[1].num_rows for shard in shards) == 13
+
+    rows = score_file_parallel(
+        "model.pkl", input_path, output_path, workers=2, chunksize=13, id_column="customer_id"
+    )
+    out = pd.read_parquet(output_path)
+
+    expected = model.predict_proba(encoder.transform(df))[:, 1]
+    assert rows == len(df)
+    assert out["customer_id"].tolist() == df["customer_id"].tolist()
+    np.testing.assert_allclose(out["churn_probability"], expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize("n_items", [3, 100])
+def test_prefetch_thread_exits_when_consumer_stops(n_items):
+    closed = threading.Event()
+
+    def source():
+        try:
+            yield from range(n_items)
+        finally:
+            closed.set()
+
+    items = prefetch(source(), maxsize=2)
+    assert next(items) == 0
+    # File pleine : le producteur attend de déposer un élément (ou la fin)
+    time.sleep(0.3)
+    items.close()
+
+    assert closed.wait(2)
+    deadline = time.monotonic() + 2
+    while any(t.name == "prefetch" for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not any(t.name == "prefetch" for t in threading.enumerate())
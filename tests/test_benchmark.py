@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import benchmark
+from model_pipeline import prepare_arrays
+
+
+def test_parse_size():
+    assert benchmark.parse_size("10k") == 10_000
+    assert benchmark.parse_size("1m") == 1_000_000
+    assert benchmark.parse_size("2.5k") == 2_500
+    assert benchmark.parse_size(1234) == 1234
+
+
+def test_generated_dataset_is_churn_shaped(tmp_path):
+    path = benchmark.generate_dataset(str(tmp_path / "data.csv"), 1_500, chunk_rows=400)
+    X, y, encoder = prepare_arrays(path, cache_dir=None)
+
+    assert X.shape == (1_500, encoder.n_features)
+    assert 0.02 < y.mean() < 0.5
+    assert "CA" in encoder.categories["State"]
+
+
+def test_summarize_percentiles():
+    summary = benchmark.summarize([i / 1000 for i in range(1, 101)], peak_rss=123.0)
+    assert summary["samples"] == 100
+    assert summary["p50_ms"] == pytest.approx(50.5)
+    assert summary["p99_ms"] == pytest.approx(99.01)
+    assert summary["peak_rss_mb"] == 123.0
+
+
+def test_compare_flags_regressions(tmp_path):
+    stage = {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "peak_rss_mb": 100.0}
+    baseline = {"results": {"10k/train_model": stage, "10k/load_model": stage}}
+    current = {
+        "results": {
+            "10k/train_model": {**stage, "p95_ms": 25.0},
+            "10k/load_model": {**stage, "p50_ms": 10.5},
+        }
+    }
+    regressions = benchmark.compare(baseline, current, threshold=0.1)
+    assert [(r["stage"], r["metric"]) for r in regressions] == [("10k/train_model", "p95_ms")]
+
+    paths = []
+    for name, report in (("baseline", baseline), ("current", current)):
+        paths.append(str(tmp_path / f"{name}.json"))
+        with open(paths[-1], "w") as f:
+            json.dump(report, f)
+    assert benchmark.main(["compare", *paths]) == 1
+    assert benchmark.main(["compare", paths[0], paths[0]]) == 0
+
+
+def test_run_writes_report_and_restores_served_models(tmp_path):
+    import app as fastapi_app
+    import appFlask
+
+    served = fastapi_app.holder.current, appFlask.holder.current
+    output = str(tmp_path / "bench.json")
+    benchmark.run(
+        ["2k"], output, workdir=str(tmp_path), repeat=1, n_requests=5, batch_size=8, n_batches=2
+    )
+
+    with open(output) as f:
+        report = json.load(f)
+    stages = {key.split("/", 1)[1] for key in report["results"]}
+    assert {
+        "prepare_data_cold",
+        "train_model",
+        "evaluate_model",
+        "save_model",
+        "load_model",
+        "predict_proba_1k",
+        "explain_1k",
+        "fastapi_predict_single",
+        "fastapi_predict_batch_8",
+        "flask_predict_single",
+    } <= stages
+    assert report["results"]["2k/fastapi_predict_single"]["samples"] == 5
+    assert (fastapi_app.holder.current, appFlask.holder.current) == served
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+from xgboost import XGBClassifier
+
+from feature_encoder import FeatureEncoder
+from model_pipeline import save_model
+from model_serving import export_native_model
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = {"mlflow", "xgboost", "pandas", "sklearn"}
+
+
+def run_cli(cwd, *args):
+    """
+    Lance `main.py` dans un processus neuf avec `-X importtime`.
+    Retourne (sortie d'erreur sans les lignes d'import, modules importés).
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONWARNINGS="ignore")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py"), *args],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    lines = result.stderr.splitlines()
+    modules = {line.split("|")[-1].strip().split(".")[0] for line in lines if line.startswith("import time:")}
+    logs = "\n".join(line for line in lines if not line.startswith("import time:"))
+    return logs, modules
+
+
+def test_help_imports_no_heavy_dependency(tmp_path):
+    _, modules = run_cli(tmp_path, "--help")
+    assert not modules & HEAVY_MODULES
+
+
+def test_predict_fast_path_reads_only_the_native_model(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 100, (200, 4)).astype(np.float32)
+    model = XGBClassifier(n_estimators=10).fit(X, (X[:, 0] > 50).astype(int))
+    save_model(model, str(tmp_path / "xgboost_model.pkl"))
+    export_native_model(model, str(tmp_path / "xgboost_model.ubj"))
+
+    for row in X[:3]:
+        logs, modules = run_cli(tmp_path, "--predict", "--input", ",".join(map(str, row)))
+        assert f"Prédiction : {model.predict(row[None, :])[0]}" in logs
+        assert not modules & HEAVY_MODULES
+
+    logs, _ = run_cli(tmp_path, "--predict", "--input", "1,2")
+    assert "Attendu 4, reçu 2" in logs
+
+
+def test_predict_falls_back_to_pickle_when_native_model_is_stale(tmp_path):
+    X = np.random.default_rng(1).uniform(0, 100, (200, 4)).astype(np.float32)
+    model = XGBClassifier(n_estimators=10).fit(X, (X[:, 1] > 50).astype(int))
+    export_native_model(model, str(tmp_path / "xgboost_model.ubj"))
+    os.utime(tmp_path / "xgboost_model.ubj", (0, 0))
+    save_model(model, str(tmp_path / "xgboost_model.pkl"))
+
+    logs, modules = run_cli(tmp_path, "--predict", "--input", ",".join(map(str, X[0])))
+    assert f"Prédiction : {model.predict(X[:1])[0]}" in logs
+    assert "xgboost" in modules
+
+
+def test_predict_fast_path_reads_the_bundle_predictor(tmp_path):
+    X = np.random.default_rng(2).uniform(0, 100, (200, 4)).astype(np.float32)
+    model = XGBClassifier(n_estimators=10).fit(X, (X[:, 2] > 50).astype(int))
+    save_model(model, str(tmp_path / "xgboost_model.pkl"), encoder=FeatureEncoder(["a", "b", "c", "d"], []))
+
+    logs, modules = run_cli(tmp_path, "--predict", "--input", ",".join(map(str, X[0])))
+    assert f"Prédiction : {model.predict(X[:1])[0]}" in logs
+    assert not modules & HEAVY_MODULES
+
+
+def test_predict_ignores_a_bundle_older_than_the_pickle(tmp_path):
+    X = np.random.default_rng(3).uniform(0, 100, (200, 4)).astype(np.float32)
+    old = XGBClassifier(n_estimators=10).fit(X, (X[:, 2] > 50).astype(int))
+    new = XGBClassifier(n_estimators=10).fit(X, (X[:, 2] <= 50).astype(int))
+    save_model(old, str(tmp_path / "xgboost_model.pkl"), encoder=FeatureEncoder(["a", "b", "c", "d"], []))
+    save_model(new, str(tmp_path / "xgboost_model.pkl"))
+
+    logs, _ = run_cli(tmp_path, "--predict", "--input", ",".join(map(str, X[0])))
+    assert f"Prédiction : {new.predict(X[:1])[0]}" in logs
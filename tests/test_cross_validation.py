@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from classification_metrics import binary_metrics, confusion_matrix, log_loss, roc_auc
+from cross_validation import FoldIter, assign_folds, cross_validate, log_cv_to_mlflow
+from test_native_training import make_dataset
+
+
+def test_metrics_match_reference_definitions():
+    y = np.array([0, 0, 1, 1, 1, 0])
+    proba = np.array([0.1, 0.6, 0.6, 0.8, 0.3, 0.2])
+
+    # 9 paires (positif, négatif) : 7 bien ordonnées, 1 ex-aequo compté pour moitié
+    assert roc_auc(y, proba) == pytest.approx(7.5 / 9)
+    assert confusion_matrix(y, proba >= 0.5).tolist() == [[2, 1], [1, 2]]
+    expected = -np.mean(y * np.log(proba) + (1 - y) * np.log(1 - proba))
+    assert log_loss(y, proba) == pytest.approx(expected)
+    assert binary_metrics(y, proba)["accuracy"] == pytest.approx(4 / 6)
+    assert np.isnan(roc_auc([1, 1], [0.2, 0.9]))
+
+
+def test_folds_are_stratified_and_cover_all_rows():
+    y = np.array([1] * 30 + [0] * 70)
+    folds = assign_folds(y, 5, seed=3)
+
+    assert np.array_equal(folds, assign_folds(y, 5, seed=3))
+    assert np.bincount(folds).tolist() == [20] * 5
+    assert [int(y[folds == f].sum()) for f in range(5)] == [6] * 5
+
+
+def test_fold_iterator_yields_only_training_rows():
+    X = np.arange(40, dtype=np.float32).reshape(20, 2)
+    keep = np.arange(20) % 4 != 0
+    batches = []
+    it = FoldIter(X, np.zeros(20), keep, block_rows=6)
+    while it.next(lambda data, label, feature_names: batches.append(data)):
+        pass
+
+    assert np.array_equal(np.concatenate(batches), X[keep])
+
+
+def test_cross_validate_reports_each_fold(tmp_path):
+    results, summary = cross_validate(
+        make_dataset(tmp_path), k=4, num_boost_round=10, workers=2, cache_dir=str(tmp_path / "cache")
+    )
+
+    assert [r["fold"] for r in results] == [0, 1, 2, 3]
+    assert sum(r["test_rows"] for r in results) == 400
+    assert np.sum(summary["confusion"]) == 400
+    assert summary["accuracy_mean"] > 0.9
+    assert summary["workers"] == 2
+
+
+def test_cv_metrics_are_logged_in_one_batch(tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    from mlflow.tracking import MlflowClient
+
+    from mlflow_tracking import AsyncRunTracker
+
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    tracking_uri = (tmp_path / "mlruns").as_uri()
+    results = [
+        {"fold": f, "accuracy": 0.9, "auc": 0.95, "logloss": 0.2, "confusion": [[5, 1], [1, 3]], "seconds": 1.0}
+        for f in range(3)
+    ]
+    summary = {"accuracy_mean": 0.9, "accuracy_std": 0.0, "confusion": [[15, 3], [3, 9]], "workers": 3}
+
+    calls = []
+    log_batch = MlflowClient.log_batch
+    monkeypatch.setattr(MlflowClient, "log_batch", lambda self, *a, **kw: calls.append(1) or log_batch(self, *a, **kw))
+    with AsyncRunTracker("cv-test", tracking_uri=tracking_uri, spill_dir=str(tmp_path / "spill")) as tracker:
+        log_cv_to_mlflow(tracker, results, summary)
+
+    run = MlflowClient(tracking_uri).get_run(tracker.run_id)
+    assert len(calls) == 1
+    assert run.data.params["cv_folds"] == "3"
+    assert run.data.metrics["cv_tp"] == 9
+    history = MlflowClient(tracking_uri).get_metric_history(tracker.run_id, "cv_fold_accuracy")
+    assert [m.step for m in history] == [0, 1, 2]
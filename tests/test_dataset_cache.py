@@ -0,0 +1,59 @@
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+from model_pipeline import prepare_arrays, prepare_data
+from test_feature_encoder import make_raw_frame
+
+
+def test_second_call_is_served_from_cache(tmp_path, capsys):
+    path = str(tmp_path / "train.csv")
+    make_raw_frame().to_csv(path, index=False)
+    cache_dir = str(tmp_path / "cache")
+
+    X1, y1, _ = prepare_arrays(path, cache_dir=cache_dir)
+    X2, y2, encoder = prepare_arrays(path, cache_dir=cache_dir)
+
+    assert "depuis le cache" in capsys.readouterr().out
+    assert isinstance(X2, np.memmap)
+    np.testing.assert_array_equal(X1, X2)
+    np.testing.assert_array_equal(y1, y2)
+    assert encoder.categories["State"] == ["AK", "CA", "NY", "TX"]
+
+
+def test_cache_is_invalidated_when_source_changes(tmp_path):
+    path = str(tmp_path / "train.csv")
+    df = make_raw_frame()
+    df.to_csv(path, index=False)
+    cache_dir = str(tmp_path / "cache")
+    X1, _, _ = prepare_arrays(path, cache_dir=cache_dir)
+
+    df["Account length"] += 1
+    df.to_csv(path, index=False)
+    X2, _, _ = prepare_arrays(path, cache_dir=cache_dir)
+
+    np.testing.assert_array_equal(X2[:, 0], X1[:, 0] + 1)
+
+
+def test_prepare_data_without_cache(tmp_path):
+    path = str(tmp_path / "train.csv")
+    make_raw_frame().to_csv(path, index=False)
+
+    X_train, X_test, y_train, y_test = prepare_data(path, path, cache_dir=None)
+    assert X_train.shape == (20, 14)
+    assert set(y_train) <= {0, 1}
+    assert not (tmp_path / "cache").exists()
+
+
+def test_given_encoder_is_used_and_cached_separately(tmp_path):
+    path = str(tmp_path / "test.csv")
+    df = make_raw_frame()
+    df.to_csv(path, index=False)
+    cache_dir = str(tmp_path / "cache")
+    plan = FeatureEncoder(["Account length", "State_NY"], categorical_cols=["State"], categories={"State": ["NY"]})
+
+    fitted, _, _ = prepare_arrays(path, cache_dir=cache_dir)
+    for _ in range(2):
+        X, _, encoder = prepare_arrays(path, encoder=plan, cache_dir=cache_dir)
+        np.testing.assert_array_equal(X, plan.transform(df))
+        assert encoder.columns == plan.columns
+    assert prepare_arrays(path, cache_dir=cache_dir)[0].shape == fitted.shape
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+from drift_monitor import DriftMonitor, StreamingStats, build_profile, load_profile, save_profile
+from feature_encoder import FeatureEncoder
+from model_pipeline import SELECTED_FEATURES, prepare_data
+from test_app import ROW
+from test_feature_encoder import make_raw_frame
+
+ENCODER = FeatureEncoder(SELECTED_FEATURES)
+CALLS = SELECTED_FEATURES.index("Customer service calls")
+
+
+def make_matrix(n, seed=0, calls_shift=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(100, 20, (n, len(SELECTED_FEATURES))).astype(np.float32)
+    X[:, CALLS] = rng.poisson(2, n) + calls_shift
+    X[:, 11:] = rng.random((n, 3)) < 0.2
+    return X
+
+
+@pytest.fixture
+def profile_path(tmp_path):
+    path = str(tmp_path / "model.profile.json")
+    save_profile(build_profile(make_matrix(5000), ENCODER), path)
+    return path
+
+
+def test_streaming_moments_match_numpy_and_merge(profile_path):
+    profile = load_profile(profile_path)
+    X = make_matrix(1000, seed=1)
+    X[3, 0] = np.nan
+
+    stats = StreamingStats(profile)
+    stats.update(X[:300])
+    stats.update(X[300:])
+    left, right = StreamingStats(profile), StreamingStats(profile)
+    left.update(X[:500])
+    right.update(X[500:])
+    merged = left.merge(right)
+
+    for s in (stats, merged):
+        assert s.mean == pytest.approx(np.nanmean(X.astype(np.float64), axis=0), rel=1e-9)
+        assert np.sqrt(s.m2 / s.count) == pytest.approx(np.nanstd(X.astype(np.float64), axis=0), rel=1e-9)
+        assert s.nonfinite[0] == 1
+    assert np.array_equal(stats.bins, merged.bins)
+    assert stats.quantile(CALLS, 0.5) == pytest.approx(np.median(X[:, CALLS]), abs=1.0)
+
+
+def test_report_flags_only_shifted_feature(profile_path):
+    profile = load_profile(profile_path)
+    same, shifted = StreamingStats(profile), StreamingStats(profile)
+    same.update(make_matrix(2000, seed=2))
+    shifted.update(make_matrix(2000, seed=2, calls_shift=3))
+
+    assert same.report()["drifted_features"] == []
+    report = shifted.report()
+    assert report["drifted_features"] == ["Customer service calls"]
+    calls = report["features"][CALLS]
+    assert calls["ks"] > report["ks_critical"]
+    assert calls["out_of_range_rate"] > 0
+
+
+def test_monitor_publishes_windows_in_bulk(profile_path):
+    published = []
+    monitor = DriftMonitor(profile_path, buffer_rows=16, min_rows=100, sinks=[published.append])
+    X = make_matrix(150, seed=3)
+
+    for row in X[:50]:
+        monitor.observe(row)
+    monitor.observe(np.zeros(3, dtype=np.float32))
+    assert monitor.publish() is None
+
+    for row in X[50:]:
+        monitor.observe(row)
+    report = monitor.publish()
+
+    assert report["rows"] == 150
+    assert len(published) == 1
+    assert len(published[0]) == len(SELECTED_FEATURES) + len(report["categories"])
+    assert monitor.stats()["window_rows"] == 0
+    assert monitor.snapshot()["rows"] == 150
+
+
+def test_monitor_without_profile_is_disabled(tmp_path):
+    monitor = DriftMonitor(str(tmp_path / "missing.json"))
+    monitor.observe(np.zeros(14, dtype=np.float32))
+    assert not monitor.enabled
+    assert monitor.publish() is None
+
+
+def test_prepare_data_saves_reference_profile(tmp_path):
+    path = tmp_path / "train.csv"
+    make_raw_frame().to_csv(path, index=False)
+    prepare_data(str(path), str(path), cache_dir=None, profile_path=str(tmp_path / "profile.json"))
+
+    profile = load_profile(str(tmp_path / "profile.json"))
+    assert [f["name"] for f in profile["features"]] == SELECTED_FEATURES
+    assert set(profile["categories"]) == {"State", "International plan", "Voice mail plan"}
+
+
+def test_drift_endpoint_reports_served_inputs(profile_path, monkeypatch):
+    client = TestClient(fastapi_app.app)
+    monkeypatch.setattr(fastapi_app, "drift", DriftMonitor(None))
+    assert client.get("/stats/drift").status_code == 404
+
+    monitor = DriftMonitor(profile_path, min_rows=1)
+    monkeypatch.setattr(fastapi_app, "drift", monitor)
+    client.post("/predict", json={"features": ROW})
+    client.post("/predict/batch", json={"rows": [ROW, ROW]})
+
+    body = client.get("/stats/drift", params={"current": True}).json()
+    assert body["report"]["rows"] == 3
+    monitor.publish()
+    assert "churn_feature_psi" in client.get("/metrics").text
@@ -0,0 +1,135 @@
+import json
+import logging
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from elasticsearch_logging import ElasticsearchHandler
+
+
+class StubBulkServer:
+    """
+    Faux Elasticsearch : enregistre les lots reçus sur `_bulk` et répond
+    avec les statuts programmés dans `responses` (puis 200).
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+                lines = body.strip().split("\n")
+                documents = [json.loads(line) for line in lines[1::2]]
+                status = stub.responses.pop(0) if stub.responses else 200
+                if status == 200:
+                    stub.requests.append((self.path, documents))
+                payload = json.dumps(
+                    {"errors": False, "items": [{"index": {"status": 201}} for _ in documents]}
+                ).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def documents(self):
+        return [doc for _, docs in self.requests for doc in docs]
+
+
+@pytest.fixture
+def server():
+    stub = StubBulkServer()
+    yield stub
+    stub.server.shutdown()
+
+
+def make_logger(handler):
+    logger = logging.getLogger(f"test_es_{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_flushes_by_size_with_bulk_api(server):
+    handler = ElasticsearchHandler(host=server.host, index="logs", batch_size=10, flush_interval=60)
+    logger = make_logger(handler)
+    for i in range(25):
+        logger.info("message %d", i)
+    handler.close()
+
+    assert [path for path, _ in server.requests] == ["/logs/_bulk"] * 3
+    assert [len(docs) for _, docs in server.requests] == [10, 10, 5]
+    assert [doc["message"] for doc in server.documents()] == [f"message {i}" for i in range(25)]
+    assert server.documents()[0]["level"] == "INFO"
+    assert handler.stats()["sent"] == 25
+
+
+def test_flushes_by_age(server):
+    handler = ElasticsearchHandler(host=server.host, index="logs", batch_size=100, flush_interval=0.05)
+    handler.submit({"message": "seul"})
+    deadline = time.monotonic() + 5
+    while not server.requests and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.documents() == [{"message": "seul"}]
+    handler.close()
+
+
+def test_retries_transient_errors(server):
+    server.responses = [503, 429]
+    handler = ElasticsearchHandler(host=server.host, index="logs", backoff=0.01)
+    handler.submit({"message": "a"})
+    handler.flush(timeout=5)
+    handler.close()
+
+    assert server.documents() == [{"message": "a"}]
+    stats = handler.stats()
+    assert stats["retries"] == 2 and stats["sent"] == 1 and stats["failed"] == 0
+
+
+def test_drops_oldest_when_queue_is_full(server):
+    handler = ElasticsearchHandler(
+        host=server.host, index="logs", max_queue=3, batch_size=100, flush_interval=60
+    )
+    for i in range(5):
+        handler.submit({"n": i})
+    assert handler.stats()["dropped"] == 2
+    handler.close()
+    assert server.documents() == [{"n": 2}, {"n": 3}, {"n": 4}]
+
+
+def test_emit_does_not_block_when_elasticsearch_is_down():
+    handler = ElasticsearchHandler(
+        host="http://127.0.0.1:9", index="logs", max_retries=1, backoff=0.01, shutdown_timeout=5
+    )
+    logger = make_logger(handler)
+    start = time.perf_counter()
+    for i in range(100):
+        logger.info("message %d", i)
+    assert time.perf_counter() - start < 0.5
+    handler.close()
+    assert handler.stats()["failed"] == 100
+
+
+def test_logging_shutdown_is_bounded_when_elasticsearch_is_down():
+    handler = ElasticsearchHandler(
+        host="http://127.0.0.1:9", index="logs", max_retries=100, backoff=1.0, shutdown_timeout=0.2
+    )
+    make_logger(handler).info("message")
+    start = time.perf_counter()
+    # Même séquence qu'à la sortie de l'interpréteur : flush() puis close()
+    logging.shutdown([weakref.ref(handler)])
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from classification_metrics import binary_metrics
+from evaluation import ScoreAccumulator, evaluate_file, log_evaluation
+from model_pipeline import custom_accuracy_score, prepare_arrays
+from native_training import train_quantile_dmatrix
+from test_native_training import make_dataset
+
+
+def make_scores(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.random(n) < 0.2
+    proba = np.round(np.clip(rng.normal(0.3 + 0.3 * y, 0.2), 0, 1), 3)
+    return y, proba
+
+
+def accumulate(y, proba, chunk=3_000, **kwargs):
+    scores = ScoreAccumulator(**kwargs)
+    for start in range(0, len(y), chunk):
+        scores.update(y[start:start + chunk], proba[start:start + chunk])
+    return scores
+
+
+def test_chunked_report_matches_reference_metrics():
+    sklearn_metrics = pytest.importorskip("sklearn.metrics")
+    y, proba = make_scores()
+    report = accumulate(y, proba).report()
+
+    expected = binary_metrics(y, proba)
+    assert report["accuracy"] == pytest.approx(expected["accuracy"])
+    assert report["confusion"] == expected["confusion"]
+    assert report["roc_auc"] == pytest.approx(sklearn_metrics.roc_auc_score(y, proba))
+    assert report["pr_auc"] == pytest.approx(sklearn_metrics.average_precision_score(y, proba))
+    assert report["f1"] == pytest.approx(sklearn_metrics.f1_score(y, proba >= 0.5))
+    assert report == accumulate(y, proba, chunk=len(y)).report()
+
+
+def test_best_cost_threshold_is_brute_force_optimum():
+    y, proba = make_scores(2_000, seed=1)
+    report = accumulate(y, proba).report(cost_fp=1.0, cost_fn=5.0)
+
+    def cost(threshold):
+        predicted = proba >= threshold
+        return np.sum(predicted & ~y) + 5.0 * np.sum(~predicted & y)
+
+    assert report["best_cost"]["cost"] == min(cost(t) for t in np.unique(proba))
+    assert cost(report["best_cost"]["threshold"]) == report["best_cost"]["cost"]
+
+
+def test_merge_and_bounded_memory():
+    y, proba = make_scores(10_000, seed=2)
+    left, right = accumulate(y[:4_000], proba[:4_000]), accumulate(y[4_000:], proba[4_000:])
+    assert left.merge(right).report() == accumulate(y, proba).report()
+
+    proba = np.random.default_rng(3).random(len(y))
+    bounded = accumulate(y, proba, max_distinct=500, resolution=1e-2)
+    assert bounded.rounded and len(bounded.scores) <= 101
+    assert bounded.report()["roc_auc"] == pytest.approx(accumulate(y, proba).report()["roc_auc"], abs=0.01)
+
+
+def test_curves_are_monotonic_and_sampled():
+    y, proba = make_scores()
+    curves = accumulate(y, proba).curves(points=101)
+
+    assert len(curves["threshold"]) <= 101
+    assert np.all(np.diff(curves["threshold"]) < 0)
+    assert np.all(np.diff(curves["gain"]) >= 0)
+    assert curves["gain"][-1] == pytest.approx(1.0)
+    assert curves["lift"][-1] == pytest.approx(1.0)
+
+
+def test_custom_accuracy_score_is_vectorized():
+    assert custom_accuracy_score(np.array([1, 0, 1, 1]), np.array([1, 1, 1, 0])) == 0.5
+
+
+def test_evaluation_artifacts_are_logged(tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    from mlflow.tracking import MlflowClient
+
+    from mlflow_tracking import AsyncRunTracker
+
+    path = make_dataset(tmp_path)
+    X, y, encoder = prepare_arrays(path, cache_dir=None)
+    model = train_quantile_dmatrix(X, y, num_boost_round=5, nthread=1)
+    scores = evaluate_file(model, encoder, path, chunksize=70)
+    assert scores.rows == len(y)
+    assert scores.report()["accuracy"] == pytest.approx(custom_accuracy_score(y, model.predict(X)))
+
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    tracking_uri = (tmp_path / "mlruns").as_uri()
+    with AsyncRunTracker("eval-test", tracking_uri=tracking_uri, spill_dir=str(tmp_path / "spill")) as tracker:
+        log_evaluation(tracker, scores.report(), scores.curves(), str(tmp_path / "report"))
+
+    client = MlflowClient(tracking_uri)
+    artifacts = {a.path for a in client.list_artifacts(tracker.run_id, "evaluation")}
+    assert artifacts == {"evaluation/evaluation.json", "evaluation/threshold_curve.csv"}
+    assert "eval_roc_auc" in client.get_run(tracker.run_id).data.metrics
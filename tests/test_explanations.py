@@ -0,0 +1,102 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+from batch_scoring import score_file
+from explanations import benchmark, contributions, top_k
+from feature_encoder import load_encoder
+from test_app import ROW
+from test_feature_encoder import make_raw_frame
+
+
+@pytest.fixture
+def model_and_encoder():
+    with open("model.pkl", "rb") as f:
+        model = pickle.load(f)
+    return model, load_encoder("model.pkl", model)
+
+
+def random_rows(n, n_features=14, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 300, (n, n_features)).astype(np.float32)
+    X[:, -3:] = rng.integers(0, 2, (n, 3))
+    return X
+
+
+@pytest.mark.parametrize("approximate", [False, True])
+def test_contributions_add_up_to_the_prediction(model_and_encoder, approximate):
+    model, _ = model_and_encoder
+    X = random_rows(200)
+    contribs = contributions(model, X, approximate=approximate)
+
+    assert contribs.shape == (200, X.shape[1] + 1)
+    margin = contribs.sum(axis=1, dtype=np.float64)
+    np.testing.assert_allclose(1 / (1 + np.exp(-margin)), model.predict_proba(X)[:, 1], atol=1e-5)
+
+
+def test_top_k_matches_full_sort():
+    contribs = np.random.default_rng(1).normal(size=(50, 15)).astype(np.float32)
+    indices, values = top_k(contribs, 4)
+
+    expected = np.argsort(-np.abs(contribs[:, :-1]), axis=1)[:, :4]
+    assert indices.shape == (50, 4) and indices.dtype == np.int32
+    assert np.array_equal(indices, expected)
+    assert np.array_equal(values, np.take_along_axis(contribs, expected, axis=1))
+    assert top_k(contribs, 100)[0].shape == (50, 14)
+
+
+def test_explain_batch_is_served_from_cache(monkeypatch):
+    client = TestClient(fastapi_app.app)
+    fastapi_app.explanation_cache.clear()
+    rows = [ROW, [0.0] * 14]
+    body = client.post("/explain/batch?top_k=3", json={"rows": rows}).json()
+
+    snapshot = fastapi_app.holder.current
+    expected = contributions(snapshot.model, np.array(rows, dtype=np.float32))
+    assert len(body["features"]) == 14
+    assert body["indices"] == top_k(expected, 3)[0].tolist()
+    assert body["bias"] == pytest.approx(expected[:, -1].tolist())
+
+    # Mêmes vecteurs : aucun nouvel appel à pred_contribs
+    monkeypatch.setattr(fastapi_app, "contributions", lambda *a: pytest.fail("explication recalculée"))
+    assert client.post("/explain/batch?top_k=3", json={"rows": rows}).json() == body
+    assert client.get("/stats/explanations").json()["hits"] == 2
+    assert client.post("/explain/batch?top_k=0", json={"rows": rows}).status_code == 400
+
+
+def test_score_file_adds_top_reasons(tmp_path, model_and_encoder):
+    model, encoder = model_and_encoder
+    df = make_raw_frame()
+    input_path, output_path = str(tmp_path / "input.csv"), str(tmp_path / "output.csv")
+    df.to_csv(input_path, index=False)
+
+    score_file(model, encoder, input_path, output_path, chunksize=7, explain_k=2)
+    out = pd.read_csv(output_path)
+
+    indices, values = top_k(contributions(model, encoder.transform(df)), 2)
+    assert out["top_feature_1"].tolist() == [encoder.columns[i] for i in indices[:, 0]]
+    np.testing.assert_allclose(out["top_contribution_2"], values[:, 1], rtol=1e-5)
+
+
+def test_benchmark_reports_cost_per_thousand_rows(model_and_encoder):
+    result = benchmark(model_and_encoder[0], random_rows(500), repeats=1)
+    assert result["rows"] == 500
+    assert result["explain_ms_per_1k"] > 0 and result["explain_approx_ms_per_1k"] > 0
+
+
+def test_flask_form_shows_top_reasons():
+    import appFlask
+
+    columns = appFlask.holder.current.encoder.input_columns
+    values = {"State": "CA", "International plan": "Yes", "Voice mail plan": "No"}
+    response = appFlask.app.test_client().post(
+        "/predict", data={"features": [values.get(name, "100") for name in columns]}
+    )
+
+    page = response.get_data(as_text=True)
+    assert "Principaux facteurs" in page
+    assert page.count("risque</p>") == appFlask.REASONS_SHOWN
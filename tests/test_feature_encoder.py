@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from feature_encoder import FeatureEncoder
+from model_pipeline import SELECTED_FEATURES
+
+
+def make_raw_frame():
+    rng = np.random.default_rng(0)
+    n = 20
+    df = pd.DataFrame(
+        {
+            name: rng.integers(0, 300, n).astype(float)
+            for name in SELECTED_FEATURES
+            if "_" not in name
+        }
+    )
+    df["State"] = rng.choice(["AK", "CA", "NY", "TX"], n)
+    df["International plan"] = rng.choice(["No", "Yes"], n)
+    df["Voice mail plan"] = rng.choice(["No", "Yes"], n)
+    df["Churn"] = rng.choice([True, False], n)
+    return df
+
+
+def test_transform_matches_get_dummies():
+    df = make_raw_frame()
+    encoder = FeatureEncoder.fit(df, SELECTED_FEATURES)
+
+    expected = pd.get_dummies(
+        df, columns=["State", "International plan", "Voice mail plan"], drop_first=True
+    )[SELECTED_FEATURES].to_numpy(dtype=np.float32)
+
+    np.testing.assert_array_equal(encoder.transform(df), expected)
+
+
+def test_encode_record_matches_transform():
+    df = make_raw_frame()
+    encoder = FeatureEncoder.fit(df, SELECTED_FEATURES)
+    matrix = encoder.transform(df)
+
+    records = df.drop(columns=["Churn"]).to_dict(orient="records")
+    np.testing.assert_array_equal(encoder.encode_record(records[3]), matrix[3])
+    np.testing.assert_array_equal(encoder.encode_records(records), matrix)
+    np.testing.assert_array_equal(encoder.encode_record(list(matrix[5])), matrix[5])
+
+
+def test_save_load_round_trip(tmp_path):
+    df = make_raw_frame()
+    encoder = FeatureEncoder.fit(df, SELECTED_FEATURES)
+    path = tmp_path / "model.encoder.json"
+    encoder.save(path)
+
+    loaded = FeatureEncoder.load(path)
+    assert loaded.columns == encoder.columns
+    assert loaded.categories == encoder.categories
+    np.testing.assert_array_equal(loaded.transform(df), encoder.transform(df))
+
+
+def test_encode_target():
+    assert FeatureEncoder.encode_target([True, False]).tolist() == [1, 0]
+    assert FeatureEncoder.encode_target(["Yes", "No", "True"]).tolist() == [1, 0, 1]
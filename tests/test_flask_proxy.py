@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import flask_app
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Faux service FastAPI (HTTP/1.1 keep-alive) qui compte les connexions
+    ouvertes et répond avec le statut programmé.
+    """
+    state = {"connections": 0, "status": 200, "raw": None, "delay": 0.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            state["connections"] += 1
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(state["delay"])
+            payload = json.dumps({"prediction": len(body["features"])}).encode()
+            if state["raw"] is not None:
+                payload = state["raw"]
+            self.send_response(state["status"])
+            if state["status"] == 503:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Type", "application/json" if state["raw"] is None else "text/html")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(flask_app, "FASTAPI_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(flask_app, "session", flask_app.make_session(pool_size=2))
+    monkeypatch.setattr(flask_app, "slots", threading.BoundedSemaphore(2))
+    yield state
+    server.shutdown()
+
+
+def test_proxy_reuses_keep_alive_connection(upstream):
+    client = flask_app.app.test_client()
+    for _ in range(5):
+        response = client.post("/predict", json={"features": [1, 2, 3]})
+        assert response.get_json() == {"prediction": 3}
+    assert upstream["connections"] == 1
+
+
+def test_proxy_forwards_overload_status(upstream):
+    upstream["status"] = 503
+    response = flask_app.app.test_client().post("/predict", json={"features": [1]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_proxy_reports_unreachable_upstream(monkeypatch):
+    monkeypatch.setattr(flask_app, "FASTAPI_URL", "http://127.0.0.1:9")
+    response = flask_app.app.test_client().post("/predict", json={"features": [1]})
+    assert response.status_code == 502
+
+
+@pytest.mark.parametrize("status, raw", [(502, b"<html>Bad Gateway</html>"), (504, b"")])
+def test_proxy_reports_non_json_upstream_reply(upstream, status, raw):
+    upstream.update(status=status, raw=raw)
+    response = flask_app.app.test_client().post("/predict", json={"features": [1]})
+    assert response.status_code == 502
+    assert f"HTTP {status}" in response.get_json()["detail"]
+
+
+def test_proxy_rejects_requests_beyond_the_pool(upstream, monkeypatch):
+    upstream["delay"] = 0.5
+    monkeypatch.setattr(flask_app, "POOL_TIMEOUT", 0.1)
+
+    def call(_):
+        response = flask_app.app.test_client().post("/predict", json={"features": [1]})
+        return response.status_code, response.headers.get("Retry-After")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(6) as executor:
+        results = list(executor.map(call, range(6)))
+    assert time.perf_counter() - start < 2
+    assert sorted(results, key=str) == [(200, None)] * 2 + [(503, "1")] * 4
@@ -0,0 +1,198 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+import incremental_training
+from incremental_training import RetrainJobs, load_state, read_delta, retrain_incremental
+from model_pipeline import load_model, prepare_arrays, save_model
+from model_serving import tree_params
+from native_training import train_quantile_dmatrix
+from test_feature_encoder import make_raw_frame
+
+
+def make_frame(n_copies):
+    df = pd.concat([make_raw_frame()] * n_copies, ignore_index=True)
+    df["Churn"] = df["Customer service calls"] > 150
+    return df
+
+
+@pytest.fixture
+def trained(tmp_path):
+    """
+    Modèle entraîné sur un historique initial, déjà consommé (offset à la fin).
+    """
+    history = str(tmp_path / "history.csv")
+    make_frame(10).to_csv(history, index=False)
+    X, y, encoder = prepare_arrays(history, cache_dir=None)
+    model_path = str(tmp_path / "model.pkl")
+    save_model(train_quantile_dmatrix(X, y, num_boost_round=5, nthread=1), model_path, encoder=encoder)
+    retrain_incremental(model_path, history, rounds=1, nthread=1)
+    return model_path, history
+
+
+def append_rows(history, n_copies):
+    make_frame(n_copies).to_csv(history, mode="a", header=False, index=False)
+
+
+def test_read_delta_returns_only_complete_new_lines(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text("a,b\n1,2\n3,4\n")
+    df, offset = read_delta(str(path))
+    assert df["a"].tolist() == [1, 3]
+
+    with open(path, "a") as f:
+        f.write("5,6\n7,")
+    df, offset = read_delta(str(path), offset)
+    assert df.to_dict("records") == [{"a": 5, "b": 6}]
+    assert read_delta(str(path), offset) == (None, offset)
+
+
+def test_continue_adds_trees_from_delta_only(trained):
+    model_path, history = trained
+    trees = load_model(model_path).get_booster().num_boosted_rounds()
+    append_rows(history, 2)
+
+    result = retrain_incremental(model_path, history, mode="continue", rounds=3, nthread=1)
+
+    assert result["rows"] == len(make_frame(2))
+    assert result["trees_after"] == trees + 3
+    assert load_model(model_path).get_booster().num_boosted_rounds() == trees + 3
+    assert load_state(model_path)["offset"] == result["offset"]
+    assert retrain_incremental(model_path, history, nthread=1)["status"] == "no_new_data"
+
+
+def test_new_trees_keep_the_model_hyperparameters(tmp_path, monkeypatch):
+    from xgboost import XGBClassifier
+
+    history = str(tmp_path / "history.csv")
+    make_frame(10).to_csv(history, index=False)
+    X, y, encoder = prepare_arrays(history, cache_dir=None)
+    model_path = str(tmp_path / "model.pkl")
+    save_model(XGBClassifier(max_depth=2, learning_rate=0.05, n_estimators=5).fit(X, y), model_path, encoder=encoder)
+
+    seen = []
+    train = incremental_training.xgb.train
+    monkeypatch.setattr(
+        incremental_training.xgb, "train", lambda params, *a, **kw: seen.append(params) or train(params, *a, **kw)
+    )
+    for _ in range(2):
+        append_rows(history, 2)
+        retrain_incremental(model_path, history, rounds=2, nthread=1)
+
+    # Deux reprises successives : le modèle rechargé garde max_depth / eta
+    assert [(p["max_depth"], p["eta"]) for p in seen] == [(2, 0.05), (2, 0.05)]
+    assert tree_params(load_model(model_path))["max_depth"] == 2
+    dump = load_model(model_path).get_booster().get_dump()
+    assert max(line.count("\t") for tree in dump for line in tree.splitlines()) <= 2
+
+
+def test_update_refreshes_leaves_without_adding_trees(trained):
+    model_path, history = trained
+    before = load_model(model_path)
+    X, _, _ = prepare_arrays(history, cache_dir=None)
+    append_rows(history, 3)
+
+    result = retrain_incremental(model_path, history, mode="update", nthread=1)
+
+    after = load_model(model_path)
+    assert result["trees_after"] == result["trees_before"]
+    assert after.get_booster().num_boosted_rounds() == before.get_booster().num_boosted_rounds()
+    assert (after.predict_proba(X) != before.predict_proba(X)).any()
+
+
+def test_failed_retrain_does_not_advance_offset(trained):
+    model_path, history = trained
+    offset = load_state(model_path)["offset"]
+    append_rows(history, 1)
+
+    with pytest.raises(ValueError):
+        retrain_incremental(model_path, history, mode="unknown")
+    assert load_state(model_path)["offset"] == offset
+
+
+def wait_for(jobs, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while jobs.get(job_id)["status"] in ("queued", "running"):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    return jobs.get(job_id)
+
+
+def test_retrain_endpoint_returns_job_and_status(trained, monkeypatch):
+    model_path, history = trained
+    append_rows(history, 2)
+    monkeypatch.setattr(fastapi_app, "MODEL_PATH", model_path)
+    client = TestClient(fastapi_app.app)
+
+    def retrain_without_registry(**kwargs):
+        kwargs.update(register_name=None, nthread=1)
+        return retrain_incremental(**kwargs)
+
+    jobs = RetrainJobs(retrain_without_registry, processes=False)
+    monkeypatch.setattr(fastapi_app, "retrain_jobs", jobs)
+    monkeypatch.setattr(fastapi_app, "RETRAIN_DATA_DIR", os.path.dirname(history))
+    response = client.post("/retrain", json={"mode": "continue", "rounds": 2, "data_path": "history.csv"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job = wait_for(jobs, job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"]["trees_after"] == job["result"]["trees_before"] + 2
+    assert client.get(f"/retrain/{job_id}").json()["status"] == "succeeded"
+    assert client.get("/retrain/unknown").status_code == 404
+    assert client.post("/retrain", json={"mode": "bogus"}).status_code == 400
+
+
+def test_retrain_reads_only_from_the_configured_data_dir(tmp_path, monkeypatch):
+    client = TestClient(fastapi_app.app)
+    jobs = RetrainJobs(lambda **kwargs: pytest.fail("fichier lu hors de RETRAIN_DATA_DIR"), processes=False)
+    monkeypatch.setattr(fastapi_app, "retrain_jobs", jobs)
+
+    monkeypatch.setattr(fastapi_app, "RETRAIN_DATA_DIR", None)
+    assert client.post("/retrain", json={"data_path": "history.csv"}).status_code == 400
+
+    monkeypatch.setattr(fastapi_app, "RETRAIN_DATA_DIR", str(tmp_path / "data"))
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "escape").symlink_to("/etc/passwd")
+    for data_path in ("/etc/passwd", "../model.pkl", "escape"):
+        assert client.post("/retrain", json={"data_path": data_path}).status_code == 400
+
+
+def test_process_job_trains_outside_the_service(trained):
+    model_path, history = trained
+    append_rows(history, 2)
+    jobs = RetrainJobs()
+    job_id = jobs.submit(model_path=model_path, history_path=history, rounds=2, nthread=1)
+    job = wait_for(jobs, job_id, timeout=60)
+    jobs.shutdown()
+
+    assert job["status"] == "succeeded"
+    assert load_model(model_path).get_booster().num_boosted_rounds() == job["result"]["trees_after"]
+
+
+def test_process_job_reports_error(tmp_path):
+    jobs = RetrainJobs()
+    job_id = jobs.submit(model_path=str(tmp_path / "missing.pkl"), history_path=str(tmp_path / "missing.csv"))
+    job = wait_for(jobs, job_id)
+    assert job["status"] == "failed"
+    assert "missing.csv" in job["error"]
+    jobs.shutdown()
+
+
+def test_retrain_registers_new_version(trained, tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    tracking_uri = (tmp_path / "mlruns").as_uri()
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", tracking_uri)
+    model_path, history = trained
+    append_rows(history, 2)
+
+    result = retrain_incremental(model_path, history, rounds=2, nthread=1, register_name="Churn")
+
+    (version,) = mlflow.tracking.MlflowClient(tracking_uri).search_model_versions("name='Churn'")
+    booster = mlflow.xgboost.load_model(version.source).get_booster()
+    assert booster.num_boosted_rounds() == result["trees_after"]
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+
+from inference_executor import BoundedExecutor, ExecutorFull
+
+
+def test_rejects_when_queue_is_full():
+    executor = BoundedExecutor(max_workers=1, max_queue=2)
+    release = threading.Event()
+    futures = [executor.submit(release.wait) for _ in range(3)]
+
+    with pytest.raises(ExecutorFull):
+        executor.submit(release.wait)
+    assert executor.stats()["pending"] == 3
+    assert executor.stats()["rejected"] == 1
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    # Les places sont rendues une fois les tâches terminées
+    assert executor.submit(lambda: 42).result(timeout=5) == 42
+    assert executor.stats()["pending"] == 0
+    executor.shutdown()
+
+
+def test_run_awaits_result_and_propagates_errors():
+    executor = BoundedExecutor(max_workers=2, max_queue=0)
+
+    def fail():
+        raise ValueError("boom")
+
+    async def scenario():
+        result = await executor.run(sum, [1, 2, 3])
+        with pytest.raises(ValueError):
+            await executor.run(fail)
+        return result
+
+    assert asyncio.run(scenario()) == 6
+    executor.shutdown()
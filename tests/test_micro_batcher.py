@@ -0,0 +1,82 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def predict_fn(matrix):
+        calls.append(matrix.shape[0])
+        return matrix.sum(axis=1)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_us=50_000)
+
+    async def scenario():
+        vectors = [np.full(3, i, dtype=np.float32) for i in range(8)]
+        results = await asyncio.gather(*(batcher.submit(v) for v in vectors))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert [float(r) for r in results] == [3.0 * i for i in range(8)]
+    assert calls == [8]
+    assert batcher.stats()["batch_size_histogram"]["8"] == 1
+
+
+def test_errors_are_propagated_to_every_caller():
+    def predict_fn(matrix):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_us=1000)
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(batcher.submit(np.zeros(2)) for _ in range(3)), return_exceptions=True
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_requests_with_different_keys_are_not_mixed():
+    calls = []
+
+    def predict_fn(matrix, key):
+        calls.append((key, matrix.shape[0]))
+        return matrix[:, 0] * key
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_us=50_000)
+
+    async def scenario():
+        keys = [1, 1, 2, 2, 1]
+        results = await asyncio.gather(
+            *(batcher.submit(np.ones(2), key=k) for k in keys)
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert [float(r) for r in results] == [1.0, 1.0, 2.0, 2.0, 1.0]
+    assert calls == [(1, 2), (2, 2), (1, 1)]
+
+
+def test_submit_rejects_when_pending_queue_is_full():
+    batcher = MicroBatcher(lambda matrix: matrix[:, 0], max_batch_size=2, max_wait_us=50_000, max_pending=2)
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(batcher.submit(np.ones(1))) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.QueueFull):
+            await batcher.submit(np.ones(1))
+        results = await asyncio.gather(*tasks)
+        await batcher.stop()
+        return results
+
+    assert [float(r) for r in asyncio.run(scenario())] == [1.0, 1.0]
+    assert batcher.stats()["rejected"] == 1
@@ -0,0 +1,155 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from xgboost import XGBClassifier
+
+mlflow = pytest.importorskip("mlflow")
+
+import mlflow_tracking
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+from mlflow_tracking import AsyncRunTracker, replay_spilled
+
+
+@pytest.fixture
+def tracking_uri(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    return (tmp_path / "mlruns").as_uri()
+
+
+class FlakyClient:
+    """
+    Client MLflow qui simule un serveur lent, puis injoignable tant que `down`.
+    """
+
+    down = False
+    delay = 0.0
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def call(*args, **kwargs):
+            time.sleep(FlakyClient.delay)
+            if FlakyClient.down:
+                raise MlflowException("Connection refused", error_code="INTERNAL_ERROR")
+            return method(*args, **kwargs)
+
+        return call
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    real_client = mlflow_tracking._client
+    monkeypatch.setattr(mlflow_tracking, "_client", lambda uri: FlakyClient(real_client(uri)))
+    FlakyClient.down, FlakyClient.delay = False, 0.0
+    yield FlakyClient
+    FlakyClient.down, FlakyClient.delay = False, 0.0
+
+
+def small_model():
+    X = np.random.default_rng(0).random((40, 3)).astype(np.float32)
+    return XGBClassifier(n_estimators=3).fit(X, (X[:, 0] > 0.5).astype(int))
+
+
+def only_run(tracking_uri):
+    client = MlflowClient(tracking_uri)
+    experiment = client.get_experiment_by_name("exp")
+    (run,) = client.search_runs([experiment.experiment_id])
+    return client, run
+
+
+def test_tracker_logs_run_model_and_registration(tmp_path, tracking_uri):
+    with AsyncRunTracker("exp", tracking_uri=tracking_uri, spill_dir=str(tmp_path / "spill")) as tracker:
+        tracker.log_params({"max_depth": 3, "engine": "native"})
+        tracker.log_metrics({"accuracy": 0.9, "train_seconds": 1.5})
+        tracker.set_tag("stage", "test")
+        tracker.log_model(small_model(), "xgboost_model")
+        tracker.register_model("xgboost_model", "Churn")
+
+    client, run = only_run(tracking_uri)
+    assert run.info.run_id == tracker.run_id
+    assert run.info.status == "FINISHED"
+    assert run.data.params == {"max_depth": "3", "engine": "native"}
+    assert run.data.metrics == {"accuracy": 0.9, "train_seconds": 1.5}
+    assert run.data.tags["stage"] == "test"
+
+    (version,) = client.search_model_versions("name='Churn'")
+    assert version.run_id == run.info.run_id
+    assert mlflow.xgboost.load_model(version.source).get_booster().num_boosted_rounds() == 3
+    # La zone de transit des artefacts est vidée après l'envoi
+    assert not any(files for _, _, files in os.walk(tmp_path / "spill"))
+
+
+def test_logging_does_not_wait_for_the_server(tmp_path, tracking_uri, flaky):
+    flaky.delay = 0.2
+    tracker = AsyncRunTracker("exp", tracking_uri=tracking_uri, spill_dir=str(tmp_path / "spill"))
+    start = time.perf_counter()
+    for i in range(50):
+        tracker.log_metric("loss", 1.0 / (i + 1), step=i)
+    assert time.perf_counter() - start < 0.1
+    tracker.end()
+
+    client, run = only_run(tracking_uri)
+    assert len(client.get_metric_history(run.info.run_id, "loss")) == 50
+
+
+def test_unreachable_server_spills_and_replays(tmp_path, tracking_uri, flaky):
+    spill_dir = str(tmp_path / "spill")
+    flaky.down = True
+    with AsyncRunTracker("exp", tracking_uri=tracking_uri, spill_dir=spill_dir) as tracker:
+        tracker.log_param("max_depth", 3)
+        tracker.log_metric("accuracy", 0.8)
+        tracker.log_model(small_model(), "xgboost_model")
+    assert tracker.spilled
+    assert os.path.exists(tracker.spill_path)
+
+    flaky.down = False
+    assert replay_spilled(spill_dir) == 1
+    assert not os.path.exists(tracker.spill_path)
+
+    client, run = only_run(tracking_uri)
+    assert run.info.status == "FINISHED"
+    assert run.data.params == {"max_depth": "3"}
+    assert run.data.metrics == {"accuracy": 0.8}
+    assert [a.path for a in client.list_artifacts(run.info.run_id)] == ["xgboost_model"]
+
+
+def test_replays_own_spill_when_server_comes_back(tmp_path, tracking_uri, flaky):
+    flaky.down = True
+    tracker = AsyncRunTracker("exp", tracking_uri=tracking_uri, spill_dir=str(tmp_path / "spill"), flush_interval=0.05)
+    tracker.log_param("a", 1)
+    tracker.flush(timeout=5)
+    assert tracker.spilled
+
+    flaky.down = False
+    tracker.log_param("b", 2)
+    tracker.end()
+
+    assert not tracker.spilled
+    _, run = only_run(tracking_uri)
+    assert run.data.params == {"a": "1", "b": "2"}
+    assert run.info.status == "FINISHED"
+
+
+def test_end_spills_ops_still_being_sent_to_an_unreachable_server(tmp_path):
+    # Port 9 (discard) : connexion refusée, le client MLflow relance en boucle
+    tracker = AsyncRunTracker(
+        "exp", tracking_uri="http://127.0.0.1:9", spill_dir=str(tmp_path / "spill"), flush_interval=0.05,
+        shutdown_timeout=1.0,
+    )
+    tracker.log_param("max_depth", 3)
+    tracker.log_metric("accuracy", 0.8)
+    time.sleep(0.2)
+    start = time.perf_counter()
+    tracker.end()
+
+    assert time.perf_counter() - start < 5
+    assert tracker.spilled
+    _, ops = mlflow_tracking._read_spill(tracker.spill_path)
+    assert [op["op"] for op in ops] == ["param", "metric", "end"]
+    assert ops[0]["key"] == "max_depth" and ops[1]["value"] == 0.8
@@ -0,0 +1,143 @@
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+from xgboost import XGBClassifier
+
+from feature_encoder import FeatureEncoder
+from model_bundle import (
+    BUNDLE_FORMAT_VERSION,
+    BundleError,
+    convert_pickle,
+    load_bundle,
+    load_bundle_predictor,
+    save_bundle,
+)
+from model_holder import ModelHolder
+from model_pipeline import load_model, save_model
+
+NAMES = ["a", "b", "c", "State_CA"]
+
+
+def make_model(n_estimators=10, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 10, (300, len(NAMES))).astype(np.float32)
+    model = XGBClassifier(n_estimators=n_estimators, max_depth=3).fit(X, (X[:, 0] > 5).astype(int))
+    model.get_booster().feature_names = NAMES
+    return model, X
+
+
+def make_encoder():
+    return FeatureEncoder(NAMES, categorical_cols=["State"], categories={"State": ["CA"]})
+
+
+def test_round_trip_without_pickle(tmp_path):
+    model, X = make_model()
+    path = str(tmp_path / "model.bundle")
+    manifest = save_bundle(model, path, make_encoder(), training_data_hash="abc")
+
+    bundle = load_bundle(path)
+    np.testing.assert_allclose(bundle.model.predict_proba(X), model.predict_proba(X), rtol=1e-6)
+    np.testing.assert_allclose(bundle.forest.predict_positive(X), model.predict_proba(X)[:, 1], atol=1e-6)
+    assert bundle.encoder.to_dict() == make_encoder().to_dict()
+    assert bundle.manifest["feature_names"] == NAMES
+    assert bundle.manifest["training_data_hash"] == "abc"
+    assert bundle.manifest["model_version"] == manifest["model_version"]
+    assert bundle.manifest["n_trees"] == 10
+    assert not any(name.endswith(".pkl") for name in os.listdir(path))
+
+    forest, _ = load_bundle_predictor(path)
+    assert isinstance(forest.value, np.memmap)
+
+
+def test_rejects_corrupted_or_incompatible_bundles(tmp_path):
+    model, _ = make_model()
+    path = str(tmp_path / "model.bundle")
+    save_bundle(model, path, make_encoder())
+    manifest_path = os.path.join(path, "manifest.json")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    # Octet modifié dans le booster : même taille, empreinte différente
+    with open(os.path.join(path, "model.ubj"), "r+b") as f:
+        f.seek(100)
+        byte = f.read(1)
+        f.seek(100)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with pytest.raises(BundleError, match="sha256"):
+        load_bundle(path)
+
+    for changes in (
+        {"format_version": BUNDLE_FORMAT_VERSION + 1},
+        {"feature_names": NAMES[:3]},
+        {"format": "autre"},
+    ):
+        with open(manifest_path, "w") as f:
+            json.dump({**manifest, **changes}, f)
+        with pytest.raises(BundleError):
+            load_bundle(path, checksums=False)
+
+    os.remove(manifest_path)
+    with pytest.raises(BundleError, match="Manifeste introuvable"):
+        load_bundle(path)
+
+
+def test_convert_existing_pickle(tmp_path):
+    pkl_path = str(tmp_path / "model.pkl")
+    shutil.copy("model.pkl", pkl_path)
+    with open(pkl_path, "rb") as f:
+        model = pickle.load(f)
+
+    manifest = convert_pickle(pkl_path)
+    bundle = load_bundle(str(tmp_path / "model.bundle"))
+
+    X = np.random.default_rng(0).uniform(0, 300, (50, 14)).astype(np.float32)
+    np.testing.assert_allclose(bundle.model.predict_proba(X), model.predict_proba(X), rtol=1e-6)
+    assert manifest["feature_names"] == list(model.feature_names_in_)
+
+
+def test_save_model_writes_bundle_used_by_loaders(tmp_path):
+    model, X = make_model()
+    path = str(tmp_path / "model.pkl")
+    save_model(model, path, encoder=make_encoder())
+
+    # Le bundle suffit : le pickle n'est pas lu
+    os.rename(path, f"{path}.bak")
+    np.testing.assert_allclose(load_model(path).predict_proba(X), model.predict_proba(X), rtol=1e-6)
+    os.rename(f"{path}.bak", path)
+
+    holder = ModelHolder(path, poll_interval=0)
+    snapshot = holder.load()
+    assert snapshot.version.startswith(load_bundle(str(tmp_path / "model.bundle")).manifest["model_version"])
+    np.testing.assert_allclose(snapshot.predictor.predict_proba(X[:4]), model.predict_proba(X[:4]), atol=1e-6)
+
+    new_model, _ = make_model(n_estimators=5, seed=1)
+    save_model(new_model, path, encoder=make_encoder())
+    assert holder.reload_if_changed()
+    assert holder.current.model.get_booster().num_boosted_rounds() == 5
+
+
+def test_stale_bundle_is_ignored_when_the_pickle_changes(tmp_path):
+    model, X = make_model()
+    path = str(tmp_path / "model.pkl")
+    save_model(model, path, encoder=make_encoder())
+    holder = ModelHolder(path, poll_interval=0)
+    holder.load()
+
+    # Pickle réécrit sans bundle : le CLI et le service passent au nouveau modèle
+    new_model, _ = make_model(n_estimators=5, seed=1)
+    save_model(new_model, path)
+    assert load_model(path).get_booster().num_boosted_rounds() == 5
+    assert holder.reload_if_changed()
+    assert holder.current.model.get_booster().num_boosted_rounds() == 5
+
+    # Même contenu recopié (date différente) : le bundle reste valable
+    save_model(model, path, encoder=make_encoder())
+    shutil.copy(path, f"{path}.copy")
+    os.replace(f"{path}.copy", path)
+    assert isinstance(load_model(path), XGBClassifier)
+    assert holder.reload_if_changed()
+    assert holder.current.version.startswith(load_bundle(str(tmp_path / "model.bundle")).manifest["model_version"])
@@ -0,0 +1,76 @@
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+from xgboost import XGBClassifier
+
+from model_holder import ModelHolder, validate_snapshot
+
+
+def make_holder(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    shutil.copy("model.pkl", path)
+    holder = ModelHolder(path, poll_interval=0)
+    holder.load()
+    return holder, path
+
+
+def test_reload_swaps_to_new_artifact(tmp_path):
+    holder, path = make_holder(tmp_path)
+    old = holder.current
+
+    names = list(old.encoder.columns)
+    X = np.random.default_rng(0).uniform(0, 10, (40, len(names)))
+    new_model = XGBClassifier(n_estimators=3).fit(X, np.arange(40) % 2)
+    new_model.get_booster().feature_names = names
+    with open(path, "wb") as f:
+        pickle.dump(new_model, f)
+    os.utime(path, ns=(0, 1))
+
+    assert holder.reload_if_changed()
+    assert holder.current.version != old.version
+    assert holder.current.model is not old.model
+    assert not holder.reload_if_changed()
+
+
+def test_invalid_artifact_keeps_serving_old_model(tmp_path):
+    holder, path = make_holder(tmp_path)
+    old = holder.current
+
+    with open(path, "wb") as f:
+        f.write(b"not a model")
+    os.utime(path, ns=(0, 1))
+
+    assert not holder.reload_if_changed()
+    assert holder.current is old
+    assert holder.failed_reloads == 1
+
+
+def test_registry_model_uses_its_own_feature_order(tmp_path, monkeypatch):
+    import mlflow.xgboost
+    from mlflow.tracking import MlflowClient
+
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", (tmp_path / "mlruns").as_uri())
+    holder, path = make_holder(tmp_path)
+
+    # Mêmes colonnes que le plan local, dans un autre ordre
+    names = list(reversed(holder.current.encoder.columns))
+    X = np.random.default_rng(0).uniform(0, 10, (40, len(names)))
+    model = XGBClassifier(n_estimators=3).fit(X, np.arange(40) % 2)
+    model.get_booster().feature_names = names
+    mlflow.xgboost.save_model(model, str(tmp_path / "xgboost_model"))
+    with mlflow.start_run() as run:
+        mlflow.log_artifacts(str(tmp_path / "xgboost_model"), "xgboost_model")
+    MlflowClient().create_registered_model("Churn")
+    MlflowClient().create_model_version("Churn", f"{run.info.artifact_uri}/xgboost_model", run.info.run_id)
+
+    registry = ModelHolder(path, registry_name="Churn")
+    registry.load()
+    assert registry.current.encoder.columns == names
+
+    snapshot = registry.current._replace(encoder=holder.current.encoder)
+    with pytest.raises(ValueError, match="Plan d'encodage"):
+        validate_snapshot(snapshot)
@@ -0,0 +1,24 @@
+import pickle
+
+import numpy as np
+
+from model_serving import export_native_model, load_native_model
+from serve import plan_workers
+
+
+def test_native_model_matches_pickle(tmp_path):
+    with open("model.pkl", "rb") as f:
+        model = pickle.load(f)
+    path = str(tmp_path / "model.ubj")
+    export_native_model(model, path)
+
+    native = load_native_model(path, nthread=1)
+    X = np.random.default_rng(0).uniform(0, 300, (50, 14)).astype(np.float32)
+    np.testing.assert_allclose(native.predict_proba(X), model.predict_proba(X), rtol=1e-6)
+    assert list(native.feature_names_in_) == list(model.feature_names_in_)
+
+
+def test_plan_workers_does_not_oversubscribe():
+    assert plan_workers(32, nthread=4) == (8, 4)
+    assert plan_workers(2, nthread=8) == (1, 2)
+    assert plan_workers(8, nthread=1, workers=3) == (3, 1)
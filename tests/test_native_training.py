@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from model_pipeline import prepare_arrays
+from native_training import measure, train_external_memory, train_quantile_dmatrix
+from test_feature_encoder import make_raw_frame
+
+
+def make_dataset(tmp_path, n_copies=20):
+    df = pd.concat([make_raw_frame()] * n_copies, ignore_index=True)
+    df["Churn"] = df["Customer service calls"] > 150
+    path = str(tmp_path / "train.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_quantile_dmatrix_training(tmp_path):
+    X, y, encoder = prepare_arrays(make_dataset(tmp_path), cache_dir=None)
+    model = train_quantile_dmatrix(X, y, num_boost_round=10, nthread=1)
+
+    assert list(model.feature_names_in_) == encoder.columns
+    assert (model.predict(X) == y).mean() > 0.95
+
+
+def test_external_memory_training_matches_in_memory(tmp_path):
+    path = make_dataset(tmp_path)
+    X, y, _ = prepare_arrays(path, cache_dir=None)
+
+    model, encoder, rows = train_external_memory(path, num_boost_round=10, nthread=1, chunksize=50)
+    in_memory = train_quantile_dmatrix(X, y, num_boost_round=10, nthread=1)
+
+    assert rows == len(X)
+    assert encoder.categories["State"] == ["AK", "CA", "NY", "TX"]
+    np.testing.assert_array_equal(model.predict(X), in_memory.predict(X))
+
+
+def test_measure_reports_memory_added_by_each_call():
+    large, _, large_mb = measure(np.ones, 100 * 1024 * 1024 // 8)
+    del large
+    small, _, small_mb = measure(np.ones, 8 * 1024 * 1024 // 8)
+
+    # Le pic de la première étape ne se reporte pas sur la suivante
+    assert large_mb > 80
+    assert small_mb < 40
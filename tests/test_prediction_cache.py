@@ -0,0 +1,29 @@
+import numpy as np
+
+from prediction_cache import PredictionCache, vector_key, value_size
+
+
+def test_vector_key_depends_on_values_only():
+    a = np.array([1.0, 2.0, 3.0])
+    assert vector_key(a) == vector_key(a.astype(np.float32))
+    assert vector_key(a) != vector_key(a + 1)
+
+
+def test_lru_eviction_respects_memory_budget():
+    cache = PredictionCache(max_bytes=3 * value_size(0.5), ttl_seconds=60)
+    for i in range(3):
+        cache.put(("v1", i), 0.5)
+    cache.get(("v1", 0))
+    cache.put(("v1", 3), 0.5)
+
+    assert cache.get(("v1", 1)) is None
+    assert cache.get(("v1", 0)) == 0.5
+    assert cache.evictions == 1
+    assert cache.current_bytes <= cache.max_bytes
+
+
+def test_expired_entries_are_misses():
+    cache = PredictionCache(max_bytes=1024, ttl_seconds=1e-9)
+    cache.put("k", 0.1)
+    assert cache.get("k") is None
+    assert cache.expirations == 1
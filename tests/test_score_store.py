@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+from model_pipeline import prepare_arrays, save_model
+from native_training import train_quantile_dmatrix
+from score_store import ScoreStore, build_store, current_manifest, write_generation
+from test_app import ROW
+from test_native_training import make_dataset
+
+
+def test_lookup_by_int_and_string_ids(tmp_path):
+    features = np.arange(8, dtype=np.float32).reshape(4, 2)
+    write_generation(str(tmp_path / "ints"), [30, 10, 20, 10], [0.3, 0.1, 0.2, 0.9], features, "v1")
+    write_generation(str(tmp_path / "strs"), ["b-2", "a-1", "é-3"], [0.2, 0.1, 0.3], features[:3], "v1")
+
+    ints = ScoreStore(str(tmp_path / "ints"))
+    entry, fresh = ints.lookup("10", "v1")
+    assert fresh and entry.probability == pytest.approx(0.9)
+    assert entry.features.tolist() == [6.0, 7.0]
+    assert ints.lookup("15", "v1") == (None, False)
+    assert ints.lookup("abc", "v1") == (None, False)
+    assert ints.lookup(str(2**70), "v1") == (None, False)
+
+    strs = ScoreStore(str(tmp_path / "strs"))
+    assert strs.lookup("é-3", "v1")[0].probability == pytest.approx(0.3)
+    assert strs.lookup("a-1-long", "v1") == (None, False)
+    assert strs.stats()["hits"] == 1 and strs.stats()["misses"] == 1
+
+
+def test_float_ids_are_stored_as_integers(tmp_path):
+    write_generation(str(tmp_path), np.array([3.0, 1.0]), [0.3, 0.1], np.zeros((2, 2)), "v1")
+    store = ScoreStore(str(tmp_path))
+
+    assert store.lookup("1", "v1")[0].probability == pytest.approx(0.1)
+    assert current_manifest(str(tmp_path))["id_kind"] == "int"
+    with pytest.raises(ValueError, match="Identifiants"):
+        write_generation(str(tmp_path), np.array([1.0, np.nan]), [0.1, 0.2], np.zeros((2, 2)), "v1")
+
+
+def test_entries_are_stale_for_other_model_or_old_scores(tmp_path):
+    write_generation(str(tmp_path), [1], [0.5], np.zeros((1, 2)), "v1")
+    store = ScoreStore(str(tmp_path))
+
+    assert store.lookup("1", "v2")[1] is False
+    store.max_age = -1
+    assert store.lookup("1", "v1")[1] is False
+    assert store.stats()["stale"] == 2
+
+
+def test_rebuild_swaps_generation_and_prunes_old_ones(tmp_path):
+    root = str(tmp_path)
+    store = ScoreStore(root, poll_interval=0)
+    assert store.lookup("1", "v1") == (None, False)
+
+    for version in ("v1", "v2", "v3"):
+        write_generation(root, [1], [0.5], np.zeros((1, 2)), version)
+        assert store.generation.model_version == version
+
+    assert len([name for name in os.listdir(root) if name.startswith("gen-")]) == 2
+
+
+def test_build_store_scores_every_subscriber(tmp_path):
+    path = make_dataset(tmp_path, n_copies=5)
+    X, y, encoder = prepare_arrays(path, cache_dir=None)
+    model_path = str(tmp_path / "model.pkl")
+    save_model(train_quantile_dmatrix(X, y, num_boost_round=5, nthread=1), model_path, encoder=encoder)
+    input_path = str(tmp_path / "subscribers.csv")
+    pd.read_csv(path).assign(subscriber=np.arange(len(X)) * 3).to_csv(input_path, index=False)
+
+    root = str(tmp_path / "store")
+    manifest = build_store(model_path, input_path, "subscriber", root, chunksize=30)
+
+    # Un identifiant manquant : colonne lue en float, la ligne est écartée
+    with_missing = str(tmp_path / "with_missing.csv")
+    pd.read_csv(input_path).assign(subscriber=lambda df: df["subscriber"].where(df.index != 0)).to_csv(
+        with_missing, index=False
+    )
+    missing_root = str(tmp_path / "store_missing")
+    assert build_store(model_path, with_missing, "subscriber", missing_root, chunksize=30)["rows"] == len(X) - 1
+    assert ScoreStore(missing_root).lookup("9", manifest["model_version"])[0] is not None
+    entry, fresh = ScoreStore(root).lookup("9", manifest["model_version"])
+
+    expected = fastapi_app.ModelHolder(model_path)
+    expected.load()
+    assert fresh and manifest["rows"] == len(X)
+    assert entry.probability == pytest.approx(expected.current.model.predict_proba(X[3:4])[0, 1], rel=1e-5)
+    assert build_store(model_path, input_path, "subscriber", root, if_changed=True) == current_manifest(root)
+
+
+def test_score_endpoint_serves_store_then_falls_back(tmp_path, monkeypatch):
+    client = TestClient(fastapi_app.app)
+    snapshot = fastapi_app.holder.current
+    root = str(tmp_path)
+    monkeypatch.setattr(fastapi_app, "scores", ScoreStore(root, poll_interval=0))
+    live = client.post("/predict/batch", json={"rows": [ROW]}).json()["probabilities"][0]
+
+    write_generation(root, [42], [0.99], np.array([ROW], dtype=np.float32), snapshot.version)
+    body = client.get("/score/42").json()
+    assert body["source"] == "store" and body["probability"] == pytest.approx(0.99)
+
+    write_generation(root, [42], [0.99], np.array([ROW], dtype=np.float32), "older-model")
+    body = client.get("/score/42").json()
+    assert body["source"] == "live" and body["probability"] == pytest.approx(live, rel=1e-6)
+
+    assert client.get("/score/7").status_code == 404
+    body = client.post("/score/7", json={"features": ROW}).json()
+    assert body["source"] == "live" and body["prediction"] == int(live >= 0.5)
+    assert client.get("/stats/scores").json()["misses"] == 2
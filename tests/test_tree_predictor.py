@@ -0,0 +1,101 @@
+import json
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from xgboost import XGBClassifier
+
+from tree_predictor import CompiledForest, HybridPredictor, compile_predictor, load_ubjson
+
+
+def make_data(n=600, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features)).astype(np.float32)
+    y = ((X[:, 0] + X[:, 1] * X[:, 2] > 0) ^ (rng.random(n) < 0.1)).astype(int)
+    # Valeurs manquantes : XGBoost apprend une direction par défaut à chaque split
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+
+@pytest.mark.parametrize("max_depth", [2, 6])
+def test_matches_predict_proba(max_depth):
+    X, y = make_data()
+    model = XGBClassifier(n_estimators=30, max_depth=max_depth, learning_rate=0.3).fit(X, y)
+    forest = CompiledForest.from_model(model)
+
+    expected = model.predict_proba(X)
+    np.testing.assert_allclose(forest.predict_proba(X), expected, atol=1e-6)
+    for row, proba in zip(X[:50], expected[:50]):
+        assert forest.predict_positive(row) == pytest.approx(proba[1], abs=1e-6)
+        np.testing.assert_allclose(forest.predict_proba(row[None, :]), proba[None, :], atol=1e-6)
+
+
+def test_respects_best_iteration():
+    X, y = make_data()
+    model = XGBClassifier(n_estimators=200, learning_rate=0.5, early_stopping_rounds=3)
+    model.fit(X[:400], y[:400], eval_set=[(X[400:], y[400:])], verbose=False)
+    assert model.best_iteration < 199
+
+    forest = CompiledForest.from_model(model)
+    assert len(forest.roots) == model.best_iteration + 1
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+
+def test_loads_saved_model_file(tmp_path):
+    X, y = make_data()
+    model = XGBClassifier(n_estimators=10).fit(X, y)
+    path = str(tmp_path / "model.json")
+    model.save_model(path)
+
+    forest = CompiledForest.from_file(path)
+    np.testing.assert_allclose(forest.predict_positive(X), model.predict_proba(X)[:, 1], atol=1e-6)
+
+
+def test_reads_native_ubj_without_xgboost(tmp_path):
+    X, y = make_data()
+    model = XGBClassifier(n_estimators=200, learning_rate=0.5, early_stopping_rounds=3)
+    model.fit(X[:400], y[:400], eval_set=[(X[400:], y[400:])], verbose=False)
+    path = str(tmp_path / "model.ubj")
+    model.save_model(path)
+
+    decoded = load_ubjson(path)
+    reference = json.loads(model.get_booster().save_raw("json"))
+    tree = decoded["learner"]["gradient_booster"]["model"]["trees"][0]
+    expected = reference["learner"]["gradient_booster"]["model"]["trees"][0]
+    assert tree["left_children"] == expected["left_children"]
+    np.testing.assert_allclose(tree["split_conditions"], expected["split_conditions"], rtol=1e-6)
+    assert decoded["learner"]["learner_model_param"] == reference["learner"]["learner_model_param"]
+
+    forest = CompiledForest.from_native_file(path)
+    assert len(forest.roots) == model.best_iteration + 1
+    np.testing.assert_allclose(forest.predict_positive(X), model.predict_proba(X)[:, 1], atol=1e-6)
+
+
+def test_hybrid_predictor_routes_by_batch_size(monkeypatch):
+    X, y = make_data()
+    model = XGBClassifier(n_estimators=10).fit(X, y)
+    monkeypatch.setenv("COMPILED_PREDICTOR_MAX_ROWS", "8")
+    predictor = compile_predictor(model)
+
+    assert isinstance(predictor, HybridPredictor) and predictor.max_rows == 8
+    calls = []
+    monkeypatch.setattr(predictor.forest, "predict_proba", lambda X: calls.append("compiled"))
+    monkeypatch.setattr(predictor.model, "predict_proba", lambda X: calls.append("xgboost"))
+    predictor.predict_proba(X[:1])
+    predictor.predict_proba(X[:8])
+    predictor.predict_proba(X[:9])
+    assert calls == ["compiled", "compiled", "xgboost"]
+
+    monkeypatch.setenv("COMPILED_PREDICTOR_MAX_ROWS", "0")
+    assert compile_predictor(model) is None
+
+
+def test_unsupported_models_fall_back():
+    X, _ = make_data()
+    y = np.arange(len(X)) % 3
+    model = XGBClassifier(n_estimators=5).fit(X, y)
+    assert compile_predictor(model) is None
+
+    booster = xgb.train({"booster": "gblinear", "objective": "binary:logistic"}, xgb.DMatrix(np.nan_to_num(X), label=y % 2), 2)
+    with pytest.raises(NotImplementedError):
+        CompiledForest.from_booster(booster)
@@ -0,0 +1,50 @@
+import pytest
+
+from test_native_training import make_dataset
+from tuning import grid_configs, log_trials_to_mlflow, random_configs, tune
+
+
+def test_search_spaces():
+    space = {"max_depth": [3, 4], "learning_rate": [0.1, 0.3]}
+    assert len(grid_configs(space)) == 4
+    assert random_configs(space, 5, seed=1) == random_configs(space, 5, seed=1)
+
+
+@pytest.mark.parametrize("strategy", ["random", "halving"])
+def test_tune_returns_best_model(tmp_path, strategy):
+    path = make_dataset(tmp_path)
+    results, best, model, encoder = tune(
+        path,
+        strategy=strategy,
+        n_trials=4,
+        max_rounds=20,
+        min_rounds=5,
+        workers=1,
+        cache_dir=str(tmp_path / "cache"),
+    )
+
+    assert list(model.feature_names_in_) == encoder.columns
+    if strategy == "halving":
+        assert {r["num_boost_round"] for r in results} == {5, 15, 20}
+        assert best["num_boost_round"] == 20
+    else:
+        assert best["logloss"] == min(r["logloss"] for r in results if not r["pruned"])
+
+
+def test_trials_are_logged_as_nested_runs(tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", (tmp_path / "mlruns").as_uri())
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    results, _, _, _ = tune(
+        make_dataset(tmp_path), n_trials=2, max_rounds=5, workers=1, cache_dir=str(tmp_path / "cache")
+    )
+
+    experiment_id = mlflow.create_experiment("tuning-test")
+    with mlflow.start_run(experiment_id=experiment_id) as run:
+        log_trials_to_mlflow(results, run.info.run_id, experiment_id)
+
+    children = mlflow.search_runs(
+        [experiment_id], filter_string=f"tags.mlflow.parentRunId = '{run.info.run_id}'"
+    )
+    assert len(children) == 2
+    assert "params.max_depth" in children.columns
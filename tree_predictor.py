@@ -0,0 +1,426 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# Taille de lot maximale servie par le prédicteur compilé (calibrée au chargement
+# si la variable n'est pas définie ; 0 le désactive)
+COMPILED_MAX_ROWS_ENV = "COMPILED_PREDICTOR_MAX_ROWS"
+
+# Tailles de lot essayées lors de la calibration
+CALIBRATION_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Objectifs supportés : sortie = sigmoïde de la marge
+LOGISTIC_OBJECTIVES = ("binary:logistic", "reg:logistic")
+
+
+# Types scalaires UBJSON (format natif .ubj de XGBoost), en big-endian
+UBJSON_TYPES = {
+    "i": np.dtype("i1"),
+    "U": np.dtype("u1"),
+    "I": np.dtype(">i2"),
+    "l": np.dtype(">i4"),
+    "L": np.dtype(">i8"),
+    "d": np.dtype(">f4"),
+    "D": np.dtype(">f8"),
+}
+
+
+class _UBJSONReader:
+    """
+    Décodeur UBJSON minimal, suffisant pour les modèles XGBoost : les
+    tableaux typés (`[$l#...`) sont lus d'un bloc avec NumPy.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def _marker(self):
+        marker = chr(self.data[self.pos])
+        self.pos += 1
+        return marker
+
+    def _scalar(self, dtype):
+        value = np.frombuffer(self.data, dtype, 1, self.pos)[0]
+        self.pos += dtype.itemsize
+        return value.item()
+
+    def _string(self):
+        length = self._scalar(UBJSON_TYPES[self._marker()])
+        value = self.data[self.pos : self.pos + length].decode()
+        self.pos += length
+        return value
+
+    def _header(self):
+        """
+        En-tête optionnel d'un conteneur : type ($) et nombre d'éléments (#).
+        """
+        item_type = count = None
+        if chr(self.data[self.pos]) == "$":
+            self.pos += 1
+            item_type = self._marker()
+        if chr(self.data[self.pos]) == "#":
+            self.pos += 1
+            count = self._scalar(UBJSON_TYPES[self._marker()])
+        return item_type, count
+
+    def value(self, marker=None):
+        marker = marker or self._marker()
+        if marker in UBJSON_TYPES:
+            return self._scalar(UBJSON_TYPES[marker])
+        if marker == "S":
+            return self._string()
+        if marker == "[":
+            return self._array()
+        if marker == "{":
+            return self._object()
+        if marker in "TFZ":
+            return {"T": True, "F": False, "Z": None}[marker]
+        if marker == "C":
+            return self._marker()
+        raise ValueError(f"Marqueur UBJSON non supporté : {marker!r} (position {self.pos - 1})")
+
+    def _array(self):
+        item_type, count = self._header()
+        if item_type in UBJSON_TYPES:
+            dtype = UBJSON_TYPES[item_type]
+            values = np.frombuffer(self.data, dtype, count, self.pos)
+            self.pos += count * dtype.itemsize
+            return values.tolist()
+        if count is not None:
+            return [self.value(item_type) for _ in range(count)]
+        values = []
+        while chr(self.data[self.pos]) != "]":
+            values.append(self.value())
+        self.pos += 1
+        return values
+
+    def _object(self):
+        item_type, count = self._header()
+        result = {}
+        if count is not None:
+            for _ in range(count):
+                key = self._string()
+                result[key] = self.value(item_type)
+            return result
+        while chr(self.data[self.pos]) != "}":
+            key = self._string()
+            result[key] = self.value()
+        self.pos += 1
+        return result
+
+
+def load_ubjson(path):
+    """
+    Lit un modèle XGBoost natif (.ubj) sous forme de dictionnaire, identique
+    au JSON de `Booster.save_raw("json")`, sans importer XGBoost.
+    """
+    with open(path, "rb") as f:
+        return _UBJSONReader(f.read()).value()
+
+
+def _parse_float(value):
+    """
+    Les paramètres du modèle JSON sont des chaînes, parfois entre crochets
+    ("[5E-1]" à partir de XGBoost 2).
+    """
+    return float(str(value).strip("[]").split(",")[0])
+
+
+class CompiledForest:
+    """
+    Ensemble d'arbres XGBoost aplati en tableaux NumPy contigus.
+
+    Tous les nœuds de tous les arbres sont concaténés : feature testée,
+    seuil, enfants gauche/droit (indices absolus), direction des valeurs
+    manquantes et valeur de feuille. Les feuilles pointent sur elles-mêmes :
+    le parcours avance de `max_depth` niveaux sans test de fin, ce qui le
+    rend entièrement vectorisable (sur les arbres pour une ligne, sur
+    lignes x arbres pour un lot).
+    """
+
+    def __init__(
+        self, feature, threshold, left, right, default_left, value, roots, max_depth, base_margin, n_features
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_margin = base_margin
+        self.n_features = n_features
+
+    @classmethod
+    def from_json(cls, model_json, n_trees=None):
+        """
+        Construit le prédicteur depuis le JSON complet du modèle
+        (`Booster.save_raw("json")`), éventuellement limité aux `n_trees`
+        premiers arbres.
+        """
+        learner = model_json["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in LOGISTIC_OBJECTIVES:
+            raise NotImplementedError(f"Objectif non supporté : {objective}")
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise NotImplementedError(f"Booster non supporté : {booster['name']}")
+
+        trees = booster["model"]["trees"][:n_trees]
+        if any(any(tree.get("split_type", [])) for tree in trees):
+            raise NotImplementedError("Splits catégoriels non supportés")
+
+        features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            left = np.asarray(tree["left_children"], dtype=np.int32)
+            right = np.asarray(tree["right_children"], dtype=np.int32)
+            n_nodes = len(left)
+            nodes = np.arange(n_nodes, dtype=np.int32)
+            is_leaf = left == -1
+            condition = np.asarray(tree["split_conditions"], dtype=np.float32)
+
+            # Pour une feuille, `split_conditions` contient la valeur de la feuille
+            features.append(np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int32)))
+            thresholds.append(np.where(is_leaf, np.float32(0), condition))
+            lefts.append(np.where(is_leaf, nodes, left) + offset)
+            rights.append(np.where(is_leaf, nodes, right) + offset)
+            defaults.append(np.asarray(tree["default_left"], dtype=bool) | is_leaf)
+            values.append(np.where(is_leaf, condition, np.float32(0)))
+            roots.append(offset)
+            max_depth = max(max_depth, cls._depth(left, right))
+            offset += n_nodes
+
+        model_param = learner["learner_model_param"]
+        base_score = _parse_float(model_param["base_score"])
+        return cls(
+            np.concatenate(features).astype(np.intp),
+            np.concatenate(thresholds).astype(np.float32),
+            np.concatenate(lefts).astype(np.intp),
+            np.concatenate(rights).astype(np.intp),
+            np.concatenate(defaults),
+            np.concatenate(values).astype(np.float32),
+            np.asarray(roots, dtype=np.intp),
+            max_depth,
+            float(np.log(base_score / (1 - base_score))),
+            int(model_param["num_feature"]),
+        )
+
+    @staticmethod
+    def _depth(left, right):
+        depth, level = 0, [0]
+        while True:
+            level = [child for node in level for child in (left[node], right[node]) if child != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    @classmethod
+    def from_booster(cls, booster, n_trees=None):
+        return cls.from_json(json.loads(booster.save_raw("json")), n_trees)
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Depuis un `XGBClassifier`, en respectant `best_iteration` comme
+        `predict_proba`.
+        """
+        booster = model.get_booster()
+        model_json = json.loads(booster.save_raw("json"))
+        n_trees = None
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        if best_iteration is not None:
+            indptr = model_json["learner"]["gradient_booster"]["model"].get("iteration_indptr")
+            n_trees = indptr[best_iteration + 1] if indptr else best_iteration + 1
+        return cls.from_json(model_json, n_trees)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Depuis un modèle XGBoost sauvegardé (.json, .ubj, model.xgb des artefacts MLflow).
+        """
+        import xgboost as xgb
+
+        return cls.from_booster(xgb.Booster(model_file=path))
+
+    @classmethod
+    def from_native_file(cls, path):
+        """
+        Depuis un modèle natif .ubj ou .json, sans importer XGBoost (démarrage
+        rapide de la CLI). `best_iteration`, s'il est enregistré, est respecté.
+        """
+        if path.endswith(".json"):
+            with open(path) as f:
+                model_json = json.load(f)
+        else:
+            model_json = load_ubjson(path)
+        n_trees = None
+        best_iteration = model_json["learner"].get("attributes", {}).get("best_iteration")
+        if best_iteration is not None:
+            indptr = model_json["learner"]["gradient_booster"]["model"].get("iteration_indptr")
+            n_trees = indptr[int(best_iteration) + 1] if indptr else int(best_iteration) + 1
+        return cls.from_json(model_json, n_trees)
+
+    def save_arrays(self, directory):
+        """
+        Sauvegarde les tableaux du prédicteur (un .npy par tableau, en types
+        compacts) pour un rechargement en mémoire mappée. Retourne les
+        paramètres scalaires à conserver à côté (manifeste du bundle).
+        """
+        os.makedirs(directory, exist_ok=True)
+        index_dtype = np.int16 if self.n_features <= np.iinfo(np.int16).max else np.int32
+        compact = {
+            "feature": self.feature.astype(index_dtype),
+            "threshold": self.threshold.astype(np.float32),
+            "left": self.left.astype(np.int32),
+            "right": self.right.astype(np.int32),
+            "default_left": self.default_left.astype(bool),
+            "value": self.value.astype(np.float32),
+            "roots": self.roots.astype(np.int32),
+        }
+        for name, array in compact.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        return {"max_depth": self.max_depth, "base_margin": self.base_margin, "n_features": self.n_features}
+
+    @classmethod
+    def load_arrays(cls, directory, params, mmap=True):
+        """
+        Recharge un prédicteur sauvegardé par `save_arrays`, sans XGBoost.
+        """
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ("feature", "threshold", "left", "right", "default_left", "value", "roots")
+        }
+        return cls(
+            **arrays,
+            max_depth=params["max_depth"],
+            base_margin=params["base_margin"],
+            n_features=params["n_features"],
+        )
+
+    def _leaves(self, X, nodes):
+        rows = np.arange(X.shape[0])[:, None] if X.ndim == 2 else None
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            x = X[rows, feature] if rows is not None else X[feature]
+            go_left = (x < self.threshold[nodes]) | (np.isnan(x) & self.default_left[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def margin(self, X):
+        """
+        Marge (log-odds) pour une ligne (vecteur) ou un lot (matrice).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            return self.base_margin + float(self.value[self._leaves(X, self.roots)].sum(dtype=np.float32))
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        leaves = self._leaves(X, nodes)
+        return self.base_margin + self.value[leaves].sum(axis=1, dtype=np.float32)
+
+    def predict_positive(self, X):
+        """
+        Probabilité de la classe positive.
+        """
+        return 1.0 / (1.0 + np.exp(-self.margin(X)))
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 2 and X.shape[0] == 1:
+            # Une seule ligne : parcours vectorisé sur les arbres uniquement
+            X = X[0]
+        positive = np.atleast_1d(self.predict_positive(X))
+        return np.column_stack([1.0 - positive, positive])
+
+
+class HybridPredictor:
+    """
+    Choisit le moteur par taille de lot : prédicteur compilé jusqu'à
+    `max_rows` lignes (dispatch XGBoost/DMatrix dominant), XGBoost au-delà.
+    """
+
+    def __init__(self, model, forest, max_rows):
+        self.model = model
+        self.forest = forest
+        self.max_rows = max_rows
+
+    def predict_proba(self, X):
+        if len(X) <= self.max_rows:
+            return self.forest.predict_proba(X)
+        return self.model.predict_proba(X)
+
+
+def _best_time(fn, X, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def matches_model(model, forest, n_rows=64, tolerance=1e-5, seed=0):
+    """
+    Vérifie que le prédicteur compilé reproduit `model.predict_proba`
+    (valeurs manquantes comprises) sur un lot aléatoire.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 300, (n_rows, forest.n_features)).astype(np.float32)
+    if forest.n_features > 3:
+        # Indicatrices (one-hot) en fin de vecteur, comme SELECTED_FEATURES
+        X[:, -3:] = rng.integers(0, 2, (n_rows, 3))
+    X[::5, 0] = np.nan
+    expected = model.predict_proba(X)[:, 1]
+    return np.allclose(forest.predict_positive(X), expected, atol=tolerance) and np.isclose(
+        forest.predict_proba(X[:1])[0, 1], expected[0], atol=tolerance
+    )
+
+
+def calibrate(model, forest, sizes=CALIBRATION_SIZES, repeats=5, seed=0):
+    """
+    Plus grande taille de lot pour laquelle le prédicteur compilé est plus
+    rapide que `model.predict_proba` (0 s'il ne l'est jamais).
+    """
+    rng = np.random.default_rng(seed)
+    max_rows = 0
+    for size in sizes:
+        X = rng.uniform(0, 300, (size, forest.n_features)).astype(np.float32)
+        if _best_time(forest.predict_proba, X, repeats) >= _best_time(model.predict_proba, X, repeats):
+            break
+        max_rows = size
+    return max_rows
+
+
+def compile_predictor(model, forest=None):
+    """
+    Prédicteur hybride pour un modèle servi, ou None si le modèle n'est pas
+    supporté (le modèle XGBoost est alors utilisé tel quel). `forest` évite
+    la compilation quand le prédicteur a été sauvegardé avec le modèle.
+    """
+    if forest is None:
+        try:
+            forest = CompiledForest.from_model(model)
+        except (NotImplementedError, AttributeError, KeyError, ValueError) as e:
+            print(f"⚠️ Prédicteur compilé indisponible : {e}")
+            return None
+
+    configured = os.environ.get(COMPILED_MAX_ROWS_ENV)
+    if configured is not None and int(configured) <= 0:
+        return None
+    if not matches_model(model, forest):
+        print("⚠️ Prédicteur compilé écarté : sorties différentes de predict_proba")
+        return None
+
+    max_rows = int(configured) if configured is not None else calibrate(model, forest)
+    if max_rows <= 0:
+        return None
+    return HybridPredictor(model, forest, max_rows)
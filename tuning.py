@@ -0,0 +1,249 @@
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBClassifier
+
+from dataset_cache import DEFAULT_CACHE_DIR
+from feature_encoder import FeatureEncoder
+from model_pipeline import SELECTED_FEATURES, prepare_cached
+from native_training import train_params
+
+# Espace de recherche par défaut (valeurs discrètes, utilisables en grille ou en tirage)
+DEFAULT_SPACE = {
+    "max_depth": [3, 4, 5, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2, 0.3],
+    "min_child_weight": [1, 3, 5],
+    "subsample": [0.7, 0.85, 1.0],
+    "colsample_bytree": [0.7, 0.85, 1.0],
+}
+
+# Part du train utilisée pour la validation quand aucun fichier de test n'est fourni
+VALID_FRACTION = 0.2
+
+
+def grid_configs(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_configs(space, n_trials, seed=0):
+    rng = random.Random(seed)
+    return [{name: rng.choice(values) for name, values in space.items()} for _ in range(n_trials)]
+
+
+class PruningCallback(xgb.callback.TrainingCallback):
+    """
+    Arrête un essai dont la logloss de validation, à un point de contrôle,
+    dépasse nettement la meilleure logloss finale connue au lancement de
+    l'essai : il n'a pratiquement aucune chance de la battre.
+    """
+
+    def __init__(self, threshold, checkpoints, tolerance=0.1):
+        super().__init__()
+        self.threshold = threshold
+        self.checkpoints = set(checkpoints)
+        self.tolerance = tolerance
+        self.pruned = False
+
+    def after_iteration(self, model, epoch, evals_log):
+        if self.threshold is None or epoch + 1 not in self.checkpoints:
+            return False
+        score = evals_log["valid"]["logloss"][-1]
+        if score > self.threshold * (1 + self.tolerance):
+            self.pruned = True
+            return True
+        return False
+
+
+# Données du worker : matrices quantifiées construites une seule fois par
+# processus à partir des `.npy` partagés en mémoire mappée
+_worker = {}
+
+
+def _init_worker(train_dir, valid_dir, nthread):
+    X = np.load(os.path.join(train_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(train_dir, "y.npy"), mmap_mode="r")
+    if valid_dir:
+        X_valid = np.load(os.path.join(valid_dir, "X.npy"), mmap_mode="r")
+        y_valid = np.load(os.path.join(valid_dir, "y.npy"), mmap_mode="r")
+    else:
+        # Découpage contigu : les tranches d'un memmap ne copient rien
+        split = int(len(X) * (1 - VALID_FRACTION))
+        X, X_valid, y, y_valid = X[:split], X[split:], y[:split], y[split:]
+
+    features = list(SELECTED_FEATURES)
+    dtrain = xgb.QuantileDMatrix(X, label=y, feature_names=features, nthread=nthread)
+    dvalid = xgb.QuantileDMatrix(X_valid, label=y_valid, feature_names=features, ref=dtrain, nthread=nthread)
+    _worker.update(dtrain=dtrain, dvalid=dvalid, nthread=nthread)
+
+
+def _run_trial(trial, config, num_boost_round, threshold, early_stopping_rounds):
+    start = time.perf_counter()
+    params = train_params(config, _worker["nthread"])
+    params["eval_metric"] = ["auc", "logloss"]
+
+    checkpoints = [max(1, num_boost_round // 4), max(1, num_boost_round // 2)]
+    pruning = PruningCallback(threshold, checkpoints)
+    evals_log = {}
+    booster = xgb.train(
+        params,
+        _worker["dtrain"],
+        num_boost_round=num_boost_round,
+        evals=[(_worker["dvalid"], "valid")],
+        evals_result=evals_log,
+        verbose_eval=False,
+        # L'arrêt précoce passe en premier : il enregistre la meilleure
+        # itération avant un éventuel élagage
+        callbacks=[
+            xgb.callback.EarlyStopping(
+                rounds=early_stopping_rounds, metric_name="logloss", data_name="valid", save_best=True
+            ),
+            pruning,
+        ],
+    )
+
+    logloss = evals_log["valid"]["logloss"]
+    best = int(np.argmin(logloss))
+    return {
+        "trial": trial,
+        "params": config,
+        "num_boost_round": num_boost_round,
+        "rounds": len(logloss),
+        "best_iteration": best,
+        "logloss": float(logloss[best]),
+        "auc": float(evals_log["valid"]["auc"][best]),
+        "pruned": pruning.pruned,
+        "seconds": time.perf_counter() - start,
+        "model": bytes(booster.save_raw("ubj")),
+    }
+
+
+def _run_trials(executor, configs, num_boost_round, max_in_flight, early_stopping_rounds, first_trial=0):
+    """
+    Lance les essais sur le pool. Chaque nouvel essai reçoit la meilleure
+    logloss connue au moment de son lancement comme seuil d'élagage.
+    """
+    results = []
+    best = None
+    pending = set()
+    queue = list(enumerate(configs, start=first_trial))
+
+    while queue or pending:
+        while queue and len(pending) < max_in_flight:
+            trial, config = queue.pop(0)
+            pending.add(
+                executor.submit(_run_trial, trial, config, num_boost_round, best, early_stopping_rounds)
+            )
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            results.append(result)
+            if not result["pruned"] and (best is None or result["logloss"] < best):
+                best = result["logloss"]
+            status = "élagué" if result["pruned"] else f"logloss={result['logloss']:.4f}"
+            print(f"🔎 Essai {result['trial']} ({result['rounds']} itérations) : {status}")
+
+    return sorted(results, key=lambda r: r["trial"])
+
+
+def tune(
+    train_path,
+    valid_path=None,
+    strategy="random",
+    space=None,
+    n_trials=20,
+    max_rounds=300,
+    min_rounds=25,
+    eta=3,
+    workers=None,
+    nthread=1,
+    early_stopping_rounds=20,
+    seed=0,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """
+    Recherche d'hyperparamètres sur un pool de processus.
+
+    `strategy` vaut "random" (`n_trials` tirages), "grid" (produit cartésien)
+    ou "halving" (successive halving : tous les candidats démarrent avec
+    `min_rounds` itérations, seul le meilleur tiers est relancé avec `eta`
+    fois plus d'itérations, jusqu'à `max_rounds`).
+
+    Retourne (résultats de tous les essais, meilleur essai, modèle, encodeur).
+    """
+    space = space or DEFAULT_SPACE
+    workers = workers or max(1, (os.cpu_count() or 1) // nthread)
+
+    # Données préparées une seule fois, partagées par tous les workers
+    train_dir = prepare_cached(train_path, cache_dir)
+    valid_dir = prepare_cached(valid_path, cache_dir) if valid_path and valid_path != train_path else None
+    encoder = FeatureEncoder.load(os.path.join(train_dir, "encoder.json"))
+
+    if strategy == "grid":
+        configs = grid_configs(space)
+    elif strategy in ("random", "halving"):
+        configs = random_configs(space, n_trials, seed)
+    else:
+        raise ValueError(f"⚠️ Stratégie de recherche inconnue : {strategy}")
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(train_dir, valid_dir, nthread)
+    ) as executor:
+        if strategy != "halving":
+            results = _run_trials(executor, configs, max_rounds, workers, early_stopping_rounds)
+        else:
+            results = []
+            rounds = min(min_rounds, max_rounds)
+            while True:
+                rung = _run_trials(
+                    executor, configs, rounds, workers, early_stopping_rounds, first_trial=len(results)
+                )
+                results.extend(rung)
+                if rounds >= max_rounds or len(configs) == 1:
+                    break
+                ranked = sorted(rung, key=lambda r: (r["pruned"], r["logloss"]))
+                configs = [r["params"] for r in ranked[: max(1, math.ceil(len(ranked) / eta))]]
+                rounds = min(rounds * eta, max_rounds)
+
+    candidates = [r for r in results if not r["pruned"]] or results
+    if strategy == "halving":
+        candidates = [r for r in candidates if r["num_boost_round"] == rounds] or candidates
+    best = min(candidates, key=lambda r: r["logloss"])
+
+    model = XGBClassifier()
+    model.load_model(bytearray(best["model"]))
+    return results, best, model, encoder
+
+
+def log_trials_to_mlflow(results, parent_run_id, experiment_id):
+    """
+    Enregistre chaque essai comme run MLflow imbriqué sous `parent_run_id`,
+    avec un seul `log_batch` par essai (paramètres, métriques et tags).
+    """
+    from mlflow.entities import Metric, Param, RunTag
+    from mlflow.tracking import MlflowClient
+
+    client = MlflowClient()
+    timestamp = int(time.time() * 1000)
+    for result in results:
+        run = client.create_run(
+            experiment_id,
+            tags={"mlflow.parentRunId": parent_run_id, "mlflow.runName": f"trial-{result['trial']}"},
+        )
+        params = {**result["params"], "num_boost_round": result["num_boost_round"]}
+        metrics = {
+            key: result[key] for key in ("logloss", "auc", "rounds", "best_iteration", "seconds")
+        }
+        client.log_batch(
+            run.info.run_id,
+            metrics=[Metric(key, float(value), timestamp, 0) for key, value in metrics.items()],
+            params=[Param(key, str(value)) for key, value in params.items()],
+            tags=[RunTag("pruned", str(result["pruned"]))],
+        )
+        client.set_terminated(run.info.run_id)